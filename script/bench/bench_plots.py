@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+染色体分段图的基准测试：用合成数据分别计时 读取 / 排版 / SVG / 光栅化，并记录峰值内存。
+
+- 每个阶段都拿前面阶段算好的结果做输入（svg 阶段直接用 index / layout），只计自己那一段
+- loter 的两种光栅化分开计时：raster_cairosvg（SVG -> PNG）和 raster_numpy（直接画 RGBA 数组）；
+  装不上 cairosvg / libcairo 时 raster_cairosvg 记为跳过
+- 合成数据按默认组装（assembly.py，牛 29 条常染色体）的长度比例撒 segment，
+  同一染色体内互不重叠；segment 数、ancestry 类别数、Frequency 分布都可调
+- 每个用例在单独的子进程里跑，峰值 RSS 互不干扰；每个阶段结束时再记一次峰值 RSS，
+  光栅化阶段比 SVG 阶段多占的内存就是两者之差
+- 结果写成 JSON（带 git commit），两次结果可以用 --compare 对比
+
+用法：
+  python script/bench/bench_plots.py --sizes 1k,10k,100k,1M --pipelines loter
+  python script/bench/bench_plots.py --sizes 10k --pipelines loter,redraw --ancestries 2,6 --freq beta
+  python script/bench/bench_plots.py --sizes 100k --pipelines redraw --freq discrete --px_width 4252
+  python script/bench/bench_plots.py --sizes 100k --pipelines loter --rasters numpy
+  python script/bench/bench_plots.py --compare results/a.json results/b.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+HERE = Path(__file__).resolve().parent
+PLOTS_DIR = HERE.parent / "plots"
+RESULTS_DIR = HERE / "results"
+DATA_DIR = Path(tempfile.gettempdir()) / "loter_bench_data"
+
+ANCESTRY_NAMES = ["Mo-OD", "Charolais", "Hereford", "Angus", "Holstein", "Simmental", "Limousin", "Yak"]
+FREQ_DISTS = ("uniform", "beta", "discrete")
+PIPELINES = ("loter", "redraw")
+
+
+# =========================
+# 1) 合成数据
+# =========================
+
+def _parse_size(s: str) -> int:
+    s = s.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+def synth_segments(n: int, n_ancestries: int = 2, freq: str = "uniform", seed: int = 0) -> pd.DataFrame:
+    """按染色体长度比例分配 n 条 segment；列与 loter_segment.txt 相同"""
+    sys.path.insert(0, str(PLOTS_DIR))
+    from assembly import get_assembly
+    from 染色体Loter import FREQ_TO_COLOR_UNIFIED
+
+    rng = np.random.default_rng(seed)
+    asm = get_assembly()
+    names = list(asm.chroms)
+    lengths = np.array(asm.lengths, dtype=np.int64)
+    counts = rng.multinomial(n, lengths / lengths.sum())
+
+    parts = []
+    for c, L, k in zip(names, lengths.tolist(), counts.tolist()):
+        if k == 0:
+            continue
+        # 2k 个排好序的断点两两配对，保证同一染色体内不重叠
+        pts = np.sort(rng.integers(1, L, 2 * k))
+        start, end = pts[0::2], np.maximum(pts[1::2], pts[0::2] + 1)
+        parts.append(pd.DataFrame({"Chr": f"chr{c}", "Start": start, "End": end}))
+    df = pd.concat(parts, ignore_index=True)
+
+    labels = (ANCESTRY_NAMES + [f"Anc{i}" for i in range(len(ANCESTRY_NAMES), n_ancestries)])[:n_ancestries]
+    df["Ancestry"] = np.array(labels, dtype=object)[rng.integers(0, n_ancestries, len(df))]
+    if freq == "uniform":
+        f = rng.uniform(0.7, 1.0, len(df))
+    elif freq == "beta":
+        f = 0.7 + 0.3 * rng.beta(8, 2, len(df))
+    elif freq == "discrete":
+        f = rng.choice(np.array(list(FREQ_TO_COLOR_UNIFIED), dtype=np.float64), len(df))
+    else:
+        raise ValueError(f"未知的 Frequency 分布：{freq}（可选：{FREQ_DISTS}）")
+    df["Frequency"] = np.round(f, 4)
+    return df
+
+
+def synth_file(n: int, n_ancestries: int, freq: str, seed: int) -> Path:
+    """生成（或复用）合成数据文件"""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    path = DATA_DIR / f"segments_{n}_{n_ancestries}_{freq}_{seed}.txt"
+    if not path.exists():
+        tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+        synth_segments(n, n_ancestries, freq, seed).to_csv(tmp, sep="\t", index=False, float_format="%.4f")
+        os.replace(tmp, path)
+    return path
+
+
+# =========================
+# 2) 单个用例（在子进程里跑）
+# =========================
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return kb / 1024 / (1024 if sys.platform == "darwin" else 1)
+    except ImportError:
+        pass
+    try:
+        import psutil  # type: ignore
+        mem = psutil.Process().memory_info()
+        return getattr(mem, "peak_wset", mem.rss) / 1024 ** 2
+    except ImportError:
+        return None
+
+
+class _Stages:
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+        self.peak_mb: Dict[str, Optional[float]] = {}
+
+    def run(self, name: str, func, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = func(*args, **kwargs)
+        self.seconds[name] = round(time.perf_counter() - t0, 4)
+        peak = _peak_rss_mb()
+        self.peak_mb[name] = None if peak is None else round(peak, 1)
+        return out
+
+
+def _cairosvg_missing() -> Optional[str]:
+    """cairosvg 或 libcairo 不可用时返回原因（该阶段记为跳过，不算失败）"""
+    try:
+        import cairosvg  # type: ignore
+    except (ImportError, OSError) as e:
+        return f"{type(e).__name__}: {str(e).splitlines()[0]}"
+    if not hasattr(cairosvg, "svg2png"):
+        return "cairosvg 没有 svg2png"
+    return None
+
+
+def run_case(spec: Dict[str, object]) -> Dict[str, object]:
+    sys.path.insert(0, str(PLOTS_DIR))
+    txt = Path(str(spec["txt"]))
+    out_dir = Path(tempfile.mkdtemp(prefix="loter_bench_"))
+    # 合成数据里的新 ancestry 不要写进用户自己的颜色表
+    os.environ["ANCESTRY_PALETTE"] = str(out_dir / "palette.json")
+    st = _Stages()
+
+    rasters = spec.get("rasters") or []
+    skipped: Dict[str, str] = {}
+    if spec["pipeline"] == "loter":
+        Loter = importlib.import_module("Loter")
+        Loter.apply_config({"USE_PARSE_CACHE": False, "LOD_MODE": spec.get("lod")})
+        df = st.run("read", Loter.read_loter_segments, txt)
+        index = st.run("index", Loter.build_segment_index, df)
+        layout = st.run("layout", Loter.compute_layout, index)
+        # 后面各阶段都用上面算好的 index / layout，只计各自的那一段
+        st.run("svg", Loter.generate_svg, df, out_dir / "bench.svg", index=index, layout=layout)
+        if "cairosvg" in rasters:
+            reason = _cairosvg_missing()
+            if reason:
+                skipped["raster_cairosvg"] = reason
+            else:
+                st.run("raster_cairosvg", Loter.export_raster, out_dir / "bench.svg", {"png": out_dir / "bench.png"})
+        if "numpy" in rasters:
+            st.run("raster_numpy", Loter.render_raster, df, {"png": out_dir / "bench_numpy.png"},
+                   index=index, layout=layout)
+        rows = len(df)
+    else:
+        redraw = importlib.import_module("染色体Loter")
+        df = st.run("read", redraw.read_segments, txt)
+        markers = st.run("markers", redraw.marker_table)
+        layout = st.run("layout", redraw.chrom_layout)
+        st.run("svg", redraw.generate_svg, df, out_dir / "bench.svg", markers=markers, layout=layout)
+        if "numpy" in rasters:
+            st.run("raster_numpy", redraw.render_raster, df, int(spec.get("px_width") or 4252),
+                   markers=markers, layout=layout)
+        rows = len(df)
+
+    svg_bytes = (out_dir / "bench.svg").stat().st_size
+    for f in out_dir.iterdir():
+        f.unlink()
+    out_dir.rmdir()
+    return {**spec, "rows": rows, "svg_bytes": svg_bytes,
+            "stages": st.seconds, "stage_peak_rss_mb": st.peak_mb, "total": round(sum(st.seconds.values()), 4),
+            "peak_rss_mb": _peak_rss_mb(), "skipped": skipped}
+
+
+# =========================
+# 3) 汇总 / 对比
+# =========================
+
+def _git_info() -> Dict[str, object]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=HERE, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or None,
+            "subject": git("log", "-1", "--format=%s") or None,
+            "dirty": bool(git("status", "--porcelain", "--", str(PLOTS_DIR)))}
+
+
+def _env_info() -> Dict[str, object]:
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "numpy": np.__version__, "pandas": pd.__version__, "cpu_count": os.cpu_count()}
+
+
+def compare(a_path: Path, b_path: Path) -> None:
+    a, b = (json.loads(Path(p).read_text(encoding="utf-8")) for p in (a_path, b_path))
+    key = lambda c: (c["pipeline"], c["size"], c["ancestries"], c["freq"], c.get("lod"))
+    base = {key(c): c for c in a["cases"]}
+    print(f"A = {a['git'].get('commit', '')[:10]}  {a['git'].get('subject', '')}")
+    print(f"B = {b['git'].get('commit', '')[:10]}  {b['git'].get('subject', '')}")
+    print(f"{'case':<34}{'stage':<17}{'A (s)':>10}{'B (s)':>10}{'B/A':>8}")
+    for c in b["cases"]:
+        old = base.get(key(c))
+        if old is None:
+            continue
+        name = f"{c['pipeline']} n={c['size']} k={c['ancestries']} {c['freq']}"
+        for stage in [*c["stages"], "total", "peak_rss_mb"]:
+            va = old["stages"].get(stage) if stage in c["stages"] else old.get(stage)
+            vb = c["stages"].get(stage) if stage in c["stages"] else c.get(stage)
+            if va is None or vb is None:
+                continue
+            ratio = vb / va if va else float("nan")
+            print(f"{name:<34}{stage:<17}{va:>10.3f}{vb:>10.3f}{ratio:>8.2f}")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="染色体分段图基准测试（合成数据）")
+    p.add_argument("--sizes", type=str, default="1k,10k,100k,1M", help="segment 数，逗号分隔（支持 k / M）")
+    p.add_argument("--ancestries", type=str, default="2", help="ancestry 类别数，逗号分隔")
+    p.add_argument("--freq", type=str, default="uniform", help=f"Frequency 分布，逗号分隔：{'/'.join(FREQ_DISTS)}")
+    p.add_argument("--pipelines", type=str, default="loter", help=f"逗号分隔：{'/'.join(PIPELINES)}")
+    p.add_argument("--lod", type=str, default=None, choices=["dominant", "blend"], help="Loter 的 LOD_MODE")
+    p.add_argument("--rasters", type=str, default="cairosvg,numpy",
+                   help="要测的光栅化后端，逗号分隔：cairosvg（SVG -> PNG，仅 loter）/ numpy（直接画数组）")
+    p.add_argument("--no_raster", action="store_true", help="不测光栅化（等同 --rasters ''）")
+    p.add_argument("--px_width", type=int, default=4252, help="染色体Loter 光栅化的像素宽度（默认 4252）")
+    p.add_argument("--repeat", type=int, default=1, help="每个用例重复次数（取总时间最短的一次）")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", type=str, default=None, help="结果 JSON（默认 results/bench_<时间>_<commit>.json）")
+    p.add_argument("--compare", nargs=2, metavar=("A", "B"), default=None, help="对比两次结果")
+    p.add_argument("--case", type=str, default=None, help=argparse.SUPPRESS)  # 子进程内部用
+    args = p.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case)), ensure_ascii=False))
+        return
+    if args.compare:
+        compare(Path(args.compare[0]), Path(args.compare[1]))
+        return
+
+    cases: List[Dict[str, object]] = []
+    for pipeline in args.pipelines.split(","):
+        for size in map(_parse_size, args.sizes.split(",")):
+            for k in map(int, args.ancestries.split(",")):
+                for freq in args.freq.split(","):
+                    if pipeline == "redraw" and freq != "discrete":
+                        # 染色体Loter 的配色表是固定的 14 个频率值，其它分布查不到颜色
+                        print(f"[SKIP] redraw 只支持 --freq discrete（跳过 {freq}）")
+                        continue
+                    txt = synth_file(size, k, freq, args.seed)
+                    spec = {"pipeline": pipeline, "size": size, "ancestries": k, "freq": freq,
+                            "lod": args.lod, "px_width": args.px_width,
+                            "rasters": [] if args.no_raster else [r for r in args.rasters.split(",") if r],
+                            "txt": str(txt)}
+                    best = None
+                    for _ in range(max(1, args.repeat)):
+                        proc = subprocess.run([sys.executable, __file__, "--case", json.dumps(spec)],
+                                              capture_output=True, text=True, encoding="utf-8")
+                        if proc.returncode != 0:
+                            raise SystemExit(f"用例失败：{spec}\n{proc.stderr}")
+                        res = json.loads(proc.stdout.strip().splitlines()[-1])
+                        if best is None or res["total"] < best["total"]:
+                            best = res
+                    cases.append(best)
+                    stages = "  ".join(f"{k2}={v:.3f}s" + ("" if best["stage_peak_rss_mb"].get(k2) is None
+                                                          else f"/{best['stage_peak_rss_mb'][k2]:.0f}MB")
+                                       for k2, v in best["stages"].items())
+                    peak = best["peak_rss_mb"]
+                    for stage, reason in best.get("skipped", {}).items():
+                        print(f"[SKIP] {stage}：{reason}")
+                    print(f"[OK] {pipeline} n={size} k={k} {freq}: {stages}  peak={'?' if peak is None else f'{peak:.0f}'}MB")
+
+    git = _git_info()
+    out = Path(args.out) if args.out else RESULTS_DIR / (
+        f"bench_{time.strftime('%Y%m%d-%H%M%S')}_{(git['commit'] or 'nogit')[:10]}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"git": git, "env": _env_info(), "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                               "cases": cases}, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[OK] 结果：{out}")
+
+
+if __name__ == "__main__":
+    main()
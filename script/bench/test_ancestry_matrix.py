@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+ancestry_matrix.paint_bins：箱中点取色，嵌套/重叠 segment 的处理；
+build_matrix 每个输入文件只读一次。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+from Loter import build_segment_index  # noqa: E402
+from ancestry_matrix import NOCALL, build_matrix, paint_bins  # noqa: E402
+
+CODES = {"A": 1, "B": 2, "C": 3}
+
+
+def _paint(rows, bin_size=10, n_bins=None):
+    df = pd.DataFrame(rows, columns=["chr", "start", "end", "ancestry"])
+    if n_bins is None:
+        n_bins = -(-int(df["end"].max()) // bin_size)
+    return paint_bins(build_segment_index(df), ["1"], np.array([0, n_bins]), CODES, bin_size)
+
+
+def _paint_naive(start, end, anc, n_bins, bin_size):
+    """逐段按起点顺序涂色，后涂覆盖先涂"""
+    out = np.full(n_bins, NOCALL, dtype=np.uint8)
+    mid = np.arange(n_bins) * bin_size + bin_size // 2
+    for k in np.argsort(start, kind="stable"):
+        out[(mid >= start[k]) & (mid < end[k])] = anc[k]
+    return out
+
+
+def test_disjoint_segments_and_gaps():
+    got = _paint([("1", 0, 20, "A"), ("1", 40, 60, "B")])
+    assert got.tolist() == [1, 1, NOCALL, NOCALL, 2, 2]
+
+
+def test_nested_segment_outer_resumes_after_inner():
+    # 外层 A 覆盖 [0,100)，内层 B 只覆盖第 2 个箱；B 结束后的箱应回到 A，而不是 NOCALL
+    got = _paint([("1", 0, 100, "A"), ("1", 10, 20, "B")])
+    assert got.tolist() == [1, 2, 1, 1, 1, 1, 1, 1, 1, 1]
+
+
+def test_overlap_later_start_wins():
+    got = _paint([("1", 0, 50, "A"), ("1", 30, 80, "B")])
+    assert got.tolist() == [1, 1, 1, 2, 2, 2, 2, 2]
+
+
+def test_same_start_later_row_wins():
+    got = _paint([("1", 0, 40, "A"), ("1", 0, 20, "B")])
+    assert got.tolist() == [2, 2, 1, 1]
+
+
+def test_unsorted_input():
+    got = _paint([("1", 40, 60, "B"), ("1", 0, 20, "A")])
+    assert got.tolist() == [1, 1, NOCALL, NOCALL, 2, 2]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_sequential_painting(seed):
+    rng = np.random.default_rng(seed)
+    m = int(rng.integers(1, 40))
+    bin_size = int(rng.integers(1, 60))
+    start = rng.integers(0, 2000, m)
+    end = start + rng.integers(1, 600, m)
+    anc = rng.integers(1, 4, m).astype(np.uint8)
+    labels = {v: k for k, v in CODES.items()}
+    n_bins = -(-int(end.max()) // bin_size)
+    got = _paint([("1", s, e, labels[a]) for s, e, a in zip(start, end, anc)], bin_size, n_bins)
+    np.testing.assert_array_equal(got, _paint_naive(start, end, anc, n_bins, bin_size))
+
+
+def test_build_reads_each_input_once(tmp_path, monkeypatch):
+    import ancestry_matrix
+    rows = {"a": "1\t0\t100\tA\n2\t0\t50\tB\n", "b": "2\t20\t80\tA\n1\t10\t30\tC\n"}
+    items = []
+    for name, body in rows.items():
+        txt = tmp_path / f"{name}.txt"
+        txt.write_text("Chr\tStart\tEnd\tAncestry\n" + body, encoding="utf-8")
+        items.append((name, txt))
+    loads = []
+    load = ancestry_matrix._load
+    monkeypatch.setattr(ancestry_matrix, "_load", lambda txt, use_cache: loads.append(txt) or load(txt, use_cache))
+
+    mat = build_matrix(items, tmp_path / "m", bin_size=10, block=1, use_cache=False)
+    assert loads == [txt for _, txt in items]
+    assert mat.labels == ["A", "B", "C"]
+    assert np.asarray(mat.codes[mat.bins_of("chr1")]).T.tolist() == [[1] * 10, [0, 3, 3] + [0] * 7]
+    assert np.asarray(mat.codes[mat.bins_of("chr2")]).T.tolist() == [[2] * 5 + [0] * 3, [0, 0, 1, 1, 1, 1, 1, 1]]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+ancestry_summary.summarize_segments：bincount 规约与逐组计算一致，比例和 Frequency 按 bp 加权。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+from ancestry_summary import COLUMNS, summarize_files, summarize_segments  # noqa: E402
+
+
+def _df(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["chr", "start", "end", "ancestry", "frequency"])
+
+
+def _naive(df: pd.DataFrame) -> pd.DataFrame:
+    """逐组 groupby 计算，作为对照"""
+    df = df.assign(length=(df["end"] - df["start"]).astype(float))
+    parts = []
+    for level, frame in (("chromosome", df), ("genome", df.assign(chr="genome"))):
+        for c, sub in frame.groupby("chr", sort=False):
+            total = sub["length"].sum()
+            for anc, g in sub.groupby("ancestry"):
+                has_f = g["frequency"].notna()
+                fl = g.loc[has_f, "length"].sum()
+                parts.append((level, c, anc, len(g), int(g["length"].sum()), g["length"].sum() / total,
+                              (g.loc[has_f, "frequency"] * g.loc[has_f, "length"]).sum() / fl if fl else np.nan))
+    return pd.DataFrame(parts, columns=COLUMNS[1:])
+
+
+def test_hand_computed_weights():
+    tab = summarize_segments(_df([
+        ("chr1", 0, 300, "A", 0.9),
+        ("chr1", 300, 400, "B", 0.7),
+        ("chr1", 400, 500, "A", 0.5),
+        ("chr2", 0, 100, "B", np.nan),
+    ]), "s1")
+    got = {(r.Chr, r.Ancestry): r for r in tab.itertuples()}
+    a1 = got[("chr1", "A")]
+    assert (a1.Segments, a1.Bp) == (2, 400)
+    assert a1.Proportion == pytest.approx(0.8)
+    assert a1.Frequency == pytest.approx((0.9 * 300 + 0.5 * 100) / 400)
+    assert np.isnan(got[("chr2", "B")].Frequency)
+    gb = got[("genome", "B")]
+    assert (gb.Level, gb.Bp, gb.Proportion) == ("genome", 200, pytest.approx(200 / 600))
+    # 全基因组 B 的 Frequency 只用有值的那段加权
+    assert gb.Frequency == pytest.approx(0.7)
+    assert tab["Chr"].tolist() == ["chr1", "chr1", "chr2", "genome", "genome"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_groupby(seed):
+    rng = np.random.default_rng(seed)
+    n = 400
+    start = rng.integers(0, 10_000, n)
+    df = _df({
+        "chr": rng.choice([f"chr{i}" for i in (1, 2, 10, 3)], n),
+        "start": start,
+        "end": start + rng.integers(1, 500, n),
+        "ancestry": rng.choice(["Mo-OD", "Charolais", "Angus"], n),
+        "frequency": np.where(rng.random(n) < 0.2, np.nan, rng.uniform(0.5, 1.0, n)),
+    })
+    got = summarize_segments(df, "s").drop(columns="Sample")
+    key = ["Level", "Chr", "Ancestry"]
+    exp = _naive(df).sort_values(key).reset_index(drop=True)
+    got = got.sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, exp, check_dtype=False)
+
+
+def test_summarize_files_writes_all_samples(tmp_path):
+    items = []
+    for name, body in {"a": "1\t0\t100\tA\t0.9\n", "b": "1\t0\t50\tA\t0.8\n1\t50\t100\tB\t0.7\n"}.items():
+        txt = tmp_path / f"{name}.txt"
+        txt.write_text("Chr\tStart\tEnd\tAncestry\tFrequency\n" + body, encoding="utf-8")
+        items.append((name, txt))
+    out = tmp_path / "sum.tsv"
+    rows = summarize_files(items, out, use_cache=False)
+    tab = pd.read_csv(out, sep="\t")
+    assert list(tab.columns) == COLUMNS
+    assert len(tab) == rows == 2 + 4
+    assert not out.with_name(out.name + ".part").exists()
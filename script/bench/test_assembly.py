@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+assembly：.fai / .genome 解析（主染色体过滤、chr 前缀、报错）、按文件缓存，以及 chrom_layout 对组装的依赖。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import assembly  # noqa: E402
+from assembly import get_assembly, load_assembly, parse_genome_lines  # noqa: E402
+
+FAI = """\
+chr1\t1000\t6\t60\t61
+chr2\t800\t1030\t60\t61
+chrX\t900\t1850\t60\t61
+chrMT\t16338\t2780\t60\t61
+NW_020192138.1\t5000\t19400\t60\t61
+chrUn_1\t300\t24500\t60\t61
+"""
+
+
+def test_fai_keeps_primary_chromosomes_in_file_order():
+    asm = parse_genome_lines(FAI.splitlines(), "test.fai")
+    assert asm.chroms == ("1", "2", "X")
+    assert asm.lengths == (1000, 800, 900)
+    assert asm.chrom_index(["chrX", "1", "MT", "chr7"]).tolist() == [2, 0, -1, -1]
+
+
+def test_all_contigs_when_primary_only_is_off():
+    asm = parse_genome_lines(FAI.splitlines(), "test.fai", primary_only=False)
+    assert asm.chroms == ("1", "2", "X", "MT", "NW_020192138.1", "Un_1")
+
+
+def test_genome_file_skips_comments_and_blank_lines():
+    asm = parse_genome_lines(["# name length", "", "Chr3 300", "chr4\t400  extra"], "g.genome")
+    assert asm.chroms == ("3", "4")
+    assert asm.lengths == (300, 400)
+
+
+@pytest.mark.parametrize("lines, match", [
+    (["chr1"], "两列"),
+    (["chr1\t12.5"], "不是整数"),
+    (["chr1\t0"], "必须为正"),
+    (["chr1\t10", "1\t20"], "重复"),
+    (["chrMT\t16338"], "没有任何染色体"),
+])
+def test_bad_lines_raise(lines, match):
+    with pytest.raises(ValueError, match=match):
+        parse_genome_lines(lines, "bad.fai")
+
+
+def test_file_is_parsed_once_until_it_changes(tmp_path, monkeypatch):
+    fai = tmp_path / "ref.fa.fai"
+    fai.write_text(FAI, encoding="utf-8")
+    calls = []
+    parse = assembly.parse_genome_lines
+    monkeypatch.setattr(assembly, "parse_genome_lines", lambda *a: calls.append(a[1]) or parse(*a))
+    assembly._load_file.cache_clear()
+
+    assert get_assembly(str(fai)) is load_assembly(fai)
+    assert calls == ["ref.fa.fai"]
+    st = fai.stat()
+    fai.write_text(FAI + "chr3\t700\t30000\t60\t61\n", encoding="utf-8")
+    os.utime(fai, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert load_assembly(fai).chroms == ("1", "2", "X", "3")
+    assert len(calls) == 2
+
+
+def test_unknown_spec_raises():
+    with pytest.raises(FileNotFoundError, match="bovine29"):
+        get_assembly("no_such_assembly")
+
+
+def test_layout_follows_assembly():
+    import 染色体Loter
+    asm = parse_genome_lines(FAI.splitlines(), "test.fai")
+    lay = 染色体Loter.chrom_layout(asm)
+    assert len(lay.geom) == 3
+    assert lay.x1[0] == float(染色体Loter.CHR_X_FIRST) and lay.x1[-1] == float(染色体Loter.CHR_X_LAST)
+    # 最长的一条顶到最高处；长度不同于默认组装，内置 marker 不适用
+    assert lay.y_topmost.argmin() == 0
+    assert (lay.marker_chr == -1).all()
+    df = pd.DataFrame({"Chr": ["chrX", "chr1", "chr1"]})
+    assert lay.rows(df).tolist() == [2, 0, 0]
+    with pytest.raises(KeyError, match="chr7"):
+        lay.rows(pd.DataFrame({"Chr": ["chr1", "chr7"]}))
+
+    default = 染色体Loter.chrom_layout()
+    assert default.marker_chr.tolist() == list(range(1, 30))
+    assert np.all(np.diff(default.x1) > 0)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+染色体Loter 渐变色 LUT：与逐级 _gradient_color 相同，图例矩形与逐个 Decimal 计算逐字节一致，
+配色表的颜色落在 gradient_index 那一级上，<linearGradient> 的 stop 插值偏差不超过 1 个色阶。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import 染色体Loter as redraw  # noqa: E402
+
+SCHEMES = ["original", "unified"]
+TABLES = {"original": redraw.FREQ_TO_COLOR_ORIGINAL, "unified": redraw.FREQ_TO_COLOR_UNIFIED}
+
+
+@pytest.mark.parametrize("scheme", SCHEMES)
+@pytest.mark.parametrize("n", [2, 7, redraw.GRADIENT_STEPS])
+def test_lut_matches_per_step_color(scheme, n):
+    assert redraw.gradient_lut(scheme, n) == tuple(redraw._gradient_color(i, n - 1, scheme) for i in range(n))
+
+
+@pytest.mark.parametrize("scheme", SCHEMES)
+def test_legend_rects_match_decimal_loop(scheme):
+    y, w, h = (redraw._fmt_y(v) for v in (redraw.LEGEND_Y0, redraw.LEGEND_W, redraw.LEGEND_H))
+    expected = tuple(
+        f'<rect x="{redraw._fmt_x(redraw.LEGEND_X0 + redraw.LEGEND_W * Decimal(i))}" y="{y}" width="{w}" '
+        f'height="{h}" style="fill:{redraw._gradient_color(i, redraw.GRADIENT_STEPS - 1, scheme)};stroke:none"/>'
+        for i in range(redraw.GRADIENT_STEPS)
+    )
+    assert redraw.legend_rects(scheme) == expected
+
+
+@pytest.mark.parametrize("scheme", SCHEMES)
+def test_table_colors_sit_on_the_lut(scheme):
+    freqs = np.array([float(k) for k in TABLES[scheme]])
+    lut = redraw.gradient_lut(scheme)
+    assert [lut[i] for i in redraw.gradient_index(freqs)] == [c.upper() for c in TABLES[scheme].values()]
+
+
+@pytest.mark.parametrize("scheme, n_stops", [("original", 2), ("unified", None)])
+def test_gradient_stops_stay_within_one_step(scheme, n_stops):
+    stops = redraw.gradient_stops(scheme)
+    idx = np.array([k for k, _ in stops])
+    assert idx[0] == 0 and idx[-1] == redraw.GRADIENT_STEPS - 1
+    if n_stops is not None:
+        assert len(stops) == n_stops
+    rgb = redraw.gradient_rgb(scheme).astype(np.float64)
+    steps = np.arange(redraw.GRADIENT_STEPS)
+    approx = np.stack([np.interp(steps, idx, rgb[idx, ch]) for ch in range(3)], axis=1)
+    assert np.abs(approx - rgb).max() <= 1.0
+
+
+def test_fill_fallback_uses_lut_only_for_missing_frequencies():
+    strict = redraw.freq_color_table("unified")
+    loose = redraw.freq_color_table("unified", True)
+    listed = strict != ""
+    assert (loose[listed] == strict[listed]).all()
+    k = 8100  # 0.81 不在配色表里
+    assert strict[k] == ""
+    assert loose[k] == redraw.gradient_lut("unified")[redraw.gradient_index(np.array([0.81]))[0]]
+    assert loose[6999] == "" and loose[10000] != ""
+
+
+def test_missing_frequency_raises_without_fallback():
+    df = pd.DataFrame({"Frequency": ["0.7333", "0.81"], "freq_e4": [7333, 8100]})
+    with pytest.raises(KeyError, match="0.81"):
+        redraw.lookup_fills(df, "unified")
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Loter.ChrIntervals：点查询和区间查询的边界（半开 [start, end)）、相接/嵌套/未排序的 segment。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import Loter  # noqa: E402
+
+
+def _intervals(rows) -> Loter.ChrIntervals:
+    df = pd.DataFrame(rows, columns=["chr", "start", "end", "ancestry"])
+    return Loter.ChrIntervals.build(Loter.build_segment_index(df), 0)
+
+
+# ---------- ChrIntervals.find ----------
+
+def test_find_half_open_boundaries():
+    iv = _intervals([("1", 100, 200, "A"), ("1", 300, 400, "B")])
+    got = iv.find([99, 100, 150, 199, 200, 299, 300, 399, 400])
+    assert got.tolist() == [-1, 0, 0, 0, -1, -1, 1, 1, -1]
+
+
+def test_find_touching_segments_prefers_later_start():
+    # 200 是第一段的（开）终点、第二段的起点：属于第二段
+    iv = _intervals([("1", 100, 200, "A"), ("1", 200, 300, "B")])
+    assert iv.find([199, 200, 201]).tolist() == [0, 1, 1]
+
+
+def test_find_nested_segment_falls_back_to_outer():
+    iv = _intervals([("1", 0, 1000, "A"), ("1", 100, 200, "B"), ("1", 300, 400, "C")])
+    got = iv.find([50, 150, 200, 250, 350, 999, 1000])
+    assert got.tolist() == [0, 1, 0, 0, 2, 0, -1]
+
+
+def test_find_deeply_nested_staircase():
+    # 每段都嵌在前一段里，查询点要越过一串已结束的内层段才回到外层
+    rows = [("1", k, 2000 - 10 * k, "A") for k in range(100)]
+    rows += [("1", 1000 + k, 1001 + k, "B") for k in range(300)]
+    iv = _intervals(rows)
+    got = iv.find([1999, 1500, 1305])
+    assert got.tolist() == [0, 49, 69]
+
+
+def test_find_unsorted_input_reports_original_rows():
+    iv = _intervals([("1", 300, 400, "B"), ("1", 100, 200, "A")])
+    j = iv.find([150, 350])
+    assert iv.row[j].tolist() == [1, 0]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_find_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    m = int(rng.integers(1, 200))
+    start = rng.integers(0, 5000, m)
+    end = start + rng.integers(1, 2000, m)
+    iv = _intervals([("1", int(s), int(e), "A") for s, e in zip(start, end)])
+    pos = np.arange(-5, 7100, 7)
+    got = iv.find(pos)
+    for p, j in zip(pos.tolist(), got.tolist()):
+        cover = np.flatnonzero((iv.start <= p) & (p < iv.end))
+        assert j == (cover[-1] if len(cover) else -1)
+
+
+# ---------- ChrIntervals.overlap ----------
+
+def test_overlap_half_open_query():
+    iv = _intervals([("1", 100, 200, "A"), ("1", 200, 300, "B"), ("1", 300, 400, "C")])
+    assert iv.start[iv.overlap(200, 300)].tolist() == [200]
+    assert iv.start[iv.overlap(199, 301)].tolist() == [100, 200, 300]
+    assert iv.start[iv.overlap(400, 500)].tolist() == []
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Loter.decimate_segments（LOD 精简）：保住可见的 ancestry 边界、亚像素组取主导 ancestry、
+未排序输入、模式校验。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import Loter  # noqa: E402
+
+PALETTE = np.array(["#111111", "#222222", "#333333"], dtype=object)
+
+
+def _runs(code):
+    """ancestry 变化的位置（下标）"""
+    return np.flatnonzero(code[1:] != code[:-1]) + 1
+
+
+def test_decimate_keeps_ancestry_boundaries_when_visible():
+    # 每段都远大于 1 像素：同 ancestry 的相邻段合并，不同 ancestry 之间的边界一个不丢
+    start = np.array([0, 100, 200, 300, 400, 500])
+    end = np.array([100, 200, 300, 400, 500, 600])
+    code = np.array([0, 0, 1, 1, 0, 2])
+    s, e, fills = Loter.decimate_segments(start, end, code, PALETTE, 1.0, "dominant")
+    assert s.tolist() == [0, 200, 400, 500]
+    assert e.tolist() == [200, 400, 500, 600]
+    assert fills.tolist() == ["#111111", "#222222", "#111111", "#333333"]
+
+
+@pytest.mark.parametrize("mode", ["dominant", "blend"])
+def test_decimate_random_visible_segments_keep_every_boundary(mode):
+    rng = np.random.default_rng(1)
+    length = rng.integers(5, 50, 300)
+    start = np.concatenate([[0], np.cumsum(length)[:-1]])
+    end = start + length
+    code = rng.integers(0, 3, 300)
+    s, e, fills = Loter.decimate_segments(start, end, code, PALETTE, 1.0, mode)
+    assert s.tolist() == start[np.concatenate([[0], _runs(code)])].tolist()
+    assert e[-1] == end[-1]
+    assert fills.tolist() == PALETTE[code[np.concatenate([[0], _runs(code)])]].tolist()
+
+
+def test_decimate_subpixel_group_takes_dominant_ancestry():
+    # 0.01 像素/bp：前三段（共 90 bp）落在同一像素行，B 覆盖最多
+    start = np.array([0, 20, 30, 1000])
+    end = np.array([20, 30, 90, 1200])
+    code = np.array([0, 2, 1, 0])
+    s, e, fills = Loter.decimate_segments(start, end, code, PALETTE, 0.01, "dominant")
+    assert s.tolist() == [0, 1000]
+    assert e.tolist() == [90, 1200]
+    assert fills.tolist() == ["#222222", "#111111"]
+
+
+@pytest.mark.parametrize("mode", ["dominant", "blend"])
+def test_decimate_unsorted_input_same_as_sorted(mode):
+    rng = np.random.default_rng(2)
+    start = np.sort(rng.choice(100_000, 200, replace=False))
+    end = start + rng.integers(1, 400, 200)
+    code = rng.integers(0, 3, 200)
+    want = Loter.decimate_segments(start, end, code, PALETTE, 0.02, mode)
+    o = rng.permutation(200)
+    got = Loter.decimate_segments(start[o], end[o], code[o], PALETTE, 0.02, mode)
+    for a, b in zip(got, want):
+        assert a.tolist() == b.tolist()
+
+
+@pytest.mark.parametrize("mode", ["Dominant", "blnd", ""])
+def test_unknown_mode_is_rejected(mode):
+    start, end, code = np.array([0]), np.array([10]), np.array([0])
+    with pytest.raises(ValueError, match="LOD_MODE"):
+        Loter.decimate_segments(start, end, code, PALETTE, 1.0, mode)
+
+
+def test_apply_config_rejects_unknown_mode():
+    with pytest.raises(ValueError, match="LOD_MODE"):
+        Loter.apply_config({"LOD_MODE": "blnd"})
+    assert Loter.LOD_MODE is None
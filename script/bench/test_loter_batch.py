@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Loter.run_batch：profile 报告随样本目录一起改名，失败的样本和崩掉的进程池都记进 batch_manifest.json。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import Loter  # noqa: E402
+
+CONFIG = {"RASTER_BACKEND": "numpy", "RASTER_FORMATS": ["png"], "USE_PARSE_CACHE": False, "PX_WIDTH": 400}
+
+
+@pytest.fixture
+def items(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANCESTRY_PALETTE", str(tmp_path / "palette.json"))
+    out = []
+    for name, body in {"a": "1\t0\t100\tA\n", "b": "2\t0\t50\tB\n", "bad": "1\tx\t100\tA\n"}.items():
+        txt = tmp_path / f"{name}.txt"
+        txt.write_text("Chr\tStart\tEnd\tAncestry\n" + body, encoding="utf-8")
+        out.append((name, txt))
+    return out
+
+
+def _manifest(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def test_profile_report_is_inside_final_dir(tmp_path, items, monkeypatch):
+    monkeypatch.setenv("LOTER_PROFILE", "1")
+    out_root = tmp_path / "out"
+    summary = _manifest(Loter.run_batch(items, out_root, 2, CONFIG))
+    status = {r["sample"]: r["status"] for r in summary["samples"]}
+    assert status == {"a": "ok", "b": "ok", "bad": "failed"}
+    for name in ("a", "b"):
+        assert (out_root / name / f"{Loter.BASENAME}.profile.json").exists()
+    assert not (out_root / "bad").exists()
+    assert not list(out_root.glob(".*.partial"))
+
+
+def test_broken_pool_still_writes_manifest(tmp_path, items):
+    # 初始化函数抛错 -> 进程池整个坏掉，每个 future 都是 BrokenProcessPool
+    summary = _manifest(Loter.run_batch(items, tmp_path / "out", 2, {"NO_SUCH_KEY": 1}))
+    assert summary["total"] == summary["failed"] == len(items)
+    assert sorted(r["sample"] for r in summary["samples"]) == ["a", "b", "bad"]
+    assert all(r["error"] for r in summary["samples"])
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+loter_cache.load_table：命中时不再解析，输入文件或解析器标签变了就失效。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import Loter  # noqa: E402
+from loter_cache import load_table  # noqa: E402
+
+HEADER = "Chr\tStart\tEnd\tAncestry\n"
+
+
+@pytest.fixture
+def counted_parser():
+    calls = []
+
+    def parse(path: Path) -> pd.DataFrame:
+        calls.append(path)
+        return Loter.read_loter_segments(path)
+
+    parse.calls = calls
+    return parse
+
+
+def _write(path: Path, body: str) -> None:
+    path.write_text(HEADER + body, encoding="utf-8")
+
+
+def test_second_load_hits_cache(tmp_path, counted_parser):
+    txt = tmp_path / "seg.txt"
+    _write(txt, "1\t100\t200\tA\n2\t300\t400\tB\n")
+    first = load_table(txt, counted_parser, tag="t", cache_dir=tmp_path / "cache")
+    again = load_table(txt, counted_parser, tag="t", cache_dir=tmp_path / "cache")
+    assert len(counted_parser.calls) == 1
+    # 命中时数值列是 np.memmap，只比较内容
+    assert list(again.columns) == list(first.columns)
+    for col in first.columns:
+        assert again[col].astype(str).tolist() == first[col].astype(str).tolist()
+
+
+def test_content_change_invalidates(tmp_path, counted_parser):
+    txt = tmp_path / "seg.txt"
+    _write(txt, "1\t100\t200\tA\n")
+    load_table(txt, counted_parser, tag="t", cache_dir=tmp_path / "cache")
+    # 同样大小、同样 mtime，只有内容不同：靠内容摘要失效
+    st = txt.stat()
+    _write(txt, "1\t100\t200\tB\n")
+    os.utime(txt, ns=(st.st_atime_ns, st.st_mtime_ns))
+    df = load_table(txt, counted_parser, tag="t", cache_dir=tmp_path / "cache")
+    assert len(counted_parser.calls) == 2
+    assert df["ancestry"].astype(str).tolist() == ["B"]
+
+
+def test_mtime_change_invalidates(tmp_path, counted_parser):
+    txt = tmp_path / "seg.txt"
+    _write(txt, "1\t100\t200\tA\n")
+    load_table(txt, counted_parser, tag="t", cache_dir=tmp_path / "cache")
+    st = txt.stat()
+    os.utime(txt, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    load_table(txt, counted_parser, tag="t", cache_dir=tmp_path / "cache")
+    assert len(counted_parser.calls) == 2
+
+
+def test_tag_change_invalidates(tmp_path, counted_parser):
+    txt = tmp_path / "seg.txt"
+    _write(txt, "1\t100\t200\tA\n")
+    load_table(txt, counted_parser, tag="v1", cache_dir=tmp_path / "cache")
+    load_table(txt, counted_parser, tag="v2", cache_dir=tmp_path / "cache")
+    assert len(counted_parser.calls) == 2
+
+
+def test_corrupt_entry_is_reparsed(tmp_path, counted_parser):
+    txt = tmp_path / "seg.txt"
+    _write(txt, "1\t100\t200\tA\n")
+    load_table(txt, counted_parser, tag="t", cache_dir=tmp_path / "cache")
+    (entry,) = (tmp_path / "cache").iterdir()
+    for f in entry.glob("*.npy"):
+        f.write_bytes(b"broken")
+    df = load_table(txt, counted_parser, tag="t", cache_dir=tmp_path / "cache")
+    assert len(counted_parser.calls) == 2
+    assert df["start"].tolist() == [100]
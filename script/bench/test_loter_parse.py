@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Loter.read_loter_segments：坐标列的向量化解析（千分位、科学计数、截断）和报错行号。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import Loter  # noqa: E402
+
+
+def test_coordinates_accept_commas_exponents_and_truncate(tmp_path):
+    txt = tmp_path / "loter_segment.txt"
+    txt.write_text(
+        "Chr\tStart\tEnd\tAncestry\n"
+        "chr1\t1,000\t2,500.9\tA\n"
+        "chr1\t3e3\t4.5e3\tB\n"
+        "chr1\t5000\t5000\tA\n",          # end == start：丢掉
+        encoding="utf-8",
+    )
+    df = Loter.read_loter_segments(txt)
+    assert df["start"].tolist() == [1000, 3000]
+    assert df["end"].tolist() == [2500, 4500]
+
+
+
+def test_bad_coordinates_report_file_line_numbers(tmp_path):
+    txt = tmp_path / "loter_segment.txt"
+    txt.write_text(
+        "\n\nChr\tStart\tEnd\tAncestry\n"
+        "1\t100\t200\tA\n\n"
+        "1\tx\t300\tA\n"
+        "1\t300\ty\tB\n"
+        "1\tz\t500\tA\n",
+        encoding="utf-8",
+    )
+    with pytest.raises(ValueError) as e:
+        Loter.read_loter_segments(txt)
+    msg = str(e.value)
+    assert "Start 列有无法解析的坐标，行号：6, 8" in msg
+    assert "End 列有无法解析的坐标，行号：7" in msg
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+loter_tiles.Pyramid：各层覆盖率按实际合并的行数计算、行颜色缓存的清理，以及导出的瓦片数量。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+from loter_tiles import build_pyramid, export_tiles  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _palette(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANCESTRY_PALETTE", str(tmp_path / "palette.json"))
+
+
+def _df() -> pd.DataFrame:
+    # 30 条染色体：图宽超过高的两倍，行方向比列方向少一层就合并到 1 行
+    rows = [("1", 0, 400_000, "A"), ("1", 600_000, 1_000_000, "B")]
+    rows += [(str(c), 0, 500_000 + 10_000 * c, "AB"[c % 2]) for c in range(2, 31)]
+    return pd.DataFrame(rows, columns=["chr", "start", "end", "ancestry"])
+
+
+@pytest.mark.parametrize("mode", ["blend", "dominant"])
+def test_coverage_uses_actual_merge_factor(mode):
+    pyr = build_pyramid(_df(), bp_per_px=2_000, mode=mode)
+    ch = pyr.chroms[0]
+    deep = ch.counts[0].sum(axis=1)
+    assert len(ch.counts) - 1 < pyr.max_level  # 最粗的几层没有更多行可合并
+    for level in range(pyr.max_level + 1):
+        _, coverage = pyr.row_colors(ch, level)
+        f = 2 ** min(pyr.max_level - level, len(ch.counts) - 1)
+        padded = np.concatenate([deep, np.zeros(-len(deep) % f, dtype=deep.dtype)])
+        covered = padded.reshape(-1, f).sum(axis=1)
+        expected = covered / f if mode == "blend" else (covered > 0).astype(np.float32)
+        np.testing.assert_allclose(coverage, expected, rtol=1e-6)
+        assert coverage.max() <= 1.0
+
+
+def test_clear_cache_drops_one_level_or_all():
+    pyr = build_pyramid(_df(), bp_per_px=2_000)
+    ch = pyr.chroms[0]
+    a, b = pyr.row_colors(ch, 3), pyr.row_colors(ch, 4)
+    assert pyr.row_colors(ch, 3) is a
+    pyr.clear_cache(3)
+    assert pyr.row_colors(ch, 3) is not a
+    assert pyr.row_colors(ch, 4) is b
+    pyr.clear_cache()
+    assert pyr.row_colors(ch, 4) is not b
+
+
+@pytest.mark.parametrize("layout", ["dzi", "xyz"])
+def test_export_writes_every_tile(tmp_path, layout):
+    tile = 64
+    export_tiles(_df(), tmp_path, "t", tile, bp_per_px=20_000, layout=layout)
+    pyr = build_pyramid(_df(), bp_per_px=20_000)
+    z0 = max(l for l in range(pyr.max_level + 1) if max(pyr.level_size(l)) <= tile)
+    first = z0 if layout == "xyz" else 0
+    expected = sum(-(-lw // tile) * -(-lh // tile)
+                   for lw, lh in map(pyr.level_size, range(first, pyr.max_level + 1)))
+    assert len(list(tmp_path.rglob("*.png"))) == expected
+    assert (tmp_path / "viewer.html").exists()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+loter_watch.FragmentCache：片段复用、拼出的 SVG 与整份重画逐字节一致，
+预览图只重画变了的染色体、结果与 Loter.render_raster 逐像素一致。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import Loter  # noqa: E402
+from loter_watch import FragmentCache  # noqa: E402
+
+HEADER = "Chr\tStart\tEnd\tAncestry\n"
+
+
+@pytest.fixture(autouse=True)
+def _palette(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANCESTRY_PALETTE", str(tmp_path / "palette.json"))
+
+
+def _segments(tmp_path: Path, flip_chr: str = "") -> pd.DataFrame:
+    rows = []
+    for c in range(1, 6):
+        for k in range(8):
+            anc = "A" if (c + k) % 3 else "B"
+            if str(c) == flip_chr and k == 3:
+                anc = "B" if anc == "A" else "A"
+            rows.append(f"{c}\t{k * 1000 + 1}\t{k * 1000 + 900}\t{anc}\n")
+    txt = tmp_path / f"seg{flip_chr}.txt"
+    txt.write_text(HEADER + "".join(rows), encoding="utf-8")
+    return Loter.read_loter_segments(txt)
+
+
+@pytest.fixture
+def counted_raster(monkeypatch):
+    calls = []
+    draw = Loter.raster_chromosome
+
+    def counted(canvas, index, i, *args):
+        calls.append(index.chrs[i])
+        draw(canvas, index, i, *args)
+
+    monkeypatch.setattr(Loter, "raster_chromosome", counted)
+    return calls
+
+
+def _pixels(path: Path) -> np.ndarray:
+    return np.asarray(Image.open(path))
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_unchanged_fragments_are_reused(tmp_path, monkeypatch, compact):
+    monkeypatch.setattr(Loter, "SVG_COMPACT", compact)
+    cache = FragmentCache()
+    df = _segments(tmp_path)
+    assert cache.render(df, tmp_path / "a.svg")[:2] == (5, 5)
+    assert cache.render(df, tmp_path / "a.svg")[:2] == (0, 5)
+
+    changed = _segments(tmp_path, flip_chr="2")
+    assert cache.render(changed, tmp_path / "b.svg")[:2] == (1, 5)
+    Loter.generate_svg(changed, tmp_path / "full.svg")
+    assert (tmp_path / "b.svg").read_bytes() == (tmp_path / "full.svg").read_bytes()
+
+
+def test_preview_redraws_only_changed_chromosomes(tmp_path, counted_raster):
+    cache = FragmentCache()
+    cache.render(_segments(tmp_path), tmp_path / "a.svg", tmp_path / "a.png", 400)
+    assert len(counted_raster) == 5
+
+    counted_raster.clear()
+    changed = _segments(tmp_path, flip_chr="3")
+    cache.render(changed, tmp_path / "b.svg", tmp_path / "b.png", 400)
+    assert counted_raster == ["chr3"]
+    Loter.render_raster(changed, {"png": tmp_path / "full.png"}, px_width=400)
+    np.testing.assert_array_equal(_pixels(tmp_path / "b.png"), _pixels(tmp_path / "full.png"))
+
+
+def test_preview_style_change_redraws_everything(tmp_path, monkeypatch, counted_raster):
+    cache = FragmentCache()
+    df = _segments(tmp_path)
+    cache.render(df, tmp_path / "a.svg", tmp_path / "a.png", 400)
+    counted_raster.clear()
+    monkeypatch.setattr(Loter, "CHR_BAR_WIDTH", 20)
+    cache.render(df, tmp_path / "b.svg", tmp_path / "b.png", 400)
+    assert len(counted_raster) == 5
+    Loter.render_raster(df, {"png": tmp_path / "full.png"}, px_width=400)
+    np.testing.assert_array_equal(_pixels(tmp_path / "b.png"), _pixels(tmp_path / "full.png"))
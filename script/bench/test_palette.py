@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+palette：种子表只读、用户表优先、摘要定色跨进程不变，多个进程同时登记新类别不会互相覆盖。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+from palette import SEED_COLORS, SEED_PALETTE_PATH, Palette, digest_color  # noqa: E402
+
+
+def _register(path: str, names: list) -> None:
+    pal = Palette(Path(path))
+    pal.lookup(names)
+    pal.save()
+
+
+def test_seed_colors_match_unified_scheme():
+    import 染色体Loter
+    seed = json.loads(SEED_PALETTE_PATH.read_text(encoding="utf-8"))
+    assert seed == SEED_COLORS
+    assert {k: v.upper() for k, v in 染色体Loter.ANCESTRY_COLORS_UNIFIED.items()} == SEED_COLORS
+
+
+def test_user_table_overrides_seed_and_seed_is_never_written(tmp_path):
+    seed = tmp_path / "seed.json"
+    seed.write_text(json.dumps({"Mo-OD": "#111111", "Angus": "#222222"}), encoding="utf-8")
+    user = tmp_path / "user.json"
+    user.write_text(json.dumps({"Angus": "#333333"}), encoding="utf-8")
+    before = seed.read_bytes()
+
+    pal = Palette(user, seed=seed)
+    assert pal.color("Mo-OD") == "#111111"
+    assert pal.color("Angus") == "#333333"
+    assert pal.color("Charolais") == SEED_COLORS["Charolais"]
+    assert pal.color("Yak") == digest_color("Yak")
+    pal.save()
+    assert seed.read_bytes() == before
+    assert json.loads(user.read_text(encoding="utf-8")) == {"Angus": "#333333", "Yak": digest_color("Yak")}
+
+
+def test_save_keeps_hand_edited_colors(tmp_path):
+    user = tmp_path / "user.json"
+    pal = Palette(user, seed=None)
+    pal.color("Yak")
+    # 登记之后、保存之前，用户手改了同一个类别
+    user.write_text(json.dumps({"Yak": "#ABCDEF"}), encoding="utf-8")
+    pal.save()
+    assert json.loads(user.read_text(encoding="utf-8")) == {"Yak": "#ABCDEF"}
+    assert pal.color("Yak") == "#ABCDEF"
+
+
+def test_digest_color_is_stable_across_processes():
+    code = "import sys; sys.path.insert(0, sys.argv[1]); from palette import digest_color; print(digest_color('Hereford'))"
+    out = {subprocess.run([sys.executable, "-c", code, str(PLOTS_DIR)], capture_output=True, text=True,
+                          env={**os.environ, "PYTHONHASHSEED": str(seed)}).stdout.strip()
+           for seed in (1, 2, 3)}
+    assert out == {digest_color("Hereford")}
+
+
+def test_concurrent_saves_keep_every_name(tmp_path):
+    user = tmp_path / "user.json"
+    batches = [[f"Anc{w}_{k}" for k in range(5)] for w in range(6)]
+    with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+        list(pool.map(_register, [str(user)] * len(batches), batches))
+    saved = json.loads(user.read_text(encoding="utf-8"))
+    assert saved == {n: digest_color(n) for batch in batches for n in batch}
+    assert not list(tmp_path.glob("*.tmp*"))
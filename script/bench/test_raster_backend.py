@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+raster_backend.RasterCanvas：marker 盖章的合成结果、连接线，以及 --raster numpy
+相对 SVG 路径的时间和内存。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+from raster_backend import RasterCanvas  # noqa: E402
+
+
+def _stamp_naive(canvas: RasterCanvas, x, y, mask, colors) -> np.ndarray:
+    """逐个 marker、逐个像素依次混合"""
+    out = canvas.rgba.copy()
+    s = canvas.scale
+    for xi, yi, c in zip(x, y, colors):
+        cx, cy = int(np.rint(xi * s)), int(np.rint(yi * s))
+        for (r, k), a in np.ndenumerate(mask):
+            rr, cc = cy + r, cx + k
+            if a > 0 and 0 <= rr < out.shape[0] and 0 <= cc < out.shape[1]:
+                dst = out[rr, cc, :3].astype(np.float64)
+                out[rr, cc, :3] = np.rint(dst + (np.asarray(c, dtype=np.float64) - dst) * a)
+    return out
+
+
+@pytest.mark.parametrize("seed", range(16))
+def test_stamp_matches_sequential_blending(seed):
+    rng = np.random.default_rng(seed)
+    canvas = RasterCanvas(30, 30, 1.0)
+    n = int(rng.integers(1, 40))
+    x = rng.integers(-6, 30, n).astype(np.float64)
+    y = rng.integers(-6, 30, n).astype(np.float64)
+    if seed % 2:
+        x[:] = x[0]  # 同一列（一条染色体右侧的 marker）大量重叠
+    mask = canvas.triangle_mask(8, 7) if seed % 4 else canvas.rect_mask(5, 4)
+    colors = rng.integers(0, 256, (n, 3)).astype(np.uint8)
+    expected = _stamp_naive(canvas, x, y, mask, colors)
+    canvas.stamp(x, y, mask, colors)
+    # 逐个混合每步都取整，批量合成只在最后取整
+    assert np.abs(canvas.rgba.astype(int) - expected.astype(int)).max() <= 1
+
+
+def test_stamp_overlap_shows_lower_marker_through_soft_edge():
+    canvas = RasterCanvas(20, 20, 1.0)
+    mask = np.array([[0.5, 1.0]])
+    canvas.stamp(np.array([1.0, 2.0]), np.array([3.0, 3.0]), mask,
+                 np.array([[255, 0, 0], [0, 0, 255]], dtype=np.uint8))
+    # (3, 2)：先被红色完全盖住，再叠半透明蓝色
+    assert canvas.rgba[3, 1, :3].tolist() == [255, 128, 128]
+    assert canvas.rgba[3, 2, :3].tolist() == [128, 0, 128]
+    assert canvas.rgba[3, 3, :3].tolist() == [0, 0, 255]
+
+
+def test_lines_endpoints_and_later_line_wins():
+    canvas = RasterCanvas(20, 20, 1.0)
+    canvas.lines(np.array([2.0, 2.0]), np.array([5.0, 2.0]), np.array([12.0, 12.0]), np.array([5.0, 12.0]),
+                 np.array([[255, 0, 0], [0, 0, 255]], dtype=np.uint8))
+    red = np.all(canvas.rgba[..., :3] == [255, 0, 0], axis=-1)
+    blue = np.all(canvas.rgba[..., :3] == [0, 0, 255], axis=-1)
+    assert np.flatnonzero(red[5]).tolist() == [2, 3, 4, 6, 7, 8, 9, 10, 11, 12]
+    # 对角线每步走一个像素，含两端点；与横线交点归后画的蓝线
+    assert [(r, c) for r, c in zip(*np.nonzero(blue))] == [(k, k) for k in range(2, 13)]
+
+
+def test_lines_clip_to_canvas():
+    canvas = RasterCanvas(10, 10, 1.0)
+    canvas.lines(np.array([-5.0]), np.array([3.0]), np.array([50.0]), np.array([3.0]),
+                 np.array([[0, 0, 0]], dtype=np.uint8))
+    assert (canvas.rgba[3, :, :3] == 0).all()
+
+
+# ---------- 与 SVG 路径对比 ----------
+
+def _redraw_input(tmp_path: Path, n: int):
+    import 染色体Loter
+    from bench_plots import synth_segments
+    txt = tmp_path / f"seg_{n}.txt"
+    synth_segments(n, 2, "discrete", 0).to_csv(txt, sep="\t", index=False, float_format="%.4f")
+    return 染色体Loter.read_segments(txt)
+
+
+def _best_time(func, repeat: int = 2) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak(func) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_numpy_raster_scales_like_svg(tmp_path, monkeypatch):
+    import 染色体Loter
+    monkeypatch.setenv("ANCESTRY_PALETTE", str(tmp_path / "palette.json"))
+    px = 3000
+    small, large = _redraw_input(tmp_path, 2_000), _redraw_input(tmp_path, 16_000)
+    svg = lambda df: 染色体Loter.generate_svg(df, tmp_path / "out.svg")
+    raster = lambda df: 染色体Loter.render_raster(df, px)
+
+    # 内存：除了画布量级的缓冲（RGBA、owner 表、导出时的图像副本），不随 marker 数增长
+    canvas_bytes = px * round(float(染色体Loter.SVG_HEIGHT) * px / float(染色体Loter.SVG_WIDTH)) * 4
+    assert _peak(lambda: raster(large)) <= 4 * canvas_bytes + _peak(lambda: svg(large))
+
+    # 时间：多出的 segment 带来的耗时与 SVG 路径同一量级
+    d_raster = _best_time(lambda: raster(large)) - _best_time(lambda: raster(small))
+    d_svg = _best_time(lambda: svg(large)) - _best_time(lambda: svg(small))
+    assert d_raster <= 4 * d_svg + 0.25
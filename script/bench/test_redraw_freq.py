@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+染色体Loter.freq_e4（整列数值截断到万分位）与原来逐行按字符串切 4 位小数的结果一致。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import 染色体Loter as redraw  # noqa: E402
+
+
+def _old_freq_key(val: str) -> str:
+    """改成数值解析之前的 _freq_key_from_str（原样保留，作为对照）"""
+    s = str(val).strip()
+    if "e" in s.lower():
+        d = Decimal(s)
+        k = int(d * Decimal("10000"))
+        out = Decimal(k) / Decimal("10000")
+        return f"{out:.4f}"
+    if "." in s:
+        a, b = s.split(".", 1)
+    else:
+        a, b = s, ""
+    b = (b + "0000")[:4]
+    return f"{a}.{b}"
+
+
+def _old_e4(values) -> list:
+    return [int(_old_freq_key(v).replace(".", "")) for v in values]
+
+
+def _new_e4(values) -> list:
+    return redraw.freq_e4(pd.Series(values, dtype=object)).tolist()
+
+
+def test_table_keys_round_trip():
+    keys = sorted(set(redraw.FREQ_TO_COLOR_ORIGINAL) | set(redraw.FREQ_TO_COLOR_UNIFIED))
+    assert _new_e4(keys) == _old_e4(keys)
+
+
+@pytest.mark.parametrize("digits", [1, 2, 3, 4, 5, 6, 8, 10, 14])
+def test_random_decimals_truncate_like_strings(digits):
+    rng = np.random.default_rng(digits)
+    n = rng.integers(0, 10 ** digits + 1, 2000)
+    values = [f"{k / 10 ** digits:.{digits}f}" for k in n.tolist()]
+    assert _new_e4(values) == _old_e4(values)
+
+
+def test_edge_forms():
+    values = [
+        "0", "1", "1.0", "0.5", ".5", " 0.7333 ", "0.73339", "0.7333999999",
+        "7.3339e-1", "5E-1", "1e0", "0.00009", "0.99999",
+        "0.99999999999999999999", "0.73330000000000000001",   # 超过 15 位：逐行精确截断
+    ]
+    assert _new_e4(values) == _old_e4(values)
+
+
+def test_unparseable_is_minus_one():
+    assert _new_e4(["abc", "", "0.5"]) == [-1, -1, 5000]
+
+
+def test_lookup_fills_reports_every_missing_value():
+    key = next(iter(redraw.FREQ_TO_COLOR_UNIFIED))
+    freq = pd.Series([key, "0.12345678", "abc", "0.12345678"], dtype=object)
+    df = pd.DataFrame({"Frequency": freq, "freq_e4": redraw.freq_e4(freq)})
+    missing = redraw.freq_color_table("unified")[df["freq_e4"].clip(0, redraw.FREQ_SCALE)] == ""
+    if not missing[1]:
+        pytest.skip("0.1234 恰好在配色表里")
+    with pytest.raises(KeyError) as e:
+        redraw.lookup_fills(df, "unified")
+    msg = str(e.value)
+    assert "0.12345678（2 行）" in msg and "abc（1 行）" in msg and "共 3 行" in msg
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+染色体Loter 定点整数 y 坐标引擎：_fmt_fixed 与 _fmt_y / _fmt_c 的格式一致，
+row_geometry 的 fixed 与 decimal 两套引擎逐字符一致。
+
+用法：python -m pytest -q script/bench
+"""
+
+from __future__ import annotations
+
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PLOTS_DIR = Path(__file__).resolve().parent.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import 染色体Loter as redraw  # noqa: E402
+
+
+@pytest.mark.parametrize("places, fmt", [(12, redraw._fmt_y), (3, redraw._fmt_c)])
+def test_fmt_fixed_matches_decimal_format(places, fmt):
+    rng = np.random.default_rng(places)
+    q = rng.integers(0, 10 ** (places + 4), 5000)
+    # 整数、末尾带 0、位数变化的边界
+    q[:6] = [0, 1, 10 ** places, 10 ** places + 10, 10 ** (places + 3) - 1, 10 ** (places + 1)]
+    q[6:200] = q[6:200] // 10 ** places * 10 ** places
+    got = redraw._fmt_fixed(q, places)
+    assert got == [fmt(Decimal(int(v)).scaleb(-places)) for v in q.tolist()]
+    assert all(type(s) is str for s in got)
+
+
+def test_fmt_fixed_empty():
+    assert redraw._fmt_fixed(np.array([], dtype=np.int64), 12) == []
+
+
+@pytest.mark.parametrize("places", [12, 3])
+def test_fixed_engine_matches_decimal(tmp_path, places):
+    from bench_plots import synth_segments
+    txt = tmp_path / "seg.txt"
+    synth_segments(3000, 2, "discrete", 1).to_csv(txt, sep="\t", index=False, float_format="%.4f")
+    df = redraw.read_segments(txt)
+    markers = redraw.marker_table()
+    fixed = redraw.row_geometry(df, markers, places=places, engine="fixed")
+    dec = redraw.row_geometry(df, markers, places=places, engine="decimal")
+    assert fixed == dec
+
+
+def test_fixed_engine_fallback_rows_match_decimal(tmp_path):
+    # 指数写法解析不了、中心太靠上（减去半边长为负）的 marker 只补算 marker 三列
+    from bench_plots import synth_segments
+    txt = tmp_path / "seg.txt"
+    synth_segments(200, 2, "discrete", 2).to_csv(txt, sep="\t", index=False, float_format="%.4f")
+    df = redraw.read_segments(txt)
+    layout = redraw.chrom_layout()
+    chr_num = layout.marker_chr[layout.rows(df)][:3]
+    start, end = (df[c].to_numpy(dtype=np.int64)[:3] for c in ("Start", "End"))
+    keys = redraw._pack_keys(chr_num, start, end)
+    text = np.array(["1.5e2", "2.0", "123.456"])
+    o = np.argsort(keys)
+    markers = redraw.MarkerTable(keys[o], text[o], np.array([redraw._parse_m15(t) for t in text[o]]))
+    for places in (12, 3):
+        fixed = redraw.row_geometry(df, markers, places=places, engine="fixed", layout=layout)
+        dec = redraw.row_geometry(df, markers, places=places, engine="decimal", layout=layout)
+        assert fixed == dec
+        assert fixed.marker_lo[1].startswith("-")
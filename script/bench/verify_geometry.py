@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+染色体Loter 两套 y 坐标引擎的一致性检查：定点整数（fixed）vs 逐行 Decimal（decimal）。
+
+- 逐列比较 row_geometry 的输出字符串（默认 SVG 的 12 位小数、--compact 的 3 位小数），
+  列出每一个不同的坐标（行号、染色体、Start/End、两边的值）
+- 再用两套引擎各写一份完整 SVG（默认 + 紧凑），逐字节比较，不同就报告第一个不同的位置
+- 顺便给出两套引擎的耗时
+- 另外核对图例渐变 LUT（NumPy 整列计算）与逐级 _gradient_color 的结果
+任何不一致退出码为 1。
+
+用法：
+  python script/bench/verify_geometry.py --txt loter_segment.txt          # 参考图的 TXT
+  python script/bench/verify_geometry.py --synth 100k                     # 合成数据（marker 走段中心回退）
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+HERE = Path(__file__).resolve().parent
+PLOTS_DIR = HERE.parent / "plots"
+sys.path.insert(0, str(PLOTS_DIR))
+
+import 染色体Loter as redraw  # noqa: E402
+
+FIELDS = ("y1", "y2", "y_center", "marker", "marker_lo", "marker_hi")
+
+
+def compare_columns(df, markers, places: int, show: int) -> int:
+    t = time.perf_counter()
+    fmt = {12: redraw._fmt_y, 3: redraw._fmt_c}[places]
+    fixed = redraw._geometry_fixed(df, markers, places, fmt, redraw.chrom_layout())
+    t_fixed = time.perf_counter() - t
+    if fixed is None:
+        print(f"[FAIL] places={places}：定点引擎的前提不满足（会退回 Decimal），没有可比较的结果")
+        return 1
+    t = time.perf_counter()
+    dec = redraw.row_geometry(df, markers, places=places, engine="decimal")
+    t_dec = time.perf_counter() - t
+
+    diffs: List[tuple] = []
+    for name in FIELDS:
+        for k, (a, b) in enumerate(zip(getattr(dec, name), getattr(fixed, name))):
+            if a != b:
+                diffs.append((k, name, a, b))
+    print(f"[INFO] places={places}：{len(df)} 行 × {len(FIELDS)} 列，decimal {t_dec:.3f}s / fixed {t_fixed:.3f}s"
+          f"（{t_dec / max(t_fixed, 1e-9):.1f}x），marker 缺映射 {fixed.missing} 行")
+    for k, name, a, b in diffs[:show]:
+        r = df.iloc[k]
+        print(f"  行 {k}（{r['Chr']}:{r['Start']}-{r['End']}）{name}: decimal={a} fixed={b}")
+    if diffs:
+        print(f"[FAIL] places={places}：{len(diffs)} 个坐标不一致")
+    else:
+        print(f"[OK] places={places}：所有坐标一致")
+    return len(diffs)
+
+
+def _first_diff(a: bytes, b: bytes) -> int:
+    n = min(len(a), len(b))
+    for k in range(n):
+        if a[k] != b[k]:
+            return k
+    return n
+
+
+def compare_svgs(df, scheme: str, compact: bool, out_dir: Path) -> int:
+    paths = {}
+    log = io.StringIO()
+    for engine in ("decimal", "fixed"):
+        paths[engine] = out_dir / f"{'compact' if compact else 'default'}_{engine}.svg"
+        with contextlib.redirect_stdout(log):
+            redraw.generate_svg(df, paths[engine], scheme=scheme, compact=compact, engine=engine)
+    # 两套引擎打印的提示（如 marker 映射缺失）是一样的，只转出一次
+    for line in dict.fromkeys(log.getvalue().splitlines()):
+        print(line)
+    a, b = paths["decimal"].read_bytes(), paths["fixed"].read_bytes()
+    label = "紧凑 SVG" if compact else "默认 SVG"
+    if a == b:
+        print(f"[OK] {label}逐字节一致（{len(a)} 字节，blake2b {hashlib.blake2b(a, digest_size=8).hexdigest()}）")
+        return 0
+    k = _first_diff(a, b)
+    print(f"[FAIL] {label}不一致：第一个不同在字节 {k}")
+    print(f"  decimal: {a[max(0, k - 60):k + 60]!r}")
+    print(f"  fixed  : {b[max(0, k - 60):k + 60]!r}")
+    return 1
+
+
+def compare_gradient(scheme: str) -> int:
+    lut = redraw.gradient_lut(scheme)
+    n = len(lut)
+    bad = [i for i in range(n) if lut[i] != redraw._gradient_color(i, n - 1, scheme)]
+    if bad:
+        i = bad[0]
+        print(f"[FAIL] 渐变 LUT（{scheme}）{len(bad)} 级不一致，第 {i} 级：LUT={lut[i]} 逐级={redraw._gradient_color(i, n - 1, scheme)}")
+        return 1
+    print(f"[OK] 渐变 LUT（{scheme}）{n} 级全部一致，linearGradient 需要 {len(redraw.gradient_stops(scheme))} 个 stop")
+    return 0
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="染色体Loter：定点整数引擎与 Decimal 引擎的逐字节一致性检查")
+    p.add_argument("--txt", type=str, default=None, help="loter_segment.txt（参考图的数据）")
+    p.add_argument("--synth", type=str, default=None, help="改用合成数据，如 100k（见 bench_plots.py）")
+    p.add_argument("--scheme", type=str, choices=["original", "unified"], default="unified")
+    p.add_argument("--show", type=int, default=20, help="最多列出多少个不一致的坐标")
+    p.add_argument("--keep", type=str, default=None, help="把两套引擎写出的 SVG 留在这个目录")
+    args = p.parse_args()
+
+    if args.synth:
+        from bench_plots import _parse_size, synth_file
+        txt = synth_file(_parse_size(args.synth), 2, "discrete", 0)
+    elif args.txt:
+        txt = Path(args.txt)
+    else:
+        raise SystemExit("需要 --txt 或 --synth")
+
+    df = redraw.read_segments(txt)
+    markers = redraw.marker_table()
+    bad = compare_gradient(args.scheme)
+    for places in (12, 3):
+        bad += compare_columns(df, markers, places, args.show)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(args.keep) if args.keep else Path(tmp)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for compact in (False, True):
+            bad += compare_svgs(df, args.scheme, compact, out_dir)
+
+    raise SystemExit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,32 @@
 
 from __future__ import annotations
 
+import argparse
+import glob
+import io
+import json
+import multiprocessing as mp
+import os
 import re
 import math
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 
+import numpy as np
 import pandas as pd
 
+import instrument
+from loter_cache import load_table
+from palette import get_palette
+from raster_backend import RasterCanvas, parse_colors
+from svg_writer import SvgWriter
+
 # =========================
 # 0) CONFIG：你只需要改这里
 # =========================
@@ -21,12 +39,18 @@ import pandas as pd
 TXT_PATH = r"E:\桌面\武汉数据\乌珠穆沁白牛\文章图汇总\测试\loter_segment.txt"   # TODO: 改成你的 loter_segment.txt 路径
 OUT_DIR = r"E:桌面\武汉数据\乌珠穆沁白牛\文章图汇总\测试"                 # TODO: 改成你的输出文件夹
 BASENAME = "loter"              # 输出文件名（不含后缀）
+SVGZ = False                    # True：矢量图输出为 gzip 压缩的 .svgz（体积小很多，cairosvg 可直接读）
+# True：紧凑 SVG——每条染色体每种颜色合并成一个 <path>，样式进 CSS 类，胶囊/clipPath 共用一份
+# （文件小很多；不同颜色的段如果互相重叠，叠放次序会变成按颜色分层）
+SVG_COMPACT = False
 
 # --- 高清输出控制（推荐用“物理宽度 + dpi”） ---
 DPI = 600
 FIG_WIDTH_CM = 18.0        # 论文常用：16~18cm（双栏图或单栏宽）
 # 如果你想按像素宽度，直接设定 PX_WIDTH 并把 FIG_WIDTH_CM 设为 None
 PX_WIDTH: Optional[int] = None
+# 位图怎么画："cairosvg" = 先写 SVG 再光栅化；"numpy" = 直接画进数组（大数据量快很多）
+RASTER_BACKEND = "cairosvg"
 
 # --- 图形样式（像论文图的关键：留白 + 圆角 + 细边线） ---
 CANVAS_PADDING = 60        # 画布边距（px）
@@ -38,15 +62,30 @@ SHOW_CHR_LABEL = True
 LABEL_FONT_SIZE = 14
 TITLE = ""                 # 你想加标题就写字符串，不要就留空
 
-# ancestry 颜色：你可以按自己的类别改（不存在的类别会自动分配稳定颜色）
+# --- LOD：按目标输出分辨率（DPI + FIG_WIDTH_CM / PX_WIDTH）精简亚像素 segment ---
+# None       ：关闭，逐段输出（与原来一致）
+# "dominant" ：不足 1 像素的混杂段折叠成覆盖 bp 最多的 ancestry
+# "blend"    ：不足 1 像素的混杂段按覆盖 bp 加权混合颜色
+LOD_MODE: Optional[str] = None
+LOD_MODES = ("dominant", "blend")
+LOD_MIN_PX = 1.0           # 小于这个设备像素数的段/间隙视为看不见
+
+# ancestry 颜色：你可以按自己的类别改（不在这里的类别查 ancestry_palette.json，
+# 还没登记的自动分配稳定颜色并写进用户颜色表，见 palette.user_palette_path）
 USER_COLOR_MAP: Dict[str, str] = {
     # "Mo-OD": "#d62728",
     # "Mo-AN": "#1f77b4",
 }
+PALETTE_PATH: Optional[str] = None   # 用户颜色表；None = 环境变量 ANCESTRY_PALETTE 或 ~/.cache/loter/
 
-# 可选：输出 jpg
-EXPORT_JPG = True
+# 位图输出格式：png / jpg / tiff / webp 任选（只光栅化一次，再分别编码）
+RASTER_FORMATS: Tuple[str, ...] = ("png", "jpg")
 JPG_QUALITY = 95  # 1-95
+WEBP_QUALITY = 95  # 1-100
+
+# 解析缓存：同一个 TXT 只解析一次，之后只改颜色/版式时秒读（见 loter_cache.py）
+USE_PARSE_CACHE = True
+CACHE_DIR: Optional[str] = None   # None = 环境变量 LOTER_CACHE_DIR，或 TXT 旁边的 .loter_cache/
 
 
 # =========================
@@ -60,68 +99,201 @@ def _normalize_chr_name(s: str) -> str:
         s = "chr" + s
     return s
 
-def _smart_int(x) -> int:
-    # 允许 1,234,567 这种格式
-    if pd.isna(x):
-        return 0
-    s = str(x).strip().replace(",", "")
-    return int(float(s))
+def _parse_coords(col: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    向量化把一列坐标转成 int64（整列一次完成，不逐格调用 Python）：
+    - 允许 1,234,567 / 1.5e6 这种写法，小数部分向 0 截断
+    - 空值（NaN）按 0 处理，之后会被 end > start 过滤掉
+    - 返回 (坐标, 无法解析的掩码)；由 read_loter_segments 汇总所有块、所有列后换成文件行号一起报错
+    """
+    if pd.api.types.is_integer_dtype(col):
+        return col.to_numpy(dtype=np.int64), np.zeros(len(col), dtype=bool)
 
-def read_loter_segments(txt_path: Path) -> pd.DataFrame:
+    if pd.api.types.is_numeric_dtype(col):
+        vals = col.to_numpy(dtype=np.float64)
+        bad = np.isinf(vals)
+    else:
+        # 读入时已用 thousands="," 解析了千分位；这里只剩混有杂值的列
+        vals = np.array(pd.to_numeric(col, errors="coerce"), dtype=np.float64)
+        present = col.notna().to_numpy()
+        retry = np.isnan(vals) & present
+        if retry.any():
+            text = col[retry].astype(str).str.strip().str.replace(",", "", regex=False)
+            vals[retry] = pd.to_numeric(text, errors="coerce").to_numpy(dtype=np.float64)
+        bad = (np.isnan(vals) & present) | np.isinf(vals)
+
+    vals = np.nan_to_num(np.where(bad, 0.0, vals), nan=0.0)
+    return np.trunc(vals).astype(np.int64), bad
+
+
+def _data_line_numbers(txt_path: Path, sep: str, rows: np.ndarray) -> Dict[int, int]:
     """
-    尽量兼容常见 loter_segment.txt：
-    - 分隔符可以是 tab 或空格（多个空格）
-    - 列名可能是 Chr/chr/chrom, Start/End, ancestry/Anc/Source 等
+    read_csv 的数据行序号（跳过空行后从 0 数）-> 文件行号（从 1 数）。只在报错时扫一遍文件。
+    空行判定与 C 引擎一致：tab 分隔时只含空格的行跳过（含 tab 的不跳过），空白分隔时只含空白的行都跳过。
+    """
+    want = set(int(r) for r in rows)
+    blank = (lambda ln: not ln.strip()) if sep != "\t" else (lambda ln: not ln.strip(" \r\n"))
+    found: Dict[int, int] = {}
+    k = -1  # 第一行非空行是表头
+    with open(txt_path, "r", encoding="utf-8", errors="ignore") as fh:
+        for lineno, line in enumerate(fh, 1):
+            if blank(line):
+                continue
+            if k in want:
+                found[k] = lineno
+                if len(found) == len(want):
+                    break
+            k += 1
+    return found
+
+# 嗅探表头时读取的字节数；分块读取时每块的行数（内存占用只和块大小有关）
+SNIFF_BYTES = 64 * 1024
+CHUNK_ROWS = 500_000
+
+# 各关键列可接受的别名（比较前先去空白、转小写）
+COLUMN_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "chr": ("chr", "chrom", "chromosome"),
+    "start": ("start", "begin", "from"),
+    "end": ("end", "stop", "to"),
+    "ancestry": ("ancestry", "anc", "source", "pop", "label"),
+}
+# 可选列：没有就填 NaN
+OPTIONAL_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "frequency": ("frequency", "freq"),
+}
+
+def _sniff_format(txt_path: Path) -> Tuple[str, Dict[str, str]]:
     """
-    raw = txt_path.read_text(encoding="utf-8", errors="ignore").strip().splitlines()
-    if not raw:
+    只读文件开头几 KB，判断分隔符并找出关键列。
+    返回 (sep, {规范列名: 文件里的原始列名})
+    """
+    with open(txt_path, "r", encoding="utf-8", errors="ignore") as fh:
+        head = fh.read(SNIFF_BYTES)
+    lines = [ln for ln in head.splitlines() if ln.strip()]
+    if not lines:
         raise ValueError("输入文件为空。")
 
-    # 用 pandas 自动推断分隔符：优先 tab，否则用多个空格
-    # 先尝试 tab
-    try:
-        df = pd.read_csv(txt_path, sep="\t", engine="python")
-        if df.shape[1] < 3:
-            raise ValueError
-    except Exception:
-        df = pd.read_csv(txt_path, sep=r"\s+", engine="python")
-
-    # 规范列名
-    cols = {c: re.sub(r"\s+", "", str(c)).lower() for c in df.columns}
-    df = df.rename(columns={c: cols[c] for c in df.columns})
-
-    # 寻找关键列
-    def pick(*cands: str) -> Optional[str]:
+    # 优先 tab（表头能切出 >= 3 列），否则按多个空白切分
+    header = lines[0]
+    names = header.split("\t")
+    sep = "\t"
+    if len(names) < 3:
+        names = header.split()
+        sep = r"\s+"
+
+    normalized = {re.sub(r"\s+", "", n).lower(): n for n in names}
+    picked: Dict[str, str] = {}
+    for key, cands in {**COLUMN_ALIASES, **OPTIONAL_ALIASES}.items():
         for c in cands:
-            if c in df.columns:
-                return c
-        return None
-
-    chr_col = pick("chr", "chrom", "chromosome")
-    start_col = pick("start", "begin", "from")
-    end_col = pick("end", "stop", "to")
-    anc_col = pick("ancestry", "anc", "source", "pop", "label")
+            if c in normalized:
+                picked[key] = normalized[c]
+                break
 
-    if not (chr_col and start_col and end_col and anc_col):
+    if not all(k in picked for k in COLUMN_ALIASES):
         raise ValueError(
             f"无法识别列名。需要类似 chr/start/end/ancestry。\n"
-            f"当前列：{list(df.columns)}"
+            f"当前列：{list(normalized)}"
         )
+    return sep, picked
 
+def _map_labels(col: pd.Series, func) -> pd.Categorical:
+    """
+    先转 category，只对去重后的类别调用 func（每个类别一次，而不是每格一次）。
+    结果也是 category，拼接时内存只和类别数有关。
+    """
+    cat = col.astype("category").cat
+    codes = cat.codes.to_numpy()
+    mapped = [func(str(c)) for c in cat.categories]
+    if (codes < 0).any():
+        # 空值按字符串 "nan" 处理，放在 lookup 末尾，对应 code = -1
+        mapped.append(func("nan"))
+    uniq = sorted(set(mapped))
+    pos = {u: i for i, u in enumerate(uniq)}
+    lookup = np.array([pos[m] for m in mapped], dtype=np.int32)
+    return pd.Categorical.from_codes(lookup[codes], categories=uniq)
+
+def _normalize_chunk(chunk: pd.DataFrame, cols: Dict[str, str],
+                     bad_rows: Dict[str, List[np.ndarray]]) -> pd.DataFrame:
+    """规范化一块；坐标解析不了的行把数据行序号（chunk 的 index，跨块连续）记进 bad_rows[列名]"""
+    start, bad_start = _parse_coords(chunk[cols["start"]])
+    end, bad_end = _parse_coords(chunk[cols["end"]])
+    rows = chunk.index.to_numpy()
+    for key, bad in (("start", bad_start), ("end", bad_end)):
+        if bad.any():
+            bad_rows.setdefault(cols[key], []).append(rows[bad])
     out = pd.DataFrame({
-        "chr": df[chr_col].map(_normalize_chr_name),
-        "start": df[start_col].map(_smart_int),
-        "end": df[end_col].map(_smart_int),
-        "ancestry": df[anc_col].astype(str).str.strip(),
+        "chr": _map_labels(chunk[cols["chr"]], _normalize_chr_name),
+        "start": start,
+        "end": end,
+        "ancestry": _map_labels(chunk[cols["ancestry"]], str.strip),
     })
+    if "frequency" in cols:
+        out["frequency"] = pd.to_numeric(chunk[cols["frequency"]], errors="coerce").to_numpy(dtype=np.float64)
+    else:
+        out["frequency"] = np.nan
+    return out[out["end"] > out["start"]]
+
+
+def _raise_bad_coords(txt_path: Path, sep: str, bad_rows: Dict[str, List[np.ndarray]]) -> None:
+    """所有列、所有块里无法解析的坐标一起报，行号是文件里的真实行号（含表头和空行）"""
+    per_col = {name: np.concatenate(parts) for name, parts in bad_rows.items()}
+    lines = _data_line_numbers(txt_path, sep, np.concatenate(list(per_col.values())))
+    msgs = []
+    for name, rows in per_col.items():
+        nums = sorted(lines.get(int(r), int(r) + 2) for r in rows)
+        shown = ", ".join(str(n) for n in nums[:20])
+        more = f" 等共 {len(nums)} 行" if len(nums) > 20 else ""
+        msgs.append(f"{name} 列有无法解析的坐标，行号：{shown}{more}")
+    raise ValueError("；".join(msgs))
 
-    # 清理
-    out = out[out["end"] > out["start"]].copy()
-    out.sort_values(["chr", "start", "end"], inplace=True)
-    out.reset_index(drop=True, inplace=True)
-    if out.empty:
+def read_loter_segments(txt_path: Path) -> pd.DataFrame:
+    """
+    尽量兼容常见 loter_segment.txt：
+    - 分隔符可以是 tab 或空格（多个空格）
+    - 列名可能是 Chr/chr/chrom, Start/End, ancestry/Anc/Source 等
+    - 可选 Frequency/freq 列（没有则为 NaN）
+    只扫描一遍文件：先嗅探开头几 KB，再用 C 引擎按块读取（只读需要的列）。
+    """
+    sep, cols = _sniff_format(txt_path)
+
+    reader = pd.read_csv(
+        txt_path,
+        sep=sep,
+        engine="c",
+        usecols=list(cols.values()),
+        dtype={cols["chr"]: "category", cols["ancestry"]: "category"},
+        thousands=",",
+        encoding="utf-8",
+        encoding_errors="ignore",
+        chunksize=CHUNK_ROWS,
+    )
+    bad_rows: Dict[str, List[np.ndarray]] = {}
+    parts = [_normalize_chunk(chunk, cols, bad_rows) for chunk in reader]
+    if bad_rows:
+        _raise_bad_coords(txt_path, sep, bad_rows)
+    parts = [p for p in parts if not p.empty]
+    if not parts:
         raise ValueError("清洗后没有有效 segment（end <= start 的行被剔除了）。")
-    return out
+
+    chr_cat = pd.api.types.union_categoricals([p["chr"] for p in parts], sort_categories=True)
+    start = np.concatenate([p["start"].to_numpy(dtype=np.int64) for p in parts])
+    end = np.concatenate([p["end"].to_numpy(dtype=np.int64) for p in parts])
+    anc_cat = pd.api.types.union_categoricals([p["ancestry"] for p in parts], sort_categories=True)
+    freq = np.concatenate([p["frequency"].to_numpy(dtype=np.float64) for p in parts])
+    del parts
+
+    # 类别已按字典序排好，直接对 codes 做 lexsort，等价于按 chr/start/end 排序
+    order = np.lexsort((end, start, chr_cat.codes))
+    return pd.DataFrame({
+        "chr": chr_cat[order],
+        "start": start[order],
+        "end": end[order],
+        "ancestry": anc_cat[order],
+        "frequency": freq[order],
+    })
+
+# 解析逻辑（输出列/类型）改了就改这个标签，旧缓存自然失效
+PARSE_CACHE_TAG = "loter-v1"
 
 def natural_chr_key(chr_name: str) -> Tuple[int, str]:
     """
@@ -144,21 +316,17 @@ def natural_chr_key(chr_name: str) -> Tuple[int, str]:
 # 2) 颜色分配（稳定、好看）
 # =========================
 
-def _stable_color(name: str) -> str:
+def build_color_map(labels: List[str]) -> Dict[str, str]:
     """
-    给未知 ancestry 一个稳定颜色（不依赖 matplotlib）
+    USER_COLOR_MAP 优先；其余类别查共享颜色表（palette.py / ancestry_palette.json），
+    没登记过的按名字摘要定色并写回，保证每次运行、每个工作进程颜色都一致。
     """
-    # 取 hash 产生 H 值，固定饱和度和亮度，避免太浅太黑
-    h = (abs(hash(name)) % 360)
-    s = 65
-    l = 45
-    return f"hsl({h}, {s}%, {l}%)"
-
-def build_color_map(labels: List[str]) -> Dict[str, str]:
+    palette = get_palette(Path(PALETTE_PATH) if PALETTE_PATH else None)
     cmap = dict(USER_COLOR_MAP)
     for lb in labels:
         if lb not in cmap:
-            cmap[lb] = _stable_color(lb)
+            cmap[lb] = palette.color(lb)
+    palette.save()
     return cmap
 
 
@@ -166,6 +334,175 @@ def build_color_map(labels: List[str]) -> Dict[str, str]:
 # 3) SVG 生成（像论文图）
 # =========================
 
+@dataclass
+class SegmentIndex:
+    """
+    按自然染色体顺序排好的 segment 数组（染色体内部保持原有行序）：
+    第 i 条染色体的 segment 是 [offsets[i], offsets[i+1])。
+    排版和绘图共用，只建一次。
+    """
+    chrs: List[str]
+    offsets: np.ndarray        # len(chrs) + 1
+    start: np.ndarray          # int64
+    end: np.ndarray            # int64
+    anc_code: np.ndarray       # 指向 labels 的下标
+    labels: List[str]          # ancestry 类别（字典序）
+    chr_len: np.ndarray        # 每条染色体 end 的最大值
+
+    def span(self, i: int) -> slice:
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    # ---- 区间查询（第一次用到某条染色体时才建，之后常驻） ----
+
+    @cached_property
+    def _intervals(self) -> Dict[str, "ChrIntervals"]:
+        return {}
+
+    def intervals(self, chr_name: str) -> "ChrIntervals":
+        chr_name = _normalize_chr_name(chr_name)
+        iv = self._intervals.get(chr_name)
+        if iv is None:
+            if chr_name not in self.chrs:
+                raise KeyError(f"没有这条染色体：{chr_name}")
+            iv = self._intervals[chr_name] = ChrIntervals.build(self, self.chrs.index(chr_name))
+        return iv
+
+    def lookup(self, chr_name: str, positions) -> np.ndarray:
+        """positions 处的 segment 行号（指向本索引的数组）；不在任何 segment 内为 -1"""
+        iv = self.intervals(chr_name)
+        j = iv.find(positions)
+        return np.where(j >= 0, iv.row[np.maximum(j, 0)], -1)
+
+    def overlap(self, chr_name: str, qs: int, qe: int) -> Tuple["ChrIntervals", slice]:
+        """与 [qs, qe) 相交的 segment：返回 (该染色体的区间表, 切片)，切片取出来的都是视图"""
+        iv = self.intervals(chr_name)
+        return iv, iv.overlap(qs, qe)
+
+    def annotate(self, chr_names, positions) -> pd.Categorical:
+        """
+        批量注释（如 10 万个 SNP）：每个位置所在 segment 的 ancestry，不在 segment 内为 NaN。
+        按染色体分组后每组一次 searchsorted，没有逐行循环。
+        """
+        chr_names = pd.Series(chr_names, dtype="category")
+        positions = np.asarray(positions, dtype=np.int64)
+        codes = np.full(len(positions), -1, dtype=np.int64)
+        for k, c in enumerate(chr_names.cat.categories):
+            if _normalize_chr_name(c) not in self.chrs:
+                continue
+            sel = np.flatnonzero(chr_names.cat.codes.to_numpy() == k)
+            iv = self.intervals(c)
+            j = iv.find(positions[sel])
+            codes[sel] = np.where(j >= 0, iv.code[np.maximum(j, 0)], -1)
+        return pd.Categorical.from_codes(codes, categories=self.labels)
+
+@dataclass
+class ChrIntervals:
+    """
+    一条染色体的 segment 按 start 排序后的数组。
+    区间按半开 [start, end) 算，和 ancestry_matrix.paint_bins 涂箱的规则一致：相邻段首尾相接时，
+    接点属于后一段。
+    已经按 start 排好序时（read_loter_segments 的输出就是）直接是 SegmentIndex 数组的视图。
+    """
+    start: np.ndarray
+    end: np.ndarray
+    code: np.ndarray           # ancestry 下标
+    row: np.ndarray            # 在 SegmentIndex 数组里的行号
+    max_end: np.ndarray        # end 的前缀最大值，处理互相重叠的 segment
+
+    @classmethod
+    def build(cls, index: SegmentIndex, i: int) -> "ChrIntervals":
+        sl = index.span(i)
+        start, end, code = index.start[sl], index.end[sl], index.anc_code[sl]
+        row = np.arange(sl.start, sl.stop, dtype=np.int64)
+        if np.any(start[1:] < start[:-1]):
+            o = np.argsort(start, kind="stable")
+            start, end, code, row = start[o], end[o], code[o], row[o]
+        return cls(start, end, code, row, np.maximum.accumulate(end))
+
+    @cached_property
+    def _end_table(self) -> List[np.ndarray]:
+        """
+        end 的稀疏表：第 k 层第 i 项是 end[i-2^k+1 .. i] 的最大值（i < 2^k-1 的位置不用）。
+        只有 segment 嵌套、find 出现回溯时才建，n log n 个 int64。
+        """
+        table = [self.end]
+        w = 1
+        while 2 * w <= len(self.end):
+            prev = table[-1]
+            cur = prev.copy()
+            cur[w:] = np.maximum(prev[w:], prev[:-w])
+            table.append(cur)
+            w *= 2
+        return table
+
+    def find(self, positions) -> np.ndarray:
+        """每个位置所在 segment 的下标（起点最靠后的那个）；不在任何 segment 内为 -1"""
+        pos = np.asarray(positions, dtype=np.int64)
+        j = np.searchsorted(self.start, pos, side="right") - 1
+        jj = np.maximum(j, 0)
+        hit = (j >= 0) & (pos < self.end[jj])
+        # 候选段没盖住、但前面有更长的段盖住（只有 segment 互相嵌套时才会出现）：
+        # 往前找最后一个 end > pos 的段。在稀疏表上从大到小按 2^k 跳过整块 end <= pos 的段，
+        # 所有未命中的位置一起跳，每层一次向量运算
+        miss = np.flatnonzero((j >= 0) & ~hit & (pos < self.max_end[jj]))
+        if len(miss):
+            cur, p = j[miss], pos[miss]
+            table = self._end_table
+            for k in range(len(table) - 1, -1, -1):
+                w = 1 << k
+                ok = cur - w + 1 >= 0
+                step = ok.copy()
+                step[ok] = table[k][cur[ok]] <= p[ok]
+                cur[step] -= w
+            j[miss] = cur
+            hit[miss] = True
+        return np.where(hit, j, -1)
+
+    def overlap(self, qs: int, qe: int) -> slice:
+        """
+        与 [qs, qe) 相交的 segment 的切片。segment 互不重叠时是精确结果；
+        有嵌套时切片里可能夹着不相交的段，用 end[sl] > qs 再筛一下即可。
+        """
+        lo = int(np.searchsorted(self.max_end, qs, side="right"))
+        hi = int(np.searchsorted(self.start, qe, side="left"))
+        return slice(lo, max(lo, hi))
+
+def category_codes(col: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """
+    分类列 -> (codes, 实际出现过的类别)，类别按字典序。
+    公开给 ancestry_summary 等按类别码做 bincount 的脚本用，保证各脚本的编码顺序一致。
+    """
+    cat = col if isinstance(col.dtype, pd.CategoricalDtype) else col.astype("category")
+    cat = cat.cat.remove_unused_categories()
+    # 外部传进来的 DataFrame，类别不一定是字典序，这里统一一下
+    cat = cat.cat.reorder_categories(sorted(cat.cat.categories, key=str))
+    return cat.cat.codes.to_numpy().astype(np.int64), [str(c) for c in cat.cat.categories]
+
+def build_segment_index(df: pd.DataFrame) -> SegmentIndex:
+    chr_codes, chr_names = category_codes(df["chr"])
+    anc_codes, labels = category_codes(df["ancestry"])
+
+    # 类别码 -> 自然顺序中的名次
+    chrs = sorted(chr_names, key=natural_chr_key)
+    rank = np.empty(len(chr_names), dtype=np.int64)
+    rank[[chr_names.index(c) for c in chrs]] = np.arange(len(chrs))
+    key = rank[chr_codes]
+
+    order = np.argsort(key, kind="stable")
+    counts = np.bincount(key, minlength=len(chrs))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    end = df["end"].to_numpy(dtype=np.int64)[order]
+    return SegmentIndex(
+        chrs=chrs,
+        offsets=offsets,
+        start=df["start"].to_numpy(dtype=np.int64)[order],
+        end=end,
+        anc_code=anc_codes[order],
+        labels=labels,
+        chr_len=np.maximum.reduceat(end, offsets[:-1]),
+    )
+
 @dataclass
 class Layout:
     width: int
@@ -175,9 +512,9 @@ class Layout:
     top: int
     bottom: int
 
-def compute_layout(df: pd.DataFrame) -> Layout:
-    chrs = sorted(df["chr"].unique().tolist(), key=natural_chr_key)
-    chr_len = {c: int(df.loc[df["chr"] == c, "end"].max()) for c in chrs}
+def compute_layout(index: SegmentIndex) -> Layout:
+    chrs = index.chrs
+    chr_len = {c: int(L) for c, L in zip(chrs, index.chr_len)}
 
     # 画布宽
     content_w = len(chrs) * CHR_BAR_WIDTH + (len(chrs) - 1) * CHR_GAP
@@ -211,92 +548,298 @@ def svg_header(w: int, h: int) -> List[str]:
         '<rect x="0" y="0" width="100%" height="100%" fill="white"/>'
     ]
 
-def generate_svg(df: pd.DataFrame, out_svg: Path) -> Tuple[Path, Dict[str, str]]:
-    layout = compute_layout(df)
-    chrs = sorted(df["chr"].unique().tolist(), key=natural_chr_key)
+def device_px_per_unit(layout: Layout, px_width: Optional[int] = None) -> float:
+    """SVG 逻辑单位 -> 目标输出的设备像素（与 export_raster 的缩放一致）"""
+    if px_width is None:
+        px_width = PX_WIDTH
+    out_width_px = int(px_width) if px_width is not None else cm_to_px(FIG_WIDTH_CM, DPI)
+    return out_width_px / layout.width
 
-    labels = sorted(df["ancestry"].unique().tolist())
-    color_map = build_color_map(labels)
+def decimate_segments(start: np.ndarray, end: np.ndarray, code: np.ndarray,
+                      palette: np.ndarray, px_per_bp: float,
+                      mode: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    一条染色体的 LOD 精简，返回 (start, end, fills)：
+    1) 相邻、同 ancestry、间隙不足 LOD_MIN_PX 的段合并成一段
+    2) 仍不足 LOD_MIN_PX 的段，按起点所在像素行分组，折叠成一个矩形：
+       颜色取覆盖 bp 最多的 ancestry（dominant），或按 bp 加权混色（blend）
+    两步都按“相邻”判断，所以要求按 start 升序；输入没排好时这里先稳定排序（已排好的只多一次比较）
+    """
+    if mode not in LOD_MODES:
+        raise ValueError(f"LOD_MODE 只能是 None 或 {' / '.join(LOD_MODES)}，收到 {mode!r}")
+    if len(start) == 0:
+        return start, end, palette[code]
+    if np.any(start[1:] < start[:-1]):
+        order = np.argsort(start, kind="stable")
+        start, end, code = start[order], end[order], code[order]
+    seg_bp = (end - start).astype(np.float64)
+
+    gap_px = (start[1:] - end[:-1]) * px_per_bp
+    new_run = np.concatenate([[True], (code[1:] != code[:-1]) | (gap_px >= LOD_MIN_PX)])
+    first = np.flatnonzero(new_run)
+    start, end, code = start[first], np.maximum.reduceat(end, first), code[first]
+    weight = np.add.reduceat(seg_bp, first)
+
+    small = (end - start) * px_per_bp < LOD_MIN_PX
+    row = np.floor(start * px_per_bp).astype(np.int64)
+    # 够大的段各自成组（给一个不会和像素行重复的负数键）
+    key = np.where(small, row, -1 - np.arange(len(start)))
+    new_grp = np.concatenate([[True], key[1:] != key[:-1]])
+    gfirst = np.flatnonzero(new_grp)
+    if len(gfirst) == len(start):
+        return start, end, palette[code]
+
+    gid = np.cumsum(new_grp) - 1
+    k = len(palette)
+    cover = np.bincount(gid * k + code, weights=weight, minlength=len(gfirst) * k).reshape(len(gfirst), k)
+    dominant = palette[cover.argmax(axis=1)]
+    if mode == "blend":
+        rgb = parse_colors(palette).astype(np.float64)
+        mix = np.rint(cover @ rgb / cover.sum(axis=1, keepdims=True)).astype(np.int64)
+        fills = np.array(["#{:02X}{:02X}{:02X}".format(*v) for v in mix.tolist()], dtype=object)
+        # 只有一种 ancestry 的组保持原来的颜色写法
+        pure = np.count_nonzero(cover, axis=1) == 1
+        fills[pure] = dominant[pure]
+    else:
+        fills = dominant
+    return start[gfirst], np.maximum.reduceat(end, gfirst), fills
+
+def segment_geometry(index: SegmentIndex, i: int, L: int, palette: np.ndarray,
+                     bar_top: float, bar_h: float, px_per_unit: float
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """第 i 条染色体的 (y1, seg_h, fills)；SVG 和 NumPy 光栅两条路径共用"""
+    sl = index.span(i)
+    start, end, code = index.start[sl], index.end[sl], index.anc_code[sl]
+    if LOD_MODE:
+        start, end, fills = decimate_segments(start, end, code, palette, bar_h * px_per_unit / L, LOD_MODE)
+    else:
+        fills = palette[code]
+    y1 = bar_top + (start / L) * bar_h
+    y2 = bar_top + (end / L) * bar_h
+    seg_h = np.maximum(0.6, y2 - y1)  # 太短的段也给个最小可见高度
+    return y1, seg_h, fills
 
-    bar_top = layout.top
+def emit_rects(x: int, y1: np.ndarray, seg_h: np.ndarray, fills: np.ndarray) -> Iterator[str]:
+    """
+    一条染色体的分段矩形：y/高度/颜色都是整列数组，按需逐个拼成字符串，
+    不再逐行构造 pandas Series。
+    """
+    head = f'<rect x="{x}" y="'
+    mid = f'" width="{CHR_BAR_WIDTH}" height="'
+    return (
+        f'{head}{a:.3f}{mid}{h:.3f}" fill="{c}" stroke="none"/>'
+        for a, h, c in zip(y1.tolist(), seg_h.tolist(), fills.tolist())
+    )
+
+def svg_preamble(layout: Layout) -> List[str]:
+    """文档头 + 标题"""
+    out = svg_header(layout.width, layout.height)
+    if TITLE:
+        out.append(f'<text x="{layout.width//2}" y="{CANVAS_PADDING+24}" text-anchor="middle" class="title" font-size="18">{TITLE}</text>')
+    return out
+
+def chromosome_fragment(index: SegmentIndex, i: int, layout: Layout,
+                        palette: np.ndarray, px_per_unit: float) -> List[str]:
+    """
+    第 i 条染色体的全部元素：clipPath、胶囊底座、彩色分段、标签。
+    只依赖这条染色体的 segment 和样式参数，watch 模式按染色体缓存的就是它。
+    """
+    c = index.chrs[i]
+    x = layout.chr_x[c]
+    y = bar_top = layout.top
     bar_bottom = layout.height - layout.bottom
-    bar_h = bar_bottom - bar_top
+    h = bar_h = bar_bottom - bar_top
+    r = min(CORNER_RADIUS, CHR_BAR_WIDTH // 2)
 
-    svg: List[str] = []
-    svg += svg_header(layout.width, layout.height)
+    # clipPath：保证彩色分段不会跑出圆角
+    clip_id = f"clip_{c}"
+    out = [
+        '<defs>',
+        f'  <clipPath id="{clip_id}">',
+        f'    <rect x="{x}" y="{y}" width="{CHR_BAR_WIDTH}" height="{h}" rx="{r}" ry="{r}"/>',
+        '  </clipPath>',
+        '</defs>',
+        # 胶囊底座（边框）
+        f'<rect x="{x}" y="{y}" width="{CHR_BAR_WIDTH}" height="{h}" '
+        f'rx="{r}" ry="{r}" fill="white" stroke="black" stroke-width="{STROKE_WIDTH}"/>',
+    ]
 
-    # 标题
-    if TITLE:
-        svg.append(f'<text x="{layout.width//2}" y="{CANVAS_PADDING+24}" text-anchor="middle" class="title" font-size="18">{TITLE}</text>')
+    # 彩色分段（按 bp -> y 映射）
+    L = layout.chr_len[c]
 
-    # 先画每条染色体“胶囊底座”（灰边白底），再画彩色分段（clip 到胶囊形状里）
-    for c in chrs:
-        x = layout.chr_x[c]
-        y = bar_top
-        h = bar_h
-        r = min(CORNER_RADIUS, CHR_BAR_WIDTH // 2)
-
-        # clipPath：保证彩色分段不会跑出圆角
-        clip_id = f"clip_{c}"
-        svg.append('<defs>')
-        svg.append(f'  <clipPath id="{clip_id}">')
-        svg.append(f'    <rect x="{x}" y="{y}" width="{CHR_BAR_WIDTH}" height="{h}" rx="{r}" ry="{r}"/>')
-        svg.append('  </clipPath>')
-        svg.append('</defs>')
+    # 防止除零
+    if L <= 0:
+        return out
 
-        # 胶囊底座（边框）
-        svg.append(
-            f'<rect x="{x}" y="{y}" width="{CHR_BAR_WIDTH}" height="{h}" '
-            f'rx="{r}" ry="{r}" fill="white" stroke="black" stroke-width="{STROKE_WIDTH}"/>'
+    out.append(f'<g clip-path="url(#{clip_id})">')
+    y1, seg_h, fills = segment_geometry(index, i, L, palette, bar_top, bar_h, px_per_unit)
+    out.extend(emit_rects(x, y1, seg_h, fills))
+    out.append('</g>')
+
+    # chr label
+    if SHOW_CHR_LABEL:
+        out.append(
+            f'<text x="{x + CHR_BAR_WIDTH/2}" y="{bar_bottom + 26}" text-anchor="middle" '
+            f'class="chrLabel" font-size="{LABEL_FONT_SIZE}">{c}</text>'
         )
+    return out
 
-        # 彩色分段（按 bp -> y 映射）
-        chr_df = df[df["chr"] == c]
-        L = layout.chr_len[c]
-
-        # 防止除零
-        if L <= 0:
-            continue
-
-        svg.append(f'<g clip-path="url(#{clip_id})">')
-        for _, row in chr_df.iterrows():
-            s = int(row["start"])
-            e = int(row["end"])
-            anc = str(row["ancestry"])
-
-            y1 = bar_top + (s / L) * bar_h
-            y2 = bar_top + (e / L) * bar_h
-            seg_h = max(0.6, y2 - y1)  # 太短的段也给个最小可见高度
-
-            svg.append(
-                f'<rect x="{x}" y="{y1:.3f}" width="{CHR_BAR_WIDTH}" height="{seg_h:.3f}" '
-                f'fill="{color_map.get(anc, _stable_color(anc))}" stroke="none"/>'
-            )
-        svg.append('</g>')
-
-        # chr label
-        if SHOW_CHR_LABEL:
-            svg.append(
-                f'<text x="{x + CHR_BAR_WIDTH/2}" y="{bar_bottom + 26}" text-anchor="middle" '
-                f'class="chrLabel" font-size="{LABEL_FONT_SIZE}">{c}</text>'
-            )
-
-    # 简单 legend（右上角）
-    # 如果类别特别多，你也可以把这段注释掉
+def svg_legend(layout: Layout, labels: List[str], color_map: Dict[str, str]) -> List[str]:
+    """简单 legend（右上角）+ 文档结尾；如果类别特别多，你也可以不画"""
     legend_x = layout.width - CANVAS_PADDING + 10
     legend_y = layout.top
-    svg.append(f'<g transform="translate({legend_x}, {legend_y})">')
-    svg.append(f'<text x="0" y="-10" font-size="14" class="chrLabel">Ancestry</text>')
+    out = [
+        f'<g transform="translate({legend_x}, {legend_y})">',
+        f'<text x="0" y="-10" font-size="14" class="chrLabel">Ancestry</text>',
+    ]
     yy = 10
     for anc in labels:
-        svg.append(f'<rect x="0" y="{yy}" width="14" height="14" fill="{color_map[anc]}" stroke="black" stroke-width="0.4"/>')
-        svg.append(f'<text x="20" y="{yy+12}" font-size="12" class="chrLabel">{anc}</text>')
+        out.append(f'<rect x="0" y="{yy}" width="14" height="14" fill="{color_map[anc]}" stroke="black" stroke-width="0.4"/>')
+        out.append(f'<text x="20" y="{yy+12}" font-size="12" class="chrLabel">{anc}</text>')
         yy += 20
-    svg.append('</g>')
+    out.append('</g>')
+    out.append("</svg>")
+    return out
+
+def _milli(v: int) -> str:
+    """紧凑 SVG 里的数字（以 0.001 为单位的整数）：写成最短的小数，如 1500 -> 1.5，-88 -> -.088"""
+    sign = "-" if v < 0 else ""
+    q, r = divmod(abs(v), 1000)
+    if r == 0:
+        return f"{sign}{q}"
+    frac = f"{r:03d}".rstrip("0")
+    return f"{sign}{q if q else ''}.{frac}"
+
+def compact_fragment(index: SegmentIndex, i: int, layout: Layout, palette: np.ndarray,
+                     px_per_unit: float, fill_class: Dict[str, str]) -> List[str]:
+    """
+    紧凑模式下第 i 条染色体：平移到 x=0 后引用共用的胶囊和 clipPath，
+    同一颜色的所有分段合并成一个 <path>（颜色按第一次出现的顺序）。
+    """
+    c = index.chrs[i]
+    out = [f'<g transform="translate({layout.chr_x[c]} 0)">', '<use xlink:href="#capsule" class="chrBase"/>']
+    bar_top = layout.top
+    bar_bottom = layout.height - layout.bottom
+    L = layout.chr_len[c]
+    if L > 0:
+        y1, seg_h, fills = segment_geometry(index, i, L, palette, bar_top, bar_bottom - bar_top, px_per_unit)
+        # 坐标先取整到 0.001，每段用相对上一段起点的 m 移动（z 之后当前点回到段起点），不会累积误差
+        ya = np.rint(y1 * 1000).astype(np.int64)
+        hh = np.rint(seg_h * 1000).astype(np.int64)
+        d: Dict[str, List[str]] = {}
+        last: Dict[str, int] = {}
+        w = CHR_BAR_WIDTH
+        for a, h, col in zip(ya.tolist(), hh.tolist(), fills.tolist()):
+            parts = d.get(col)
+            if parts is None:
+                d[col] = [f"M0 {_milli(a)}h{w}v{_milli(h)}H0z"]
+            else:
+                parts.append(f"m0 {_milli(a - last[col])}h{w}v{_milli(h)}H0z")
+            last[col] = a
+        for col in d:
+            fill_class.setdefault(col, f"f{len(fill_class)}")
+        out.append('<g clip-path="url(#cap)">')
+        out.extend(f'<path class="{fill_class[col]}" d="{"".join(parts)}"/>' for col, parts in d.items())
+        out.append('</g>')
+    if SHOW_CHR_LABEL:
+        out.append(f'<text x="{CHR_BAR_WIDTH/2}" y="{bar_bottom + 26}" class="chrLabel">{c}</text>')
+    out.append('</g>')
+    return out
+
+def generate_svg_compact(index: SegmentIndex, layout: Layout, labels: List[str],
+                         color_map: Dict[str, str], palette: np.ndarray,
+                         px_per_unit: float, out_svg: Path) -> SvgWriter:
+    """
+    SVG_COMPACT = True 时的输出：
+    - 每条染色体每种颜色一个 <path d="M0 y h W v h H0z ...">，而不是每段一个 <rect>
+    - 填充色、边框、字体都放进 CSS 类，元素上不再重复写样式属性
+    - 胶囊底座和 clipPath 只定义一次，每条染色体用 translate + <use> 复用
+    视觉上与默认输出一致（不同颜色的段互相重叠时叠放次序除外）。
+    """
+    # 先把所有染色体的片段拼好，才知道一共用到哪些颜色（LOD blend 会混出新颜色），CSS 要写在文件开头
+    fill_class: Dict[str, str] = {}
+    frags = [compact_fragment(index, i, layout, palette, px_per_unit, fill_class)
+             for i in range(len(index.chrs))]
+
+    with SvgWriter(out_svg) as svg:
+        svg.writelines(compact_preamble(layout, fill_class))
+        for frag in frags:
+            svg.writelines(frag)
+        svg.writelines(compact_legend(layout, labels, color_map))
+    return svg
+
+def compact_preamble(layout: Layout, fill_class: Dict[str, str]) -> List[str]:
+    """紧凑模式的文档头：CSS 类（含全部填充色）、共用的胶囊和 clipPath、标题"""
+    w, h = layout.width, layout.height
+    r = min(CORNER_RADIUS, CHR_BAR_WIDTH // 2)
+    bar_h = h - layout.bottom - layout.top
+    font = 'font-family:"Times New Roman",Arial,sans-serif'
+    out = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        f'width="{w}" height="{h}" viewBox="0 0 {w} {h}">',
+        '<defs>',
+        '<style type="text/css"><![CDATA[',
+        f'.chrLabel{{{font};font-size:{LABEL_FONT_SIZE}px;text-anchor:middle}}',
+        f'.title{{{font};font-weight:600;font-size:18px;text-anchor:middle}}',
+        f'.lg{{{font};font-size:12px}}',
+        '.lgt{font-size:14px}',
+        f'.chrBase{{fill:white;stroke:black;stroke-width:{STROKE_WIDTH}}}',
+        '.sw{stroke:black;stroke-width:0.4}',
+        *(f'.{k}{{fill:{col}}}' for col, k in fill_class.items()),
+        ']]></style>',
+        f'<rect id="capsule" x="0" y="{layout.top}" width="{CHR_BAR_WIDTH}" height="{bar_h}" rx="{r}" ry="{r}"/>',
+        f'<clipPath id="cap"><rect y="{layout.top}" width="{CHR_BAR_WIDTH}" height="{bar_h}" rx="{r}" ry="{r}"/></clipPath>',
+        '</defs>',
+        '<rect width="100%" height="100%" fill="white"/>',
+    ]
+    if TITLE:
+        out.append(f'<text x="{w//2}" y="{CANVAS_PADDING+24}" class="title">{TITLE}</text>')
+    return out
 
-    svg.append("</svg>")
-    out_svg.parent.mkdir(parents=True, exist_ok=True)
-    out_svg.write_text("\n".join(svg), encoding="utf-8")
+def compact_legend(layout: Layout, labels: List[str], color_map: Dict[str, str]) -> List[str]:
+    """紧凑模式的图例 + 文档尾"""
+    legend = [
+        f'<g transform="translate({layout.width - CANVAS_PADDING + 10} {layout.top})">',
+        '<text y="-10" class="lg lgt">Ancestry</text>',
+    ]
+    for k, anc in enumerate(labels):
+        yy = 10 + 20 * k
+        legend.append(f'<rect y="{yy}" width="14" height="14" class="sw" fill="{color_map[anc]}"/>')
+        legend.append(f'<text x="20" y="{yy+12}" class="lg">{anc}</text>')
+    legend += ['</g>', '</svg>']
+    return legend
+
+def generate_svg(df: pd.DataFrame, out_svg: Path, index: Optional[SegmentIndex] = None,
+                 layout: Optional[Layout] = None) -> Tuple[Path, Dict[str, str]]:
+    """index / layout 已经算好时直接传进来（基准测试分阶段计时），不再重算"""
+    with instrument.stage("layout"):
+        if index is None:
+            index = build_segment_index(df)
+        if layout is None:
+            layout = compute_layout(index)
+
+        labels = index.labels
+        color_map = build_color_map(labels)
+        # ancestry 类别码 -> 颜色，按码直接取
+        palette = np.array([color_map[lb] for lb in labels], dtype=object)
+        px_per_unit = device_px_per_unit(layout)
+
+    if SVG_COMPACT:
+        svg = generate_svg_compact(index, layout, labels, color_map, palette, px_per_unit, out_svg)
+        instrument.count("svg_elements", svg.count)
+        instrument.count("chromosomes", len(index.chrs))
+        return out_svg, color_map
+
+    # 逐元素写进文件（.svgz 自动压缩），不在内存里攒整份文档
+    with SvgWriter(out_svg) as svg:
+        svg.writelines(svg_preamble(layout))
+        # 先画每条染色体“胶囊底座”（灰边白底），再画彩色分段（clip 到胶囊形状里）
+        for i in range(len(index.chrs)):
+            svg.writelines(chromosome_fragment(index, i, layout, palette, px_per_unit))
+        svg.writelines(svg_legend(layout, labels, color_map))
+    instrument.count("svg_elements", svg.count)
+    instrument.count("chromosomes", len(index.chrs))
     return out_svg, color_map
 
 
@@ -307,7 +850,37 @@ def generate_svg(df: pd.DataFrame, out_svg: Path) -> Tuple[Path, Dict[str, str]]
 def cm_to_px(cm: float, dpi: int) -> int:
     return int(round((cm / 2.54) * dpi))
 
-def export_raster(svg_path: Path, out_png: Optional[Path], out_jpg: Optional[Path]) -> None:
+# 后缀 -> (Pillow 格式名, 是否需要先转 RGB)
+_PIL_FORMATS: Dict[str, Tuple[str, bool]] = {
+    "png": ("PNG", False),
+    "jpg": ("JPEG", True),
+    "jpeg": ("JPEG", True),
+    "tif": ("TIFF", False),
+    "tiff": ("TIFF", False),
+    "webp": ("WEBP", False),
+}
+
+def _encode(img, fmt: str, out_path: Path) -> Path:
+    pil_name, need_rgb = _PIL_FORMATS[fmt]
+    im = img.convert("RGB") if need_rgb else img.copy()
+    opts: Dict[str, object] = {"dpi": (DPI, DPI)}
+    if pil_name == "JPEG":
+        opts.update(quality=int(JPG_QUALITY), optimize=True)
+    elif pil_name == "WEBP":
+        opts.update(quality=int(WEBP_QUALITY))
+    elif pil_name == "TIFF":
+        opts.update(compression="tiff_lzw")
+    im.save(out_path, pil_name, **opts)
+    return out_path
+
+def export_raster(svg_path: Path, outputs: Dict[str, Path]) -> None:
+    """
+    outputs：{格式后缀: 输出路径}，例如 {"png": ..., "jpg": ...}。
+    cairosvg 只光栅化一次（结果留在内存里），各格式再由 Pillow 在线程池里并行编码，
+    不再写临时 PNG。
+    """
+    if not outputs:
+        return
     try:
         import cairosvg  # type: ignore
     except Exception as e:
@@ -319,53 +892,296 @@ def export_raster(svg_path: Path, out_png: Optional[Path], out_jpg: Optional[Pat
     else:
         out_width_px = cm_to_px(FIG_WIDTH_CM, DPI)
 
-    if out_png:
-        cairosvg.svg2png(
-            url=str(svg_path),
-            write_to=str(out_png),
-            output_width=out_width_px
-        )
-        print(f"[OK] PNG 已输出：{out_png} （宽度约 {out_width_px}px，对应 {DPI}dpi）")
-
-    if out_jpg:
-        # 先用 cairosvg 生成临时 png，再用 pillow 转 jpg（可控质量）
-        tmp_png = svg_path.with_suffix(".tmp_for_jpg.png")
-        cairosvg.svg2png(
-            url=str(svg_path),
-            write_to=str(tmp_png),
-            output_width=out_width_px
-        )
-        try:
-            from PIL import Image
-        except Exception as e:
-            raise SystemExit("需要安装 pillow 才能导出 JPG：pip install pillow") from e
+    with instrument.stage("cairosvg"):
+        png_bytes: bytes = cairosvg.svg2png(url=str(svg_path), output_width=out_width_px)
 
-        img = Image.open(tmp_png).convert("RGB")
-        img.save(out_jpg, "JPEG", quality=int(JPG_QUALITY), optimize=True)
-        tmp_png.unlink(missing_ok=True)
-        print(f"[OK] JPG 已输出：{out_jpg} （quality={JPG_QUALITY}，宽度约 {out_width_px}px）")
+    # PNG 直接落盘 cairosvg 的结果，不用解码再编码
+    if "png" in outputs:
+        outputs["png"].write_bytes(png_bytes)
+        print(f"[OK] PNG 已输出：{outputs['png']} （宽度约 {out_width_px}px，对应 {DPI}dpi）")
+
+    others = {fmt: path for fmt, path in outputs.items() if fmt != "png"}
+    if not others:
+        return
+    try:
+        from PIL import Image
+    except Exception as e:
+        raise SystemExit("需要安装 pillow 才能导出 JPG/TIFF/WebP：pip install pillow") from e
+
+    with instrument.stage("encode"):
+        img = Image.open(io.BytesIO(png_bytes))
+        img.load()
+        _encode_all(img, others)
+
+def _encode_all(img, outputs: Dict[str, Path]) -> None:
+    """同一张 Pillow 图像按各格式在线程池里并行编码"""
+    unknown = [fmt for fmt in outputs if fmt not in _PIL_FORMATS]
+    if unknown:
+        raise ValueError(f"不支持的位图格式：{unknown}（可选 png/jpg/tiff/webp）")
+    with ThreadPoolExecutor(max_workers=len(outputs)) as pool:
+        futures = {fmt: pool.submit(_encode, img, fmt, path) for fmt, path in outputs.items()}
+        for fmt, fut in futures.items():
+            print(f"[OK] {fmt.upper()} 已输出：{fut.result()} （宽度约 {img.width}px，对应 {DPI}dpi）")
+
+def raster_base(index: SegmentIndex, layout: Layout, labels: List[str],
+                color_map: Dict[str, str], px_per_unit: float) -> RasterCanvas:
+    """白底画布 + 标题、染色体标签、图例：不随 segment 变化的部分"""
+    canvas = RasterCanvas(layout.width, layout.height, px_per_unit)
+    if TITLE:
+        canvas.text(layout.width // 2, CANVAS_PADDING + 24, TITLE, 18, "middle", family="serif")
+    if SHOW_CHR_LABEL:
+        label_y = layout.height - layout.bottom + 26
+        for c in index.chrs:
+            canvas.text(layout.chr_x[c] + CHR_BAR_WIDTH / 2, label_y, c, LABEL_FONT_SIZE, "middle", family="serif")
+
+    legend_x = layout.width - CANVAS_PADDING + 10
+    legend_y = layout.top
+    canvas.text(legend_x, legend_y - 10, "Ancestry", 14, family="serif")
+    yy = 10
+    for anc in labels:
+        canvas.capsule(legend_x, legend_y + yy, 14, 14, 0, color_map[anc], "black", 0.4)
+        canvas.text(legend_x + 20, legend_y + yy + 12, anc, 12, family="serif")
+        yy += 20
+    return canvas
+
+def raster_chromosome(canvas: RasterCanvas, index: SegmentIndex, i: int, layout: Layout,
+                      palette: np.ndarray, px_per_unit: float) -> None:
+    """
+    第 i 条染色体的胶囊和分段。先把胶囊外框（含描边）范围擦回底色，
+    所以同一块画布上可以只重画变了的染色体（watch 模式的预览图）。
+    """
+    c = index.chrs[i]
+    x = layout.chr_x[c]
+    bar_top = layout.top
+    bar_h = layout.height - layout.bottom - bar_top
+    r = min(CORNER_RADIUS, CHR_BAR_WIDTH // 2)
+    pad = STROKE_WIDTH + 1
+    canvas.clear(x - pad, bar_top - pad, x + CHR_BAR_WIDTH + pad, bar_top + bar_h + pad)
+    canvas.capsule(x, bar_top, CHR_BAR_WIDTH, bar_h, r, "white", "black", STROKE_WIDTH)
+    L = layout.chr_len[c]
+    if L > 0:
+        y1, seg_h, fills = segment_geometry(index, i, L, palette, bar_top, bar_h, px_per_unit)
+        canvas.column_fills(x, x + CHR_BAR_WIDTH, y1, y1 + seg_h, parse_colors(fills),
+                            clip=(x, bar_top, CHR_BAR_WIDTH, bar_h, r))
+
+def render_raster(df: pd.DataFrame, outputs: Dict[str, Path], px_width: Optional[int] = None,
+                  index: Optional[SegmentIndex] = None, layout: Optional[Layout] = None) -> Dict[str, str]:
+    """
+    NumPy 光栅后端（RASTER_BACKEND = "numpy"）：不生成/解析 SVG，
+    直接按 compute_layout 的坐标把胶囊和分段画进 RGBA 数组，再编码成各位图格式。
+    px_width 不为 None 时按这个像素宽度出图（watch 模式的预览图）；index / layout 同 generate_svg。
+    返回 ancestry -> 颜色表。
+    """
+    if index is None:
+        index = build_segment_index(df)
+    if layout is None:
+        layout = compute_layout(index)
+    labels = index.labels
+    color_map = build_color_map(labels)
+    palette = np.array([color_map[lb] for lb in labels], dtype=object)
+    px_per_unit = device_px_per_unit(layout, px_width)
+
+    canvas = raster_base(index, layout, labels, color_map, px_per_unit)
+    for i in range(len(index.chrs)):
+        raster_chromosome(canvas, index, i, layout, palette, px_per_unit)
+
+    with instrument.stage("encode"):
+        _encode_all(canvas.to_image(), outputs)
+    return color_map
 
 
 # =========================
-# 5) main
+# 5) 单个样本 / 批量（队列）模式
 # =========================
 
-def main() -> None:
-    txt = Path(TXT_PATH)
-    out_dir = Path(OUT_DIR)
+# 批量模式和 --config 允许覆盖的配置项（就是上面 CONFIG 区域的名字）
+CONFIG_KEYS = (
+    "BASENAME", "SVGZ", "SVG_COMPACT", "DPI", "FIG_WIDTH_CM", "PX_WIDTH", "RASTER_BACKEND",
+    "CANVAS_PADDING", "CHR_BAR_WIDTH", "CHR_GAP", "CORNER_RADIUS", "STROKE_WIDTH",
+    "SHOW_CHR_LABEL", "LABEL_FONT_SIZE", "TITLE", "LOD_MODE", "LOD_MIN_PX",
+    "USER_COLOR_MAP", "PALETTE_PATH", "RASTER_FORMATS", "JPG_QUALITY", "WEBP_QUALITY",
+    "USE_PARSE_CACHE", "CACHE_DIR",
+)
+
+def apply_config(overrides: Dict[str, object]) -> None:
+    """用字典覆盖 CONFIG 区域的常量（批量模式下每个工作进程启动时调用一次）"""
+    unknown = [k for k in overrides if k not in CONFIG_KEYS]
+    if unknown:
+        raise ValueError(f"未知的配置项：{unknown}（可选：{', '.join(CONFIG_KEYS)}）")
+    lod = overrides.get("LOD_MODE")
+    if lod is not None and lod not in LOD_MODES:
+        raise ValueError(f"LOD_MODE 只能是 null 或 {' / '.join(LOD_MODES)}，收到 {lod!r}")
+    for k, v in overrides.items():
+        if k == "RASTER_FORMATS":
+            v = tuple(v)  # JSON 里是 list
+        globals()[k] = v
+
+def load_segments(txt: Path) -> pd.DataFrame:
+    """读 TXT；USE_PARSE_CACHE 打开时走 loter_cache（同一文件只解析一次）"""
+    if USE_PARSE_CACHE:
+        cache_dir = Path(CACHE_DIR) if CACHE_DIR else None
+        return load_table(txt, read_loter_segments, tag=PARSE_CACHE_TAG, cache_dir=cache_dir)
+    return read_loter_segments(txt)
+
+def render_one(txt: Path, out_dir: Path) -> Tuple[pd.DataFrame, Dict[str, str], List[Path]]:
+    """读一个 TXT，输出 SVG + 位图到 out_dir；返回 (segments, 颜色表, 输出文件列表)"""
     out_dir.mkdir(parents=True, exist_ok=True)
+    out_svg = out_dir / f"{BASENAME}.{'svgz' if SVGZ else 'svg'}"
+    raster_outputs = {fmt: out_dir / f"{BASENAME}_{DPI}dpi.{fmt}" for fmt in RASTER_FORMATS}
 
-    out_svg = out_dir / f"{BASENAME}.svg"
-    out_png = out_dir / f"{BASENAME}_{DPI}dpi.png"
-    out_jpg = out_dir / f"{BASENAME}_{DPI}dpi.jpg" if EXPORT_JPG else None
-
-    df = read_loter_segments(txt)
+    with instrument.stage("read"):
+        df = load_segments(txt)
+    instrument.count("rows_parsed", len(df))
+    instrument.snapshot("after_read")
     print(f"[INFO] 读取到 {len(df)} 条 segments，染色体数：{df['chr'].nunique()}，ancestry 类别数：{df['ancestry'].nunique()}")
 
-    svg_path, cmap = generate_svg(df, out_svg)
+    with instrument.stage("svg"):
+        svg_path, cmap = generate_svg(df, out_svg)
     print(f"[OK] SVG 已输出：{svg_path}")
 
-    export_raster(svg_path, out_png, out_jpg)
+    with instrument.stage("raster"):
+        if RASTER_BACKEND == "numpy":
+            render_raster(df, raster_outputs)
+        else:
+            export_raster(svg_path, raster_outputs)
+    instrument.snapshot("after_raster")
+    return df, cmap, [svg_path, *raster_outputs.values()]
+
+def _render_sample(sample: str, txt: Path, out_root: Path) -> Dict[str, object]:
+    """
+    批量模式的工作函数：先输出到 out_root/.<sample>.partial/（profile 报告也写在里面），
+    全部成功后整目录改名为 out_root/<sample>/；失败则删掉临时目录，不会留下半套文件。
+    """
+    t0 = time.perf_counter()
+    final_dir = out_root / sample
+    part_dir = out_root / f".{sample}.partial"
+    shutil.rmtree(part_dir, ignore_errors=True)
+    record: Dict[str, object] = {"sample": sample, "input": str(txt)}
+    if instrument.requested():
+        instrument.enable()
+    try:
+        df, cmap, outputs = render_one(txt, part_dir)
+        instrument.write_report(part_dir / f"{BASENAME}.profile.json", sample=sample)
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(part_dir, final_dir)
+        record.update(
+            status="ok",
+            segments=len(df),
+            chromosomes=int(df["chr"].nunique()),
+            colors=cmap,
+            outputs=[str(final_dir / p.name) for p in outputs],
+        )
+    except Exception as e:
+        shutil.rmtree(part_dir, ignore_errors=True)
+        record.update(status="failed", error=f"{type(e).__name__}: {e}")
+    record["seconds"] = round(time.perf_counter() - t0, 3)
+    return record
+
+def collect_inputs(pattern: Optional[str] = None, manifest: Optional[Path] = None) -> List[Tuple[str, Path]]:
+    """
+    返回 [(样本名, TXT 路径)]：
+    - manifest：每行一个路径，或 “样本名<TAB>路径”；# 开头为注释
+    - pattern ：glob（如 E:/cohort/*/loter_segment.txt）；文件名都相同时用上级目录名当样本名
+    """
+    items: List[Tuple[str, Path]] = []
+    if manifest is not None:
+        for line in Path(manifest).read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split("\t")
+            path = Path(parts[-1].strip())
+            items.append((parts[0].strip() if len(parts) > 1 else path.stem, path))
+    if pattern is not None:
+        paths = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+        same_name = len({p.name for p in paths}) < len(paths)
+        items += [(p.parent.name if same_name else p.stem, p) for p in paths]
+
+    names = [n for n, _ in items]
+    dup = sorted({n for n in names if names.count(n) > 1})
+    if dup:
+        raise ValueError(f"样本名重复：{dup}（请在 manifest 里写明 样本名<TAB>路径）")
+    return items
+
+def run_batch(items: List[Tuple[str, Path]], out_root: Path, workers: int,
+              config: Optional[Dict[str, object]] = None) -> Path:
+    """
+    多进程批量出图：所有样本共用同一份配置（颜色/版式），每个工作进程只导入一次
+    pandas / cairosvg。最后写 out_root/batch_manifest.json 汇总每个样本的结果；
+    工作进程崩溃（BrokenProcessPool）或中途中断时，没拿到结果的样本记为失败，汇总照样写出。
+    """
+    out_root.mkdir(parents=True, exist_ok=True)
+    config = dict(config or {})
+
+    def failed(name: str, txt: Path, error: str) -> Dict[str, object]:
+        return {"sample": name, "input": str(txt), "status": "failed", "error": error, "seconds": 0.0}
+
+    records: List[Dict[str, object]] = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                 initializer=apply_config, initargs=(config,)) as pool:
+            futures = {}
+            for name, txt in items:
+                try:
+                    futures[pool.submit(_render_sample, name, txt, out_root)] = (name, txt)
+                except BrokenProcessPool as e:
+                    records.append(failed(name, txt, f"{type(e).__name__}: {e}"))
+            for fut in as_completed(futures):
+                name, txt = futures[fut]
+                try:
+                    rec = fut.result()
+                except Exception as e:
+                    # 工作进程被杀、初始化失败、结果无法序列化等：只记这个样本失败
+                    rec = failed(name, txt, f"{type(e).__name__}: {e}")
+                records.append(rec)
+                flag = "OK" if rec["status"] == "ok" else "FAIL"
+                print(f"[{flag}] {rec['sample']} （{rec['seconds']}s）{rec.get('error', '')}")
+    finally:
+        done = {r["sample"] for r in records}
+        records += [failed(name, txt, "未完成") for name, txt in items if name not in done]
+        records.sort(key=lambda r: str(r["sample"]))
+        summary = out_root / "batch_manifest.json"
+        summary.write_text(json.dumps({
+            "config": config,
+            "total": len(records),
+            "failed": sum(r["status"] != "ok" for r in records),
+            "samples": records,
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+    return summary
+
+
+# =========================
+# 6) main
+# =========================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from cli import command_parser
+    run(command_parser("karyogram", prog=Path(__file__).name).parse_args(argv))
+
+
+def run(args: argparse.Namespace) -> None:
+    """karyogram 子命令（参数见 cli.py）"""
+    if args.profile is not None:
+        instrument.enable(Path(args.profile) if args.profile else None)
+        # 批量模式的工作进程靠环境变量开启，各自把报告写进样本目录
+        os.environ.setdefault(instrument.PROFILE_ENV, "1")
+    else:
+        instrument.enable_from_env()
+
+    config = json.loads(Path(args.config).read_text(encoding="utf-8")) if args.config else {}
+    apply_config(config)
+    out_dir = Path(args.out_dir or OUT_DIR)
+
+    if args.glob or args.manifest:
+        items = collect_inputs(args.glob, Path(args.manifest) if args.manifest else None)
+        if not items:
+            raise SystemExit("没有找到任何输入文件。")
+        summary = run_batch(items, out_dir, max(1, args.workers), config)
+        print(f"[OK] 批量完成，汇总：{summary}")
+        return
+
+    _, cmap, _ = render_one(Path(TXT_PATH), out_dir)
+    instrument.write_report(out_dir / f"{BASENAME}.profile.json")
 
     # 打印颜色表，方便你在论文里保持一致
     print("\n[INFO] Ancestry -> Color:")
@@ -29,7 +29,8 @@ from __future__ import annotations
 import argparse
 import re
 from collections import defaultdict
-from typing import Dict, Tuple
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 
 def hex_to_rgb(h: str) -> Tuple[int, int, int]:
@@ -120,18 +121,13 @@ def recolor_svg(svg_in: str, new_left: str, new_right: str) -> str:
     return hex_re.sub(_rep, svg_in)
 
 
-def main() -> None:
-    ap = argparse.ArgumentParser(
-        description="对 chromosome.svg 做统一配色映射（保证除颜色外细节完全不变）"
-    )
-    ap.add_argument("--in", dest="in_path", required=True, help="输入 SVG 路径")
-    ap.add_argument("--out", dest="out_path", required=True, help="输出 SVG 路径")
-    ap.add_argument("--new_left", default="#6A51A3",
-                    help="新渐变低端颜色（同时替换 Charolais 的旧色 #ff7f00）")
-    ap.add_argument("--new_right", default="#007C73",
-                    help="新渐变高端颜色（同时替换 Mo-OD 的旧色 #33a02c）")
-    args = ap.parse_args()
+def main(argv: Optional[List[str]] = None) -> None:
+    from cli import command_parser
+    run(command_parser("recolor", prog=Path(__file__).name).parse_args(argv))
+
 
+def run(args: argparse.Namespace) -> None:
+    """recolor 子命令（参数见 cli.py）"""
     svg_in = open(args.in_path, "r", encoding="utf-8").read()
     svg_out = recolor_svg(svg_in, args.new_left, args.new_right)
     with open(args.out_path, "w", encoding="utf-8") as f:
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+python script/plots <子命令> ...（见 cli.py）
+
+按目录运行：脚本之间用平级 import（from cli import ...、import Loter），
+所以先把本目录放进 sys.path，python script/plots 和 python script/plots/__main__.py 都可以；
+script/plots 不是包，不支持 python -m script.plots。
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from cli import main  # noqa: E402
+
+main()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+群体水平的局部祖先矩阵：很多个体的 loter_segment.txt -> 定长分箱（默认 10 kb）的
+uint8 祖先编码矩阵，形状 (bins, individuals)，以 np.memmap 存在磁盘上。
+
+- 编码：0 = 该箱没有 segment 覆盖；1..K = meta.json 里 labels 的顺序
+- 每个箱取箱中点所在的 segment（同一染色体按起点排好序，searchsorted 一次涂完整条）；
+  segment 嵌套/重叠时取覆盖中点、起点最靠后的那段（起点相同取文件里靠后的），见 paint_bins
+- 按个体分块（默认 64 个）在内存里涂好再整块写进 memmap，不会逐列跨步写盘
+- 某个位置有多少动物带 Mo-OD：读一行 / 一段行做列方向规约即可，不用再解析 TXT
+
+用法：
+  python ancestry_matrix.py build --glob "cohort/*/loter_segment.txt" --out cohort_matrix
+  python ancestry_matrix.py freq  --matrix cohort_matrix --window 100000 --out freq.tsv
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from Loter import (PARSE_CACHE_TAG, SegmentIndex, build_segment_index, collect_inputs,
+                   natural_chr_key, read_loter_segments)
+from loter_cache import load_table
+
+MATRIX_NAME = "matrix.u8"
+META_NAME = "meta.json"
+
+BIN_SIZE = 10_000
+BLOCK_INDIVIDUALS = 64
+ROW_CHUNK = 65_536      # freq 规约时每次读入的箱数（控制内存）
+NOCALL = 0
+
+
+def _load(txt: Path, use_cache: bool) -> pd.DataFrame:
+    if use_cache:
+        return load_table(txt, read_loter_segments, tag=PARSE_CACHE_TAG)
+    return read_loter_segments(txt)
+
+
+@dataclass
+class AncestryMatrix:
+    codes: np.ndarray              # memmap，(bins, individuals) uint8
+    bin_size: int
+    chrs: List[str]
+    offsets: np.ndarray            # 第 i 条染色体的箱是 [offsets[i], offsets[i+1])
+    samples: List[str]
+    labels: List[str]              # code = labels.index(label) + 1
+
+    def bins_of(self, chr_name: str) -> slice:
+        i = self.chrs.index(chr_name)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def row(self, chr_name: str, pos: int) -> np.ndarray:
+        """某个位置所有个体的编码（一行）"""
+        sl = self.bins_of(chr_name)
+        b = sl.start + pos // self.bin_size
+        if not sl.start <= b < sl.stop:
+            raise ValueError(f"{chr_name}:{pos} 超出矩阵范围")
+        return self.codes[b]
+
+
+def _covering_segment(s: np.ndarray, e: np.ndarray, n: int, bin_size: int) -> np.ndarray:
+    """
+    有重叠的染色体：每个箱中点被哪个 segment 覆盖（按起点排好序后的下标，-1 = 没有）。
+    按排好的顺序“后写覆盖先写”：覆盖中点的 segment 里取下标最大的，即起点最靠后的那段，
+    外层长段在内层短段结束后仍能涂到自己的箱。只展开每段覆盖的箱，总量 ≈ 箱数 × 重叠深度。
+    区间取半开 [s, e)，取段规则与 Loter.ChrIntervals.find 相同。
+    """
+    half = bin_size // 2
+    # 中点 b*bin_size + half 落在 [s, e) 的箱：b0 <= b < b1
+    b0 = np.clip(-((half - s) // bin_size), 0, n)
+    b1 = np.clip(-((half - e) // bin_size), 0, n)
+    cnt = np.maximum(b1 - b0, 0)
+    seg_idx = np.repeat(np.arange(len(s)), cnt)
+    within = np.arange(int(cnt.sum())) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+    winner = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(winner, np.repeat(b0, cnt) + within, seg_idx)
+    return winner
+
+
+def paint_bins(index: SegmentIndex, chrs: List[str], offsets: np.ndarray,
+               label_code: Dict[str, int], bin_size: int) -> np.ndarray:
+    """
+    一个个体的 SegmentIndex -> 长度 n_bins 的编码向量；每条染色体直接按 index.span 切片。
+    segment 互不重叠时直接 searchsorted；有嵌套/重叠的染色体走 _covering_segment
+    （起点最靠后的覆盖段胜出），结果与按起点顺序逐段涂色、后涂覆盖先涂相同。
+    """
+    out = np.full(int(offsets[-1]), NOCALL, dtype=np.uint8)
+    anc = np.array([label_code[lb] for lb in index.labels], dtype=np.uint8)[index.anc_code]
+    chr_pos = {c: i for i, c in enumerate(chrs)}
+
+    for k, c in enumerate(index.chrs):
+        sl = index.span(k)
+        if sl.start == sl.stop:
+            continue
+        i = chr_pos[c]
+        s, e, a = index.start[sl], index.end[sl], anc[sl]
+        if np.any(s[1:] < s[:-1]):
+            o = np.argsort(s, kind="stable")
+            s, e, a = s[o], e[o], a[o]
+        n = int(offsets[i + 1] - offsets[i])
+        seg = out[offsets[i]:offsets[i + 1]]
+        if np.any(np.maximum.accumulate(e)[:-1] > s[1:]):
+            j = _covering_segment(s, e, n, bin_size)
+            hit = j >= 0
+            seg[hit] = a[j[hit]]
+            continue
+        mid = np.arange(n, dtype=np.int64) * bin_size + bin_size // 2
+        j = np.searchsorted(s, mid, side="right") - 1
+        hit = j >= 0
+        hit[hit] = mid[hit] < e[j[hit]]
+        seg[hit] = a[j[hit]]
+    return out
+
+
+def build_matrix(items: List[Tuple[str, Path]], out_dir: Path,
+                 bin_size: int = BIN_SIZE, block: int = BLOCK_INDIVIDUALS,
+                 use_cache: bool = True) -> AncestryMatrix:
+    """
+    两遍：第一遍读入每个个体、建好 SegmentIndex 并收集染色体长度和 ancestry 类别，
+    第二遍按个体分块涂箱并写进 memmap。第二遍直接用第一遍留下的 SegmentIndex，
+    每个文件只读一次（每段约 24 字节，和矩阵里一个个体的一列同一量级）。
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    chr_len: Dict[str, int] = {}
+    labels = set()
+    indexes: List[SegmentIndex] = []
+    for _, txt in items:
+        index = build_segment_index(_load(txt, use_cache))
+        for c, m in zip(index.chrs, index.chr_len.tolist()):
+            chr_len[c] = max(chr_len.get(c, 0), int(m))
+        labels.update(index.labels)
+        indexes.append(index)
+
+    labels_sorted = sorted(labels)
+    if len(labels_sorted) > 255:
+        raise ValueError(f"ancestry 类别太多（{len(labels_sorted)}），uint8 最多 255 个")
+    label_code = {lb: k + 1 for k, lb in enumerate(labels_sorted)}
+    chrs = sorted(chr_len, key=natural_chr_key)
+    n_bins = [-(-chr_len[c] // bin_size) for c in chrs]
+    offsets = np.concatenate([[0], np.cumsum(n_bins)]).astype(np.int64)
+
+    shape = (int(offsets[-1]), len(items))
+    # 纯二进制 + meta.json（不用 .npy 头），R 的 readBin 也能直接读
+    codes = np.memmap(out_dir / MATRIX_NAME, dtype=np.uint8, mode="w+", shape=shape)
+    for b0 in range(0, len(items), block):
+        chunk = items[b0:b0 + block]
+        buf = np.empty((shape[0], len(chunk)), dtype=np.uint8)
+        for k in range(len(chunk)):
+            buf[:, k] = paint_bins(indexes[b0 + k], chrs, offsets, label_code, bin_size)
+        codes[:, b0:b0 + len(chunk)] = buf
+        print(f"[INFO] 已写入 {b0 + len(chunk)}/{len(items)} 个个体")
+    codes.flush()
+
+    meta = {
+        "shape": list(shape),
+        "dtype": "uint8",
+        "order": "C",
+        "bin_size": bin_size,
+        "chrs": chrs,
+        "chr_lengths": [chr_len[c] for c in chrs],
+        "offsets": offsets.tolist(),
+        "samples": [s for s, _ in items],
+        "labels": labels_sorted,
+        "nocall": NOCALL,
+    }
+    (out_dir / META_NAME).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return AncestryMatrix(codes, bin_size, chrs, offsets, meta["samples"], labels_sorted)
+
+
+def open_matrix(matrix_dir: Path) -> AncestryMatrix:
+    meta = json.loads((Path(matrix_dir) / META_NAME).read_text(encoding="utf-8"))
+    codes = np.memmap(Path(matrix_dir) / MATRIX_NAME, dtype=np.uint8, mode="r",
+                      shape=tuple(meta["shape"]))
+    return AncestryMatrix(codes, int(meta["bin_size"]), meta["chrs"],
+                          np.asarray(meta["offsets"], dtype=np.int64), meta["samples"], meta["labels"])
+
+
+def window_frequencies(mat: AncestryMatrix, window: Optional[int] = None) -> pd.DataFrame:
+    """
+    每个窗口里各 ancestry 占已覆盖（非 0）个体-箱的比例。
+    window 必须是 bin_size 的整数倍；None 表示一个箱一个窗口。
+    """
+    step = 1 if window is None else window // mat.bin_size
+    if step < 1 or (window is not None and window % mat.bin_size):
+        raise ValueError(f"window 必须是 bin_size（{mat.bin_size}）的整数倍")
+
+    k = len(mat.labels)
+    n_bins = mat.codes.shape[0]
+    counts = np.empty((n_bins, k + 1), dtype=np.int64)
+    for r0 in range(0, n_bins, ROW_CHUNK):
+        rows = np.asarray(mat.codes[r0:r0 + ROW_CHUNK])
+        for c in range(k + 1):
+            counts[r0:r0 + len(rows), c] = np.count_nonzero(rows == c, axis=1)
+
+    parts = []
+    for i, chr_name in enumerate(mat.chrs):
+        b0, b1 = int(mat.offsets[i]), int(mat.offsets[i + 1])
+        starts = np.arange(b0, b1, step)
+        win = np.add.reduceat(counts[b0:b1], starts - b0, axis=0)
+        called = win[:, 1:].sum(axis=1)
+        part = pd.DataFrame({
+            "chr": chr_name,
+            "start": (starts - b0) * mat.bin_size,
+            "end": np.minimum(starts - b0 + step, b1 - b0) * mat.bin_size,
+            "n_called": called,
+        })
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for c, lb in enumerate(mat.labels, start=1):
+                part[lb] = win[:, c] / called
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from cli import command_parser
+    run(command_parser("matrix", prog=Path(__file__).name).parse_args(argv))
+
+
+def run(args: argparse.Namespace) -> None:
+    """matrix 子命令（参数见 cli.py）"""
+    if args.cmd == "build":
+        items = collect_inputs(args.glob, Path(args.manifest) if args.manifest else None)
+        if not items:
+            raise SystemExit("没有找到任何输入文件。")
+        mat = build_matrix(items, Path(args.out), args.bin_size or BIN_SIZE,
+                           max(1, args.block or BLOCK_INDIVIDUALS), not args.no_cache)
+        print(f"[OK] 矩阵：{args.out}  {mat.codes.shape[0]} 箱 × {mat.codes.shape[1]} 个体，类别 {mat.labels}")
+    else:
+        freq = window_frequencies(open_matrix(Path(args.matrix)), args.window)
+        freq.to_csv(args.out, sep="\t", index=False, float_format="%.6g")
+        print(f"[OK] 频率表：{args.out}（{len(freq)} 个窗口）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+按 bp 加权的祖先比例汇总：每个个体 × 每条染色体 × 每个 ancestry，以及全基因组。
+
+以前报告里的祖先比例是手算的；这里直接从 segment 表算：
+- Bp         ：该 ancestry 的 segment 总长度（End - Start）
+- Proportion ：Bp / 该染色体（或全基因组）上所有 segment 的总长度
+- Frequency  ：按 segment 长度加权的 Frequency 均值（没有 Frequency 列时为 NA）
+
+一次只处理一个文件（解析 -> bincount 规约 -> 追加写出 -> 丢掉），文件再多内存也不涨。
+输出是长表（tidy）TSV，列名与 祖先比例.R 的习惯一致（Sample / Chr / Ancestry / ...），
+Level 列区分 "chromosome" 和 "genome"（全基因组行的 Chr 为 "genome"）。
+
+用法：
+  python ancestry_summary.py --glob "cohort/*/loter_segment.txt" --out ancestry_summary.tsv
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from Loter import PARSE_CACHE_TAG, category_codes, collect_inputs, natural_chr_key, read_loter_segments
+from loter_cache import load_table
+
+COLUMNS = ["Sample", "Level", "Chr", "Ancestry", "Segments", "Bp", "Proportion", "Frequency"]
+
+
+def summarize_segments(df: pd.DataFrame, sample: str) -> pd.DataFrame:
+    """一个个体的 segment 表 -> 长表（染色体行 + 全基因组行）"""
+    chr_codes, chr_names = category_codes(df["chr"])
+    anc_codes, labels = category_codes(df["ancestry"])
+    n_chr, k = len(chr_names), len(labels)
+
+    length = (df["end"].to_numpy(dtype=np.int64) - df["start"].to_numpy(dtype=np.int64)).astype(np.float64)
+    freq = df["frequency"].to_numpy(dtype=np.float64) if "frequency" in df else np.full(len(df), np.nan)
+    has_f = ~np.isnan(freq)
+
+    key = chr_codes * k + anc_codes
+    size = n_chr * k
+    segs = np.bincount(key, minlength=size).reshape(n_chr, k)
+    bp = np.bincount(key, weights=length, minlength=size).reshape(n_chr, k)
+    fw = np.bincount(key, weights=np.where(has_f, freq * length, 0.0), minlength=size).reshape(n_chr, k)
+    fl = np.bincount(key, weights=np.where(has_f, length, 0.0), minlength=size).reshape(n_chr, k)
+
+    # 全基因组 = 各染色体按列求和，拼在最后一行
+    segs = np.vstack([segs, segs.sum(axis=0)])
+    bp = np.vstack([bp, bp.sum(axis=0)])
+    fw = np.vstack([fw, fw.sum(axis=0)])
+    fl = np.vstack([fl, fl.sum(axis=0)])
+
+    total = bp.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        prop = bp / total
+        mean_f = fw / fl
+
+    order = sorted(range(n_chr), key=lambda i: natural_chr_key(chr_names[i])) + [n_chr]
+    row_chr = np.array(chr_names + ["genome"], dtype=object)[order]
+    level = np.where(np.array(order) == n_chr, "genome", "chromosome")
+
+    keep = segs[order] > 0
+    r, c = np.nonzero(keep)
+    return pd.DataFrame({
+        "Sample": sample,
+        "Level": level[r],
+        "Chr": row_chr[r],
+        "Ancestry": np.array(labels, dtype=object)[c],
+        "Segments": segs[order][keep],
+        "Bp": bp[order][keep].astype(np.int64),
+        "Proportion": prop[order][keep],
+        "Frequency": mean_f[order][keep],
+    }, columns=COLUMNS)
+
+
+def summarize_files(items: List[Tuple[str, Path]], out_tsv: Path, use_cache: bool = True) -> int:
+    """逐个文件汇总并追加写出（先写 .part，全部成功才改名）；返回写出的行数"""
+    part = out_tsv.with_name(out_tsv.name + ".part")
+    rows = 0
+    try:
+        with open(part, "w", encoding="utf-8", newline="") as fh:
+            fh.write("\t".join(COLUMNS) + "\n")
+            for n, (sample, txt) in enumerate(items, start=1):
+                if use_cache:
+                    df = load_table(txt, read_loter_segments, tag=PARSE_CACHE_TAG)
+                else:
+                    df = read_loter_segments(txt)
+                tab = summarize_segments(df, sample)
+                tab.to_csv(fh, sep="\t", index=False, header=False, float_format="%.6g", na_rep="NA")
+                rows += len(tab)
+                print(f"[INFO] {n}/{len(items)} {sample}：{len(df)} 条 segments")
+        os.replace(part, out_tsv)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from cli import command_parser
+    run(command_parser("summary", prog=Path(__file__).name).parse_args(argv))
+
+
+def run(args: argparse.Namespace) -> None:
+    """summary 子命令（参数见 cli.py）"""
+    items = collect_inputs(args.glob, Path(args.manifest) if args.manifest else None)
+    if args.txt:
+        items.append((Path(args.txt).stem, Path(args.txt)))
+    if not items:
+        raise SystemExit("没有找到任何输入文件（--txt / --glob / --manifest）。")
+
+    rows = summarize_files(items, Path(args.out), use_cache=not args.no_cache)
+    print(f"[OK] 汇总表：{args.out}（{len(items)} 个个体，{rows} 行）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+染色体组装（assembly）登记表：画哪些染色体、按什么顺序、各多长（染色体Loter.py / bench 共用）。
+
+以前 染色体Loter.py 把牛 29 条常染色体的长度（CHR_LENGTHS）和 29 个 x 坐标（CHR_X1）写死在脚本里，
+换物种、换组装或者想把 X 画进去都得改常量。
+
+- 内置 DEFAULT_ASSEMBLY：原图用的 29 条常染色体（长度同 ARS-UCD1.2）
+- 其它组装直接读文件：FASTA 索引（.fai：名字 长度 偏移 ...）或 .genome / .chrom.sizes（名字 长度）
+- 名字统一去掉 "chr" 前缀（loter_segment.txt 的 Chr 列也这样处理）；默认只保留“主染色体”：
+  纯数字、X/Y/W/Z，按文件里的顺序；MT、unplaced、NW_/NC_ 之类的 contig 丢掉（primary_only=False 全保留）
+- 同一个文件（路径 + 大小 + mtime 不变）只解析一次
+- 版式（每条染色体的 x、高度比例）由使用方按染色体条数计算，见 染色体Loter.chrom_layout
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+GENOME_SUFFIXES = (".fai", ".genome", ".sizes")
+# 主染色体：去掉 chr 前缀后是纯数字或性染色体
+PRIMARY_RE = re.compile(r"^(\d+|X|Y|W|Z)$", re.IGNORECASE)
+
+
+class Assembly(NamedTuple):
+    name: str
+    chroms: Tuple[str, ...]      # 画图顺序，已去掉 chr 前缀
+    lengths: Tuple[int, ...]
+
+    def chrom_index(self, names: Iterable[str]) -> np.ndarray:
+        """染色体名 -> 在本组装里的序号（0 起）；不认识的为 -1"""
+        pos = _positions(self)
+        return np.array([pos.get(strip_chr(n), -1) for n in names], dtype=np.int64)
+
+
+@lru_cache(maxsize=None)
+def _positions(asm: Assembly) -> Dict[str, int]:
+    return {c: i for i, c in enumerate(asm.chroms)}
+
+
+def strip_chr(name: str) -> str:
+    s = str(name).strip()
+    return s[3:] if s[:3].lower() == "chr" else s
+
+
+def make_assembly(name: str, pairs: Iterable[Tuple[str, int]]) -> Assembly:
+    chroms, lengths = [], []
+    for c, L in pairs:
+        c, L = strip_chr(c), int(L)
+        if L <= 0:
+            raise ValueError(f"{name}：染色体 {c} 的长度必须为正（{L}）")
+        chroms.append(c)
+        lengths.append(L)
+    if not chroms:
+        raise ValueError(f"{name}：没有任何染色体")
+    dup = sorted({c for c in chroms if chroms.count(c) > 1})
+    if dup:
+        raise ValueError(f"{name}：染色体名重复：{', '.join(dup)}")
+    return Assembly(name, tuple(chroms), tuple(lengths))
+
+
+# 原图的 29 条常染色体（长度同 ARS-UCD1.2）
+DEFAULT_ASSEMBLY = "bovine29"
+_BOVINE29 = [
+    ("1", 158534110), ("2", 136231102), ("3", 121005158), ("4", 120000601), ("5", 120089316),
+    ("6", 117806340), ("7", 110682743), ("8", 113319770), ("9", 105454467), ("10", 103308737),
+    ("11", 106982474), ("12", 87216183), ("13", 83472345), ("14", 82403003), ("15", 85007780),
+    ("16", 81013979), ("17", 73167244), ("18", 65820629), ("19", 63449741), ("20", 71974595),
+    ("21", 69862954), ("22", 60773035), ("23", 52498615), ("24", 62317253), ("25", 42350435),
+    ("26", 51992305), ("27", 45612108), ("28", 45940150), ("29", 51098607),
+]
+
+ASSEMBLIES: Dict[str, Assembly] = {DEFAULT_ASSEMBLY: make_assembly(DEFAULT_ASSEMBLY, _BOVINE29)}
+
+
+def register(asm: Assembly) -> Assembly:
+    ASSEMBLIES[asm.name] = asm
+    return asm
+
+
+def parse_genome_lines(lines: Iterable[str], name: str = "genome",
+                       primary_only: bool = True) -> Assembly:
+    """.fai / .genome / .chrom.sizes 的文本行 -> Assembly（只看前两列；# 开头和空行跳过）"""
+    pairs = []
+    for k, line in enumerate(lines, 1):
+        if not line.strip() or line.startswith("#"):
+            continue
+        cols = line.split()
+        if len(cols) < 2:
+            raise ValueError(f"{name} 第 {k} 行至少要有 名字 和 长度 两列：{line.rstrip()!r}")
+        try:
+            L = int(cols[1])
+        except ValueError:
+            raise ValueError(f"{name} 第 {k} 行的长度不是整数：{cols[1]!r}") from None
+        if primary_only and not PRIMARY_RE.match(strip_chr(cols[0])):
+            continue
+        pairs.append((cols[0], L))
+    return make_assembly(name, pairs)
+
+
+@lru_cache(maxsize=16)
+def _load_file(path: str, size: int, mtime_ns: int, primary_only: bool) -> Assembly:
+    with open(path, "r", encoding="utf-8") as fh:
+        return parse_genome_lines(fh, Path(path).name, primary_only)
+
+
+def load_assembly(path: Path, primary_only: bool = True) -> Assembly:
+    st = Path(path).stat()
+    return _load_file(str(Path(path).resolve()), st.st_size, st.st_mtime_ns, primary_only)
+
+
+def get_assembly(spec: Optional[str] = None, primary_only: bool = True) -> Assembly:
+    """spec：None（默认组装）/ 已登记的名字 / .fai、.genome、.sizes 文件路径"""
+    if spec is None:
+        return ASSEMBLIES[DEFAULT_ASSEMBLY]
+    if spec in ASSEMBLIES:
+        return ASSEMBLIES[spec]
+    p = Path(spec)
+    if p.is_file():
+        return load_assembly(p, primary_only)
+    known = ", ".join(ASSEMBLIES)
+    raise FileNotFoundError(f"找不到组装 {spec!r}：既不是已登记的名字（{known}），也不是 {'/'.join(GENOME_SUFFIXES)} 文件")
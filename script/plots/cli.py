@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+script/plots 下所有出图脚本的统一入口：一个命令 + 子命令。
+
+    python script/plots <子命令> [该脚本自己的参数...]
+    python script/plots karyogram --glob "cohort/*/loter_segment.txt" --out_dir figs
+    python script/plots redraw --txt loter_segment.txt --out chromosome.svg --compact
+    python script/plots --list
+
+- 本文件只 import 标准库；pandas / matplotlib / rasterio / cairosvg 等重依赖
+  只在真正运行某个子命令时才由对应脚本自己 import，所以 --help / --list 很快
+- 各子命令的参数在本文件里定义（下面的 _<子命令>_arguments），整棵 argparse 树不导入任何出图脚本，
+  `<子命令> --help` 和参数错误都在这里处理完；参数解析成功后才 import 对应脚本，调用它的 run(args)。
+  脚本单独运行时（python Loter.py ...）的 main() 也用这里的 command_parser，两边参数始终一致
+- 默认值取决于脚本 CONFIG 常量的参数，这里的默认是 None，由脚本的 run() 换成自己的常量
+- 没有 main()、在模块顶层直接出图的脚本（气候对比图.py 等）用 runpy 当作 __main__ 运行
+- --check_startup：在子进程里量 `--help` 和每个子命令 `<子命令> --help` 的启动耗时，
+  并检查有没有重依赖被提前 import，任何一项超过 STARTUP_BUDGET_MS 或有重依赖时退出码为 1（可以放进 CI）
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import re
+import runpy
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+HERE = Path(__file__).resolve().parent
+
+# 启动预算：`--help` 从进程启动到退出（含解释器本身的启动时间）
+STARTUP_BUDGET_MS = 150
+STARTUP_RUNS = 5
+# 这些模块出现在 --help 的 import 里就算超标
+HEAVY_MODULES = ("numpy", "pandas", "matplotlib", "rasterio", "cairosvg", "PIL", "scipy")
+
+
+class Command(NamedTuple):
+    script: str        # script/plots 下的文件名
+    help: str
+    has_main: bool     # False：模块顶层直接出图，用 runpy 运行
+
+
+COMMANDS: Dict[str, Command] = {
+    "karyogram": Command("Loter.py", "圆角染色体柱 + 分段着色（单样本 / 批量队列）", True),
+    "redraw": Command("染色体Loter.py", "按原图版式 1:1 重画染色体条形图（marker + 渐变图例）", True),
+    "recolor": Command("SVG改色.py", "对 chromosome.svg 做统一配色映射（除颜色外不变）", True),
+    "climate": Command("气候对比图.py", "西乌珠穆沁 vs 夏洛莱 月均温 / 降水对比图（WorldClim 栅格）", False),
+    "pie": Command("草地类型饼图.py", "草地类型面积饼图", False),
+    "bodysize": Command("各地区蒙古牛体尺指标图.py", "各地区蒙古牛体尺指标汇总", False),
+    "rotation": Command("轮回杂交示意图.py", "轮回杂交示意图", False),
+    "proportion": Command("祖先比例.py", "各个体祖先比例条形图", False),
+    "watch": Command("loter_watch.py", "karyogram 的 watch 模式（文件一改就增量重画）", True),
+    "tiles": Command("loter_tiles.py", "Deep Zoom / XYZ 瓦片金字塔 + HTML 查看器", True),
+    "summary": Command("ancestry_summary.py", "按 bp 加权的祖先比例汇总表", True),
+    "matrix": Command("ancestry_matrix.py", "群体局部祖先矩阵（memmap）", True),
+}
+
+
+# ---------- 各子命令的参数 ----------
+
+def _karyogram_arguments(p: argparse.ArgumentParser) -> None:
+    p.description = "loter_segment.txt -> 染色体分段图（不带参数时用 CONFIG 区域的设置）"
+    p.add_argument("--glob", type=str, default=None, help="批量模式：输入文件的 glob，如 'cohort/*/loter_segment.txt'")
+    p.add_argument("--manifest", type=str, default=None, help="批量模式：样本清单（每行 路径 或 样本名<TAB>路径）")
+    p.add_argument("--out_dir", type=str, default=None, help="输出目录（默认 CONFIG 里的 OUT_DIR）")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="批量模式的进程数")
+    p.add_argument("--config", type=str, default=None, help="JSON 配置文件，覆盖 CONFIG 区域的常量")
+    p.add_argument("--profile", nargs="?", const="", default=None, metavar="JSON",
+                   help="记录各阶段耗时/内存并写 JSON 报告（默认 <out_dir>/<BASENAME>.profile.json；"
+                        "也可用环境变量 LOTER_PROFILE=1）")
+
+
+def _redraw_arguments(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--txt", type=str, required=True, help="loter_segment.txt 路径")
+    p.add_argument("--out", type=str, required=True, help="输出 SVG 路径（以 .svgz 结尾则 gzip 压缩）")
+    p.add_argument("--scheme", type=str, choices=["original", "unified"], default="unified")
+    p.add_argument("--geometry", type=str, choices=["fixed", "decimal"], default="fixed",
+                   help="y 坐标计算：fixed 定点整数（默认，快）/ decimal 逐行 Decimal；两者输出逐字节一致")
+    p.add_argument("--legend", type=str, choices=["rects", "gradient"], default=None,
+                   help="图例渐变条：rects=原图的 5000 个窄矩形（--compact 时同色合并）；gradient=一个 <linearGradient>"
+                        "（默认 CONFIG 里的 LEGEND_MODE）")
+    p.add_argument("--genome", type=str, default=None,
+                   help="组装：已登记的名字或 .fai / .genome / .chrom.sizes 文件（默认 assembly.py 的 DEFAULT_ASSEMBLY，原图的 29 条常染色体）")
+    p.add_argument("--all_contigs", action="store_true",
+                   help="--genome 文件里的 contig 全部画（默认只画数字编号和 X/Y/W/Z）")
+    p.add_argument("--compact", action="store_true",
+                   help="紧凑 SVG：同色段合并成一个 path、样式进 CSS 类、连接线/marker 按 ancestry 合并（文件小很多）")
+
+    # 高清导出（可选）
+    p.add_argument("--png", type=str, default=None, help="输出 PNG 路径（需要 cairosvg；可选再用 pillow 写入 DPI 元数据）")
+    p.add_argument("--jpg", type=str, default=None, help="输出 JPG 路径（需要 cairosvg + pillow）")
+    p.add_argument("--dpi", type=int, default=600, help="目标 dpi（默认 600）")
+    p.add_argument("--cm_width", type=float, default=None, help="按物理宽度(cm)输出高清图（推荐，如 18、24）")
+    p.add_argument("--px_width", type=int, default=None, help="按像素宽度输出（优先于 cm_width）")
+    p.add_argument("--jpg_quality", type=int, default=95, help="JPG 质量 1-95（默认 95）")
+    p.add_argument("--raster", type=str, choices=["cairosvg", "numpy"], default="cairosvg",
+                   help="位图后端：cairosvg 解析 SVG（默认）；numpy 直接画进数组，不经过 SVG")
+
+    # 解析缓存（见 loter_cache.py）
+    p.add_argument("--no_cache", action="store_true", help="不使用解析缓存，每次都重新读 TXT")
+    p.add_argument("--cache_dir", type=str, default=None, help="解析缓存目录（默认 LOTER_CACHE_DIR 或 TXT 旁的 .loter_cache/）")
+    p.add_argument("--marker_sidecar", action="store_true",
+                   help="把解码后的 marker 表存成 .npz（放在 --cache_dir 或 LOTER_CACHE_DIR 或脚本旁的 .loter_cache/），下次直接读")
+
+    # 性能记录（见 instrument.py）
+    p.add_argument("--profile", nargs="?", const="", default=None, metavar="JSON",
+                   help="记录各阶段耗时/内存并写 JSON 报告（默认 <out>.profile.json；也可用环境变量 LOTER_PROFILE=1）")
+
+
+def _recolor_arguments(p: argparse.ArgumentParser) -> None:
+    p.description = "对 chromosome.svg 做统一配色映射（保证除颜色外细节完全不变）"
+    p.add_argument("--in", dest="in_path", required=True, help="输入 SVG 路径")
+    p.add_argument("--out", dest="out_path", required=True, help="输出 SVG 路径")
+    p.add_argument("--new_left", default="#6A51A3",
+                   help="新渐变低端颜色（同时替换 Charolais 的旧色 #ff7f00）")
+    p.add_argument("--new_right", default="#007C73",
+                   help="新渐变高端颜色（同时替换 Mo-OD 的旧色 #33a02c）")
+
+
+def _watch_arguments(p: argparse.ArgumentParser) -> None:
+    p.description = "Loter.py watch 模式：文件一改就增量重画"
+    p.add_argument("--txt", type=str, default=None, help="loter_segment.txt 路径（默认 Loter.py 的 TXT_PATH）")
+    p.add_argument("--config", type=str, default=None, help="样式 JSON（键为 Loter.py CONFIG 常量名）")
+    p.add_argument("--out_dir", type=str, default=None, help="输出目录（默认 Loter.py 的 OUT_DIR）")
+    p.add_argument("--preview_px", type=int, default=None, help="预览 PNG 的像素宽度（默认 loter_watch.py 的 PREVIEW_PX）")
+    p.add_argument("--once", action="store_true", help="只画一次就退出")
+
+
+def _tiles_arguments(p: argparse.ArgumentParser) -> None:
+    p.description = "Loter 染色体图 -> Deep Zoom / XYZ 瓦片金字塔 + HTML 查看器"
+    p.add_argument("--txt", type=str, default=None, help="loter_segment.txt 路径（默认 Loter.py 的 TXT_PATH）")
+    p.add_argument("--out_dir", type=str, required=True)
+    p.add_argument("--name", type=str, default=None, help="瓦片集名字（默认 Loter.py 的 BASENAME）")
+    p.add_argument("--layout", type=str, choices=["dzi", "xyz"], default="dzi")
+    p.add_argument("--tile_size", type=int, default=None, help="瓦片边长（默认 loter_tiles.py 的 TILE_SIZE）")
+    p.add_argument("--bp_per_px", type=float, default=None,
+                   help="最深一层每像素多少 bp（按最长染色体；默认 loter_tiles.py 的 BP_PER_PX）")
+    p.add_argument("--mode", type=str, choices=["blend", "dominant"], default="blend",
+                   help="粗层里混杂像素行的着色方式")
+    p.add_argument("--config", type=str, default=None, help="样式 JSON（键为 Loter.py CONFIG 常量名）")
+
+
+def _summary_arguments(p: argparse.ArgumentParser) -> None:
+    p.description = "按 bp 加权的祖先比例汇总（输出给 祖先比例.R）"
+    p.add_argument("--glob", type=str, default=None, help="输入文件 glob，如 'cohort/*/loter_segment.txt'")
+    p.add_argument("--manifest", type=str, default=None, help="每行 路径 或 样本名<TAB>路径")
+    p.add_argument("--txt", type=str, default=None, help="单个 loter_segment.txt")
+    p.add_argument("--out", type=str, required=True, help="输出 TSV")
+    p.add_argument("--no_cache", action="store_true", help="不使用解析缓存")
+
+
+def _matrix_arguments(p: argparse.ArgumentParser) -> None:
+    p.description = "群体局部祖先矩阵（memmap）"
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="把一批 loter_segment.txt 涂成 (bins, individuals) 矩阵")
+    b.add_argument("--glob", type=str, default=None)
+    b.add_argument("--manifest", type=str, default=None, help="每行 路径 或 样本名<TAB>路径")
+    b.add_argument("--out", type=str, required=True, help="输出目录（matrix.u8 + meta.json）")
+    b.add_argument("--bin_size", type=int, default=None, help="箱宽 bp（默认 ancestry_matrix.py 的 BIN_SIZE）")
+    b.add_argument("--block", type=int, default=None,
+                   help="每次在内存里涂的个体数（默认 ancestry_matrix.py 的 BLOCK_INDIVIDUALS）")
+    b.add_argument("--no_cache", action="store_true", help="不使用解析缓存")
+
+    f = sub.add_parser("freq", help="按窗口统计各 ancestry 频率")
+    f.add_argument("--matrix", type=str, required=True)
+    f.add_argument("--window", type=int, default=None, help="窗口大小 bp（bin_size 的整数倍；默认一个箱）")
+    f.add_argument("--out", type=str, required=True, help="输出 TSV")
+
+
+ARGUMENTS: Dict[str, Callable[[argparse.ArgumentParser], None]] = {
+    "karyogram": _karyogram_arguments,
+    "redraw": _redraw_arguments,
+    "recolor": _recolor_arguments,
+    "watch": _watch_arguments,
+    "tiles": _tiles_arguments,
+    "summary": _summary_arguments,
+    "matrix": _matrix_arguments,
+}
+
+
+def command_parser(name: str, prog: Optional[str] = None) -> argparse.ArgumentParser:
+    """单个子命令的解析器（脚本单独运行时的 main() 也用它）"""
+    p = argparse.ArgumentParser(prog=prog)
+    ARGUMENTS[name](p)
+    return p
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="python script/plots",
+        description="出图脚本统一入口：python script/plots <子命令> [参数...]，子命令的参数见 <子命令> --help",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="子命令：\n" + "\n".join(f"  {k:<11}{c.help}" for k, c in COMMANDS.items()),
+    )
+    p.add_argument("--list", action="store_true", help="列出所有子命令及对应脚本")
+    p.add_argument("--check_startup", action="store_true", help="测量 --help 的启动耗时并检查预算")
+    p.add_argument("--budget_ms", type=float, default=float(os.environ.get("PLOTS_STARTUP_BUDGET_MS", STARTUP_BUDGET_MS)))
+    sub = p.add_subparsers(dest="command", metavar="command", help="子命令（见下）")
+    for name, cmd in COMMANDS.items():
+        sp = sub.add_parser(name, help=cmd.help, description=cmd.help)
+        if cmd.has_main:
+            ARGUMENTS[name](sp)
+        else:
+            sp.epilog = f"{cmd.script} 没有命令行参数，输入/输出路径在脚本开头改"
+    return p
+
+
+def run_command(name: str, args: argparse.Namespace) -> None:
+    """参数已经解析好：这时才 import 对应脚本（连同它的重依赖）"""
+    cmd = COMMANDS[name]
+    path = HERE / cmd.script
+    if str(HERE) not in sys.path:
+        sys.path.insert(0, str(HERE))
+    if cmd.has_main:
+        importlib.import_module(path.stem).run(args)
+    else:
+        sys.argv = [str(path)]
+        runpy.run_path(str(path), run_name="__main__")
+
+
+def _time_help(args: List[str], runs: int) -> Tuple[float, float, List[str]]:
+    """子进程里跑 `cli.py <args>`：返回 (最快 ms, 中位 ms, 被 import 的重依赖)"""
+    entry = [sys.executable, str(Path(__file__).resolve())] + args
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        subprocess.run(entry, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - t) * 1000)
+
+    trace = subprocess.run([sys.executable, "-X", "importtime"] + entry[1:],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    # importtime 的每行：import time: self [us] | cumulative | imported package
+    imported = {m.group(1).strip().split(".")[0]
+                for m in re.finditer(r"^import time:\s*\d+ \|\s*\d+ \|\s*(.+)$", trace.stderr, re.M)}
+    heavy = sorted(m for m in HEAVY_MODULES if m in imported)
+    return min(times), sorted(times)[len(times) // 2], heavy
+
+
+def check_startup(budget_ms: float = STARTUP_BUDGET_MS, runs: int = STARTUP_RUNS) -> bool:
+    """`--help` 和每个子命令的 `<子命令> --help`：取最快一次的耗时，并用 -X importtime 看有没有 import 重依赖"""
+    print(f"[INFO] 启动耗时（{runs} 次取最快 / 中位，预算 {budget_ms:.0f} ms）")
+    failed = []
+    for name in [None] + list(COMMANDS):
+        args = ["--help"] if name is None else [name, "--help"]
+        best, median, heavy = _time_help(args, runs)
+        label = " ".join(args)
+        status = "OK"
+        if heavy:
+            status = f"FAIL（import 了重依赖：{', '.join(heavy)}）"
+        elif best > budget_ms:
+            status = "FAIL（超出启动预算）"
+        if status != "OK":
+            failed.append(label)
+        print(f"  {label:<18}{best:>6.0f} ms {median:>6.0f} ms  {status}")
+    if failed:
+        print(f"[FAIL] {len(failed)} 项不达标：{', '.join(failed)}")
+        return False
+    print("[OK] 启动时间都在预算内，没有提前 import 重依赖")
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    p = build_parser()
+    args = p.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.check_startup:
+        raise SystemExit(0 if check_startup(args.budget_ms) else 1)
+    if args.list:
+        for k, c in COMMANDS.items():
+            print(f"{k:<11}{c.script:<28}{c.help}")
+        return
+    if args.command is None:
+        p.print_help()
+        raise SystemExit(2)
+    run_command(args.command, args)
+
+
+if __name__ == "__main__":
+    main()
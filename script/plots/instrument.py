@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+出图流程的分阶段计时 / 内存记录（Loter.py / 染色体Loter.py 共用）。
+
+生产数据跑得慢时，用来看时间到底花在解析、排版、拼 SVG 还是 cairosvg 上：
+    with stage("read"):
+        df = read_loter_segments(txt)
+    count("rows_parsed", len(df))
+    ...
+    write_report(out_dir / "loter.profile.json")
+
+- 开启：命令行 --profile，或环境变量 LOTER_PROFILE=1（或直接写报告路径）
+- LOTER_PROFILE_TRACEMALLOC=1 时额外记录每个阶段的 Python 堆峰值（tracemalloc 本身会拖慢不少）
+- 没开启时 stage() 返回同一个空的上下文管理器，count()/snapshot() 直接返回，几乎零开销
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+PROFILE_ENV = "LOTER_PROFILE"
+TRACEMALLOC_ENV = "LOTER_PROFILE_TRACEMALLOC"
+
+_NOOP = nullcontext()
+
+ENABLED = False
+_report_path: Optional[Path] = None
+_t0 = 0.0
+_stack: List[str] = []
+_stages: List[Dict[str, object]] = []
+_counters: Dict[str, float] = {}
+_snapshots: List[Dict[str, object]] = []
+
+
+def _rss_mb() -> Optional[float]:
+    """当前常驻内存（MB）；拿不到就返回 None"""
+    try:
+        import psutil  # type: ignore
+        return round(psutil.Process().memory_info().rss / 1024 ** 2, 1)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as fh:
+            return round(int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(kb / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil  # type: ignore
+        mem = psutil.Process().memory_info()
+        return round(getattr(mem, "peak_wset", mem.rss) / 1024 ** 2, 1)
+    except ImportError:
+        return None
+
+
+def enable(report_path: Optional[Path] = None, trace_python: Optional[bool] = None) -> None:
+    """开始记录；report_path 为 None 时由 write_report 的参数决定报告位置"""
+    global ENABLED, _report_path, _t0
+    ENABLED = True
+    _report_path = Path(report_path) if report_path else None
+    _t0 = time.perf_counter()
+    _stack.clear(); _stages.clear(); _counters.clear(); _snapshots.clear()
+    if trace_python is None:
+        trace_python = os.environ.get(TRACEMALLOC_ENV, "") not in ("", "0")
+    if trace_python and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def requested() -> bool:
+    return os.environ.get(PROFILE_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def enable_from_env() -> bool:
+    """LOTER_PROFILE=1 / true 开启（报告放默认位置）；其它非空值当作报告路径"""
+    if not requested():
+        return False
+    v = os.environ[PROFILE_ENV].strip()
+    enable(None if v.lower() in ("1", "true", "yes") else Path(v))
+    return True
+
+
+@contextmanager
+def _timed(name: str) -> Iterator[None]:
+    _stack.append(name)
+    path = "/".join(_stack)
+    rec: Dict[str, object] = {"stage": path, "rss_before_mb": _rss_mb()}
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec["seconds"] = round(time.perf_counter() - t, 4)
+        rec["rss_after_mb"] = _rss_mb()
+        if tracemalloc.is_tracing():
+            rec["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+        _stack.pop()
+        _stages.append(rec)
+
+
+def stage(name: str):
+    """计时一个阶段；嵌套时记成 "svg/layout" 这样的路径"""
+    return _timed(name) if ENABLED else _NOOP
+
+
+def count(name: str, n: float = 1) -> None:
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot(label: str) -> None:
+    """在任意位置记一次内存（RSS + tracemalloc 当前/峰值）"""
+    if not ENABLED:
+        return
+    snap: Dict[str, object] = {"label": label, "t": round(time.perf_counter() - _t0, 4), "rss_mb": _rss_mb()}
+    if tracemalloc.is_tracing():
+        cur, peak = tracemalloc.get_traced_memory()
+        snap["py_current_mb"] = round(cur / 1024 ** 2, 1)
+        snap["py_peak_mb"] = round(peak / 1024 ** 2, 1)
+    _snapshots.append(snap)
+
+
+def write_report(default_path: Optional[Path] = None, **extra: object) -> Optional[Path]:
+    """写 JSON 报告（没开启时什么都不做）；返回报告路径"""
+    if not ENABLED:
+        return None
+    path = _report_path or default_path
+    if path is None:
+        return None
+    report = {
+        "script": Path(sys.argv[0]).name,
+        "argv": sys.argv[1:],
+        "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - (time.perf_counter() - _t0))),
+        "total_seconds": round(time.perf_counter() - _t0, 4),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": list(_stages),
+        "counters": dict(_counters),
+        "snapshots": list(_snapshots),
+        **extra,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[INFO] 性能报告：{path}")
+    return path
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+loter_segment 解析结果的磁盘缓存（Loter.py / 染色体Loter.py 共用）。
+
+同一个 loter_segment.txt 只解析一次：规范化后的表按列存成 .npy（分类列存 codes +
+类别表），下次直接用 np.load(mmap_mode="r") 映射回来，几毫秒就能拿到 DataFrame。
+
+- 缓存键 = 解析器标签 + 文件大小 + mtime + 内容摘要
+  （摘要取文件头、尾和中间均匀分布的若干块，几 GB 的文件也不用整读一遍）
+- 缓存目录：参数 cache_dir > 环境变量 LOTER_CACHE_DIR > 输入文件旁的 .loter_cache/
+- 淘汰策略：按最近使用时间（LRU），超过条目数或总字节数就删最旧的
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR_ENV = "LOTER_CACHE_DIR"
+CACHE_MAX_ENTRIES = 200
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# 内容摘要：取 HASH_BLOCKS 块、每块 HASH_BLOCK_BYTES 字节（小文件直接整读）
+HASH_BLOCKS = 16
+HASH_BLOCK_BYTES = 64 * 1024
+
+META_NAME = "meta.json"
+
+
+def source_fingerprint(src: Path) -> str:
+    st = src.stat()
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{st.st_size}:{st.st_mtime_ns}".encode("ascii"))
+    with open(src, "rb") as fh:
+        if st.st_size <= HASH_BLOCKS * HASH_BLOCK_BYTES:
+            h.update(fh.read())
+        else:
+            step = (st.st_size - HASH_BLOCK_BYTES) // (HASH_BLOCKS - 1)
+            for i in range(HASH_BLOCKS):
+                fh.seek(i * step)
+                h.update(fh.read(HASH_BLOCK_BYTES))
+    return h.hexdigest()
+
+
+def default_cache_dir(src: Path) -> Path:
+    env = os.environ.get(CACHE_DIR_ENV)
+    if env:
+        return Path(env)
+    return src.parent / ".loter_cache"
+
+
+def _save_table(df: pd.DataFrame, entry: Path) -> None:
+    """写到临时目录再整体改名，避免并发时读到写了一半的缓存"""
+    tmp = entry.with_name(f"{entry.name}.tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    columns: List[Dict[str, object]] = []
+    for i, name in enumerate(df.columns):
+        col = df[name]
+        fname = f"c{i}.npy"
+        if not isinstance(col.dtype, pd.CategoricalDtype) and not pd.api.types.is_numeric_dtype(col):
+            col = col.astype(str).astype("category")
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            np.save(tmp / fname, col.cat.codes.to_numpy())
+            columns.append({"name": str(name), "file": fname, "kind": "category",
+                            "categories": [str(c) for c in col.cat.categories]})
+        else:
+            np.save(tmp / fname, col.to_numpy())
+            columns.append({"name": str(name), "file": fname, "kind": "numeric"})
+
+    (tmp / META_NAME).write_text(
+        json.dumps({"rows": len(df), "columns": columns}, ensure_ascii=False), encoding="utf-8"
+    )
+    try:
+        tmp.rename(entry)
+    except OSError:
+        # 另一个进程已经写好了同一个键，用它的就行
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _load_table(entry: Path) -> pd.DataFrame:
+    meta = json.loads((entry / META_NAME).read_text(encoding="utf-8"))
+    data = {}
+    for c in meta["columns"]:
+        arr = np.load(entry / c["file"], mmap_mode="r")
+        if c["kind"] == "category":
+            data[c["name"]] = pd.Categorical.from_codes(arr, categories=c["categories"])
+        else:
+            data[c["name"]] = arr
+    return pd.DataFrame(data, copy=False)
+
+
+def _entry_size(entry: Path) -> int:
+    return sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+
+def evict(cache_dir: Path,
+          max_entries: int = CACHE_MAX_ENTRIES,
+          max_bytes: int = CACHE_MAX_BYTES) -> None:
+    """按 meta.json 的 mtime（命中时会刷新）做 LRU 淘汰"""
+    entries: List[Tuple[float, int, Path]] = []
+    for entry in cache_dir.iterdir():
+        meta = entry / META_NAME
+        if entry.is_dir() and ".tmp" not in entry.name and meta.exists():
+            entries.append((meta.stat().st_mtime, _entry_size(entry), entry))
+    entries.sort(reverse=True)
+
+    total = 0
+    for n, (_, size, entry) in enumerate(entries):
+        total += size
+        if n >= max_entries or total > max_bytes:
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def load_table(src: Path,
+               parser: Callable[[Path], pd.DataFrame],
+               tag: str,
+               cache_dir: Optional[Path] = None) -> pd.DataFrame:
+    """
+    命中缓存就直接映射回来；否则调用 parser(src) 解析并写入缓存。
+    tag 用来区分不同的解析器（解析逻辑改了就换个 tag）。
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir(src)
+    entry = cache_dir / f"{tag}-{source_fingerprint(src)}"
+    meta = entry / META_NAME
+
+    if meta.exists():
+        try:
+            df = _load_table(entry)
+            now = time.time()
+            os.utime(meta, (now, now))
+            return df
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(entry, ignore_errors=True)
+
+    df = parser(src)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _save_table(df, entry)
+        evict(cache_dir)
+    except OSError as e:
+        # 缓存写不进去（只读目录等）不影响出图
+        print(f"[WARN] 解析缓存写入失败：{e}")
+    return df
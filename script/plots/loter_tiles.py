@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Loter.py 染色体图的多分辨率瓦片金字塔（Deep Zoom / XYZ）+ 静态 HTML 查看器。
+
+几百万个 segment 的 SVG 浏览器和 Illustrator 都打不开，审稿人又想放大看单个片段：
+- 最深一层按 --bp_per_px（默认最长染色体 10 kb / 像素）定分辨率
+- 先在最深一层把每条染色体的 segment 涂成“每个像素行一个 ancestry”，
+  再逐层把相邻两行的覆盖计数相加得到上一层 —— 之后每一层、每一块瓦片都只按
+  像素行取颜色，耗时与输出像素数成正比，和 segment 数、层数的乘积无关
+- 粗层里一个像素行混了几种 ancestry 时：blend（默认）按覆盖混色、并按覆盖率淡入白底；
+  dominant 取覆盖最多的 ancestry
+- 瓦片沿用 Loter.py 的版式（胶囊、标签、图例、颜色表）和 raster_backend 的画法
+- viewer.html 不依赖任何外部脚本，双击即可打开（滚轮缩放、拖动平移）
+
+用法：
+  python loter_tiles.py --txt loter_segment.txt --out_dir tiles
+  python loter_tiles.py --txt loter_segment.txt --out_dir tiles --layout xyz --bp_per_px 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import Loter
+from loter_cache import load_table
+from raster_backend import RasterCanvas, parse_colors
+
+TILE_SIZE = 256
+BP_PER_PX = 10_000
+TILE_FORMAT = "png"
+
+
+@dataclass
+class _Chrom:
+    name: str
+    x: float
+    counts: List[np.ndarray]    # 每层一个 (行数, K) 的覆盖计数，下标 0 = 最深一层
+
+
+@dataclass
+class Pyramid:
+    width: int                  # 最深一层的像素尺寸
+    height: int
+    scale: float                # 最深一层：像素 / SVG 逻辑单位
+    max_level: int              # DZI 层号：max_level 是原图，0 是 1×1
+    layout: "Loter.Layout"
+    chroms: List[_Chrom]
+    labels: List[str]
+    color_map: Dict[str, str]
+    rgb: np.ndarray             # (K, 3) float32
+    mode: str
+    # (染色体名, 层号) -> row_colors 的结果；同一层的每块瓦片共用，不再逐块重算整条染色体
+    _rows: Dict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]] = field(default_factory=dict, repr=False)
+
+    def level_scale(self, level: int) -> float:
+        return self.scale / 2 ** (self.max_level - level)
+
+    def level_size(self, level: int) -> Tuple[int, int]:
+        f = 2 ** (self.max_level - level)
+        return max(1, -(-self.width // f)), max(1, -(-self.height // f))
+
+    def row_colors(self, ch: _Chrom, level: int) -> Tuple[np.ndarray, np.ndarray]:
+        """某条染色体在某层的 (每行颜色 (n, 3), 覆盖率 (n,))，行 0 = 图像第 0 行；按 (染色体, 层) 缓存"""
+        hit = self._rows.get((ch.name, level))
+        if hit is not None:
+            return hit
+        # 计数最多合并到 1 行为止，更粗的层沿用那一行：覆盖率按实际合并的行数算
+        k = min(self.max_level - level, len(ch.counts) - 1)
+        cnt = ch.counts[k]
+        total = cnt.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if self.mode == "dominant":
+                colors = self.rgb[cnt.argmax(axis=1)]
+                coverage = (total > 0).astype(np.float32)
+            else:
+                colors = (cnt @ self.rgb) / total[:, None]
+                coverage = total / float(2 ** k)
+        hit = self._rows[(ch.name, level)] = (np.nan_to_num(colors), coverage.astype(np.float32))
+        return hit
+
+    def clear_cache(self, level: Optional[int] = None) -> None:
+        """丢掉 row_colors 的缓存：level 为 None 时全部丢掉，否则只丢这一层"""
+        if level is None:
+            self._rows.clear()
+            return
+        for key in [key for key in self._rows if key[1] == level]:
+            del self._rows[key]
+
+
+def build_pyramid(df, bp_per_px: float = BP_PER_PX, mode: str = "blend") -> Pyramid:
+    """最深一层逐行涂色，之后每层相邻两行的计数相加"""
+    index = Loter.build_segment_index(df)
+    layout = Loter.compute_layout(index)
+    labels = index.labels
+    color_map = Loter.build_color_map(labels)
+    rgb = parse_colors([color_map[lb] for lb in labels]).astype(np.float32)
+
+    bar_top = layout.top
+    bar_h = layout.height - layout.bottom - bar_top
+    longest = max(int(index.chr_len.max()), 1)
+    scale = max(longest / float(bp_per_px) / bar_h, 1e-6)
+    width = int(math.ceil(layout.width * scale))
+    height = int(math.ceil(layout.height * scale))
+    max_level = int(math.ceil(math.log2(max(width, height, 2))))
+
+    k = len(labels)
+    chroms: List[_Chrom] = []
+    for i, c in enumerate(index.chrs):
+        L = layout.chr_len[c]
+        cnt = np.zeros((height, k), dtype=np.float32)
+        sl = index.span(i)
+        if L > 0 and sl.stop > sl.start:
+            start, end, code = index.start[sl], index.end[sl], index.anc_code[sl]
+            # 与 segment_geometry / RasterCanvas.column_fills 相同的行归属规则
+            y1 = bar_top + (start / L) * bar_h
+            y2 = y1 + np.maximum(0.6, (end - start) / L * bar_h)
+            r0 = np.clip(np.ceil(y1 * scale - 0.5).astype(np.int64), 0, height)
+            r1 = np.clip(np.maximum(np.ceil(y2 * scale - 0.5).astype(np.int64), r0 + 1), 0, height)
+            n = r1 - r0
+            seg = np.repeat(np.arange(len(r0)), n)
+            rows = np.arange(len(seg)) + np.repeat(r0 - np.cumsum(n) + n, n)
+            owner = np.full(height, -1, dtype=np.int64)
+            np.maximum.at(owner, rows, seg)
+            hit = owner >= 0
+            cnt[np.flatnonzero(hit), code[owner[hit]]] = 1.0
+
+        levels = [cnt]
+        while levels[-1].shape[0] > 1:
+            a = levels[-1]
+            if a.shape[0] % 2:
+                a = np.vstack([a, np.zeros((1, k), dtype=np.float32)])
+            levels.append(a[0::2] + a[1::2])
+        chroms.append(_Chrom(c, float(layout.chr_x[c]), levels))
+
+    return Pyramid(width, height, scale, max_level, layout, chroms, labels, color_map, rgb, mode)
+
+
+def _texts(pyr: Pyramid) -> List[Tuple[float, float, str, float, str]]:
+    """(x, y, 文字, 字号, anchor)，与 Loter.render_raster 一致"""
+    lay = pyr.layout
+    out = []
+    if Loter.TITLE:
+        out.append((lay.width // 2, Loter.CANVAS_PADDING + 24, Loter.TITLE, 18, "middle"))
+    if Loter.SHOW_CHR_LABEL:
+        for ch in pyr.chroms:
+            out.append((ch.x + Loter.CHR_BAR_WIDTH / 2, lay.height - lay.bottom + 26, ch.name, Loter.LABEL_FONT_SIZE, "middle"))
+    legend_x = lay.width - Loter.CANVAS_PADDING + 10
+    out.append((legend_x, lay.top - 10, "Ancestry", 14, "start"))
+    for j, anc in enumerate(pyr.labels):
+        out.append((legend_x + 20, lay.top + 10 + 20 * j + 12, anc, 12, "start"))
+    return out
+
+
+def render_tile(pyr: Pyramid, level: int, tx: int, ty: int, tile: int = TILE_SIZE):
+    """渲染一块瓦片，返回 Pillow Image"""
+    s = pyr.level_scale(level)
+    lw, lh = pyr.level_size(level)
+    px0, py0 = tx * tile, ty * tile
+    tw, th = min(tile, lw - px0), min(tile, lh - py0)
+    ox, oy = px0 / s, py0 / s                      # 瓦片左上角的逻辑坐标
+    x_lo, x_hi, y_lo, y_hi = ox, (px0 + tw) / s, oy, (py0 + th) / s
+
+    lay = pyr.layout
+    bar_top = lay.top
+    bar_h = lay.height - lay.bottom - bar_top
+    w = Loter.CHR_BAR_WIDTH
+    r = min(Loter.CORNER_RADIUS, w // 2)
+    canvas = RasterCanvas(tw / s, th / s, s)
+
+    pad = Loter.STROKE_WIDTH + 2
+    if bar_top - pad < y_hi and bar_top + bar_h + pad > y_lo:
+        for ch in pyr.chroms:
+            if ch.x + w + pad < x_lo or ch.x - pad > x_hi:
+                continue
+            x = ch.x - ox
+            canvas.capsule(x, bar_top - oy, w, bar_h, r, "white", "black", Loter.STROKE_WIDTH)
+            colors, coverage = pyr.row_colors(ch, level)
+            canvas.row_fills(-py0, colors, coverage, clip=(x, bar_top - oy, w, bar_h, r))
+
+    legend_x = lay.width - Loter.CANVAS_PADDING + 10
+    for j, anc in enumerate(pyr.labels):
+        y = lay.top + 10 + 20 * j
+        if legend_x - 2 < x_hi and legend_x + 16 > x_lo and y - 2 < y_hi and y + 16 > y_lo:
+            canvas.capsule(legend_x - ox, y - oy, 14, 14, 0, pyr.color_map[anc], "black", 0.4)
+
+    for x, y, text, size, anchor in _texts(pyr):
+        # 粗略的文字包围盒，只画和这块瓦片相交的文字
+        half = size * max(len(text), 1) * (0.5 if anchor == "middle" else 1.0)
+        left = x - half if anchor == "middle" else x
+        if left - size < x_hi and left + 2 * half + size > x_lo and y - size * 1.2 < y_hi and y + size * 0.4 > y_lo:
+            canvas.text(x - ox, y - oy, text, size, anchor, family="serif")
+    return canvas.to_image().convert("RGB")
+
+
+def _tile_path(out_dir: Path, name: str, layout: str, level: int, tx: int, ty: int, z0: int) -> Path:
+    if layout == "xyz":
+        return out_dir / f"{name}_xyz" / str(level - z0) / str(tx) / f"{ty}.{TILE_FORMAT}"
+    return out_dir / f"{name}_files" / str(level) / f"{tx}_{ty}.{TILE_FORMAT}"
+
+
+def export_tiles(df, out_dir: Path, name: str = "loter", tile: int = TILE_SIZE,
+                 bp_per_px: float = BP_PER_PX, layout: str = "dzi", mode: str = "blend") -> Path:
+    """写出全部瓦片 + 描述文件 + viewer.html；返回 viewer.html 路径"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    pyr = build_pyramid(df, bp_per_px, mode)
+    # XYZ 从整张图能放进一块瓦片的那层开始编号
+    z0 = max(l for l in range(pyr.max_level + 1) if max(pyr.level_size(l)) <= tile)
+    first = z0 if layout == "xyz" else 0
+
+    n_tiles = 0
+    for level in range(first, pyr.max_level + 1):
+        lw, lh = pyr.level_size(level)
+        pyr.clear_cache(level - 1)   # 逐层导出，上一层的行颜色不会再用到
+        for tx in range(-(-lw // tile)):
+            for ty in range(-(-lh // tile)):
+                img = render_tile(pyr, level, tx, ty, tile)
+                buf = io.BytesIO()
+                img.save(buf, format="PNG", optimize=False)
+                path = _tile_path(out_dir, name, layout, level, tx, ty, z0)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(buf.getvalue())
+                n_tiles += 1
+        print(f"[INFO] level {level}: {lw}×{lh}px")
+
+    if layout == "dzi":
+        (out_dir / f"{name}.dzi").write_text(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile}" Overlap="0" Format="{TILE_FORMAT}">'
+            f'<Size Width="{pyr.width}" Height="{pyr.height}"/></Image>\n',
+            encoding="utf-8",
+        )
+    info = {
+        "name": name, "layout": layout, "width": pyr.width, "height": pyr.height, "tile": tile,
+        "maxLevel": pyr.max_level, "minLevel": first, "z0": z0, "format": TILE_FORMAT,
+        "bpPerPx": bp_per_px, "labels": pyr.labels, "colors": [pyr.color_map[lb] for lb in pyr.labels],
+    }
+    viewer = out_dir / "viewer.html"
+    viewer.write_text(VIEWER_HTML.replace("/*INFO*/null", json.dumps(info, ensure_ascii=False)), encoding="utf-8")
+    print(f"[OK] {n_tiles} 块瓦片，最深一层 {pyr.width}×{pyr.height}px；查看器：{viewer}")
+    return viewer
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Loter karyogram</title>
+<style>html,body{margin:0;height:100%;overflow:hidden;background:#fff;font:12px sans-serif}
+canvas{display:block;width:100%;height:100%;cursor:grab}
+#hud{position:fixed;left:8px;bottom:6px;color:#555;background:rgba(255,255,255,.8);padding:2px 6px}</style>
+</head><body><canvas id="c"></canvas><div id="hud"></div>
+<script>
+const I = /*INFO*/null;
+const cv = document.getElementById("c"), ctx = cv.getContext("2d"), hud = document.getElementById("hud");
+const cache = new Map();
+let dpr = 1, zoom = 1, ox = 0, oy = 0, queued = false;
+
+function url(l, x, y) {
+  return I.layout === "xyz" ? `${I.name}_xyz/${l - I.z0}/${x}/${y}.${I.format}`
+                            : `${I.name}_files/${l}/${x}_${y}.${I.format}`;
+}
+function tileImg(l, x, y) {
+  const k = l + "/" + x + "/" + y;
+  let im = cache.get(k);
+  if (!im) { im = new Image(); im.onload = redraw; im.src = url(l, x, y); cache.set(k, im); }
+  return im;
+}
+function fit() {
+  zoom = Math.min(cv.width / I.width, cv.height / I.height);
+  ox = (I.width - cv.width / zoom) / 2; oy = (I.height - cv.height / zoom) / 2;
+}
+function resize() {
+  dpr = window.devicePixelRatio || 1;
+  cv.width = innerWidth * dpr; cv.height = innerHeight * dpr;
+  redraw();
+}
+function redraw() { if (!queued) { queued = true; requestAnimationFrame(draw); } }
+function drawLevel(l) {
+  const f = Math.pow(2, I.maxLevel - l), t = I.tile * f;
+  const nx = Math.ceil(I.width / t), ny = Math.ceil(I.height / t);
+  const x0 = Math.max(0, Math.floor(ox / t)), y0 = Math.max(0, Math.floor(oy / t));
+  const x1 = Math.min(nx - 1, Math.floor((ox + cv.width / zoom) / t));
+  const y1 = Math.min(ny - 1, Math.floor((oy + cv.height / zoom) / t));
+  let done = true;
+  for (let x = x0; x <= x1; x++) for (let y = y0; y <= y1; y++) {
+    const im = tileImg(l, x, y);
+    if (im.complete && im.naturalWidth) {
+      ctx.drawImage(im, Math.round((x * t - ox) * zoom), Math.round((y * t - oy) * zoom),
+                    Math.ceil(im.naturalWidth * f * zoom), Math.ceil(im.naturalHeight * f * zoom));
+    } else done = false;
+  }
+  return done;
+}
+function draw() {
+  queued = false;
+  ctx.fillStyle = "#fff"; ctx.fillRect(0, 0, cv.width, cv.height);
+  ctx.imageSmoothingEnabled = zoom < 1;
+  const want = Math.min(I.maxLevel, Math.max(I.minLevel, I.maxLevel + Math.ceil(Math.log2(zoom))));
+  // 还没加载完的瓦片先用粗一层的顶着
+  if (!drawLevel(want) && want > I.minLevel) { drawLevel(want - 1); drawLevel(want); }
+  const bp = I.bpPerPx / zoom * dpr;
+  hud.textContent = `level ${want}/${I.maxLevel} · ${bp >= 1e6 ? (bp / 1e6).toFixed(2) + " Mb" : bp >= 1e3 ? (bp / 1e3).toFixed(1) + " kb" : bp.toFixed(0) + " bp"} / px · 滚轮缩放，拖动平移，双击复位`;
+}
+cv.addEventListener("wheel", e => {
+  e.preventDefault();
+  const mx = e.offsetX * dpr, my = e.offsetY * dpr, k = Math.exp(-e.deltaY * 0.0015);
+  const ix = ox + mx / zoom, iy = oy + my / zoom;
+  zoom = Math.min(Math.max(zoom * k, 0.02 * cv.width / I.width), 16);
+  ox = ix - mx / zoom; oy = iy - my / zoom; redraw();
+}, { passive: false });
+let drag = null;
+cv.addEventListener("pointerdown", e => { drag = [e.clientX, e.clientY]; cv.setPointerCapture(e.pointerId); cv.style.cursor = "grabbing"; });
+cv.addEventListener("pointermove", e => {
+  if (!drag) return;
+  ox -= (e.clientX - drag[0]) * dpr / zoom; oy -= (e.clientY - drag[1]) * dpr / zoom;
+  drag = [e.clientX, e.clientY]; redraw();
+});
+cv.addEventListener("pointerup", () => { drag = null; cv.style.cursor = "grab"; });
+cv.addEventListener("dblclick", () => { fit(); redraw(); });
+addEventListener("resize", resize);
+resize(); fit(); redraw();
+</script></body></html>
+"""
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from cli import command_parser
+    run(command_parser("tiles", prog=Path(__file__).name).parse_args(argv))
+
+
+def run(args: argparse.Namespace) -> None:
+    """tiles 子命令（参数见 cli.py）"""
+    if args.config:
+        Loter.apply_config(json.loads(Path(args.config).read_text(encoding="utf-8")))
+    txt = Path(args.txt or Loter.TXT_PATH)
+    if Loter.USE_PARSE_CACHE:
+        df = load_table(txt, Loter.read_loter_segments, tag=Loter.PARSE_CACHE_TAG)
+    else:
+        df = Loter.read_loter_segments(txt)
+    export_tiles(df, Path(args.out_dir), args.name or Loter.BASENAME, args.tile_size or TILE_SIZE,
+                 args.bp_per_px or BP_PER_PX, args.layout, args.mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Loter.py 的 watch 模式：调图时盯着 segment 文件和样式 JSON，一改就重新出图。
+
+每次全量重画要把 29 条染色体全部重新拼一遍、再 600 dpi 光栅化；这里
+- 每条染色体的 SVG 片段（Loter.chromosome_fragment）按
+  “这条染色体的 segment 切片 + 坐标 + 样式参数 + 用到的颜色”的摘要缓存，
+  只有摘要变了的染色体才重画，其余直接拿缓存字符串拼回整份文档
+- 拼出来的 SVG 与 Loter.generate_svg 逐字节一致，SVG_COMPACT / SVGZ 同样生效
+  （紧凑模式的片段按本条染色体自己的类名 f0, f1... 缓存，拼接时按颜色首次出现的顺序换成全局类名）
+- 预览图用 NumPy 后端按 PREVIEW_PX 宽度出（不走 cairosvg），画布留在内存里，
+  片段摘要变了的染色体才擦掉重画；画布尺寸、标签、图例变了才整张重画。正式高清图还是用 Loter.py 出
+- segment 文件经 loter_cache 读取（Loter.USE_PARSE_CACHE），样式 JSON 改了不用重新解析
+
+用法：
+  python loter_watch.py --txt loter_segment.txt --config style.json --out_dir preview
+  （style.json 里的键就是 Loter.py CONFIG 区域的常量名，如 {"CHR_BAR_WIDTH": 20}）
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import Loter
+from raster_backend import RasterCanvas
+from svg_writer import SvgWriter
+
+PREVIEW_PX = 1600
+POLL_SECONDS = 0.3
+FILL_CLASS_RE = re.compile(r'class="f(\d+)"')
+
+# 影响单条染色体片段的样式参数（改了这些，对应染色体要重画）
+FRAGMENT_STYLE_KEYS = (
+    "CHR_BAR_WIDTH", "CORNER_RADIUS", "STROKE_WIDTH",
+    "SHOW_CHR_LABEL", "LABEL_FONT_SIZE", "LOD_MODE", "LOD_MIN_PX", "SVG_COMPACT",
+)
+
+
+def fragment_key(index: Loter.SegmentIndex, i: int, layout: Loter.Layout,
+                 palette: np.ndarray, px_per_unit: float) -> str:
+    c = index.chrs[i]
+    sl = index.span(i)
+    code = index.anc_code[sl]
+    used = np.unique(code)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((
+        c, layout.chr_x[c], layout.top, layout.height, layout.bottom, layout.chr_len[c], px_per_unit,
+        tuple(getattr(Loter, k) for k in FRAGMENT_STYLE_KEYS),
+        tuple((int(u), palette[u]) for u in used.tolist()),
+    )).encode("utf-8"))
+    for arr in (index.start[sl], index.end[sl], code):
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+def canvas_key(index: Loter.SegmentIndex, layout: Loter.Layout,
+               color_map: Dict[str, str], px_per_unit: float) -> str:
+    """预览画布上不随 segment 变化的部分（尺寸、标题、染色体标签、图例）"""
+    return repr((
+        layout.width, layout.height, layout.top, layout.bottom, sorted(layout.chr_x.items()), px_per_unit,
+        tuple(index.chrs), tuple(color_map.items()),
+        Loter.TITLE, Loter.CANVAS_PADDING, Loter.CHR_BAR_WIDTH, Loter.SHOW_CHR_LABEL, Loter.LABEL_FONT_SIZE,
+    ))
+
+
+class FragmentCache:
+    def __init__(self) -> None:
+        # 键 -> (片段, 紧凑模式下片段里 f0, f1... 依次对应的颜色)
+        self.fragments: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+        # 预览画布：(canvas_key, 画布, 每条染色体画上去时的片段键)
+        self.preview: Optional[Tuple[str, RasterCanvas, List[str]]] = None
+
+    def render(self, df, out_svg: Path, out_png: Optional[Path] = None,
+               preview_px: int = PREVIEW_PX) -> Tuple[int, int, Dict[str, str]]:
+        """拼出整份 SVG，给了 out_png 再更新预览图；返回 (重画的染色体数, 染色体总数, 颜色表)"""
+        index = Loter.build_segment_index(df)
+        layout = Loter.compute_layout(index)
+        labels = index.labels
+        color_map = Loter.build_color_map(labels)
+        palette = np.array([color_map[lb] for lb in labels], dtype=object)
+        px_per_unit = Loter.device_px_per_unit(layout)
+
+        compact = Loter.SVG_COMPACT
+        fill_class: Dict[str, str] = {}
+        fresh: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+        parts: List[str] = []
+        redrawn = 0
+        keys = [fragment_key(index, i, layout, palette, px_per_unit) for i in range(len(index.chrs))]
+        for i, key in enumerate(keys):
+            hit = self.fragments.get(key)
+            if hit is None:
+                if compact:
+                    local: Dict[str, str] = {}
+                    lines = Loter.compact_fragment(index, i, layout, palette, px_per_unit, local)
+                    hit = ("\n".join(lines), tuple(local))
+                else:
+                    hit = ("\n".join(Loter.chromosome_fragment(index, i, layout, palette, px_per_unit)), ())
+                redrawn += 1
+            fresh[key] = hit
+            frag = hit[0]
+            if compact:
+                # 与 compact_fragment 一样按本条染色体的颜色顺序 setdefault，全局类名和整份重画时相同
+                names = [fill_class.setdefault(col, f"f{len(fill_class)}") for col in hit[1]]
+                frag = FILL_CLASS_RE.sub(lambda m: f'class="{names[int(m.group(1))]}"', frag)
+            parts.append(frag)
+        # 只留这一版用到的片段，缓存不会越攒越多
+        self.fragments = fresh
+
+        with SvgWriter(out_svg) as svg:
+            if compact:
+                svg.writelines(Loter.compact_preamble(layout, fill_class))
+                svg.writelines(parts)
+                svg.writelines(Loter.compact_legend(layout, labels, color_map))
+            else:
+                svg.writelines(Loter.svg_preamble(layout))
+                svg.writelines(parts)
+                svg.writelines(Loter.svg_legend(layout, labels, color_map))
+        if out_png is not None:
+            self.render_preview(index, layout, color_map, palette, keys, out_png, preview_px)
+        return redrawn, len(index.chrs), color_map
+
+    def render_preview(self, index: Loter.SegmentIndex, layout: Loter.Layout, color_map: Dict[str, str],
+                       palette: np.ndarray, keys: List[str], out_png: Path, preview_px: int) -> int:
+        """只重画片段键变了的染色体，返回重画条数"""
+        px_per_unit = Loter.device_px_per_unit(layout, preview_px)
+        base = canvas_key(index, layout, color_map, px_per_unit)
+        if self.preview is not None and self.preview[0] == base:
+            _, canvas, drawn = self.preview
+            todo = [i for i, key in enumerate(keys) if drawn[i] != key]
+        else:
+            canvas = Loter.raster_base(index, layout, index.labels, color_map, px_per_unit)
+            todo = list(range(len(keys)))
+        for i in todo:
+            Loter.raster_chromosome(canvas, index, i, layout, palette, px_per_unit)
+        self.preview = (base, canvas, list(keys))
+        Loter._encode_all(canvas.to_image(), {"png": out_png})
+        return len(todo)
+
+
+def _mtime(path: Optional[Path]) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns if path is not None else None
+    except FileNotFoundError:
+        return None
+
+
+def watch(txt: Path, config: Optional[Path], out_dir: Path,
+          preview_px: int = PREVIEW_PX, once: bool = False) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_png = out_dir / f"{Loter.BASENAME}_preview.png"
+    # 配置文件里删掉的键要回到默认值，所以每次都从启动时的默认值开始覆盖
+    defaults = {k: getattr(Loter, k) for k in Loter.CONFIG_KEYS}
+    cache = FragmentCache()
+    seen: Tuple[Optional[int], Optional[int]] = (None, None)
+
+    print(f"[INFO] 监视 {txt}" + (f" 和 {config}" if config else "") + "（Ctrl+C 退出）")
+    while True:
+        stamp = (_mtime(txt), _mtime(config))
+        if stamp != seen and stamp[0] is not None:
+            seen = stamp
+            t0 = time.perf_counter()
+            try:
+                overrides = json.loads(config.read_text(encoding="utf-8")) if config and stamp[1] else {}
+                Loter.apply_config({**defaults, **overrides})
+                # SVGZ 可能在样式 JSON 里切换，每次按当前配置定后缀（SvgWriter 按 .svgz 自动压缩）
+                out_svg = out_dir / f"{Loter.BASENAME}.{'svgz' if Loter.SVGZ else 'svg'}"
+                df = Loter.load_segments(txt)
+                redrawn, total, _ = cache.render(df, out_svg, out_png, preview_px)
+                print(f"[OK] {time.strftime('%H:%M:%S')} 重画 {redrawn}/{total} 条染色体，"
+                      f"{time.perf_counter() - t0:.2f}s -> {out_svg.name}, {out_png.name}")
+            except Exception as e:
+                # 文件可能正写到一半，或 JSON 还没改完；等下一次变化
+                print(f"[WARN] {type(e).__name__}: {e}")
+        if once:
+            return
+        time.sleep(POLL_SECONDS)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from cli import command_parser
+    run(command_parser("watch", prog=Path(__file__).name).parse_args(argv))
+
+
+def run(args: argparse.Namespace) -> None:
+    """watch 子命令（参数见 cli.py）"""
+    try:
+        watch(Path(args.txt or Loter.TXT_PATH), Path(args.config) if args.config else None,
+              Path(args.out_dir or Loter.OUT_DIR), args.preview_px or PREVIEW_PX, args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+ancestry 颜色登记表（Loter.py / 染色体Loter.py / 祖先比例.py 共用）。
+
+以前 Loter._stable_color 用 hash(name) 取色相，而 Python 的字符串哈希每个进程加盐不同：
+同一个 ancestry 每次运行、批量模式的每个工作进程颜色都不一样，图没法放在一起比。
+
+- 已知类别的颜色存在 ancestry_palette.json（与本文件同目录，可手改）；它是仓库里跟踪的种子表，只读不写
+- 没登记的类别用 blake2b 摘要定色相，跨进程、跨机器都一样，并追加写进用户自己的颜色表：
+  环境变量 ANCESTRY_PALETTE > $LOTER_CACHE_DIR/ancestry_palette.json > ~/.cache/loter/ancestry_palette.json
+  （用户表里的颜色覆盖种子表，想改颜色改用户表即可）
+- 写入是“加锁 -> 读 -> 合并 -> 写临时文件 -> 改名”，批量模式多个进程同时登记新类别也不会互相覆盖
+- 颜色一律存成 "#RRGGBB"，画每个 segment 时只是一次字典查找
+"""
+
+from __future__ import annotations
+
+import colorsys
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+try:  # Windows 没有 fcntl：退化为不加锁，靠写完后复查补写
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+PALETTE_ENV = "ANCESTRY_PALETTE"
+PALETTE_NAME = "ancestry_palette.json"
+SEED_PALETTE_PATH = Path(__file__).resolve().parent / PALETTE_NAME
+CACHE_DIR_ENV = "LOTER_CACHE_DIR"    # 与 loter_cache.CACHE_DIR_ENV 相同
+SAVE_RETRIES = 3
+
+# JSON 不存在时的初始内容（与 染色体Loter.py 的 unified 配色一致）
+SEED_COLORS: Dict[str, str] = {
+    "Mo-OD": "#6A51A3",
+    "Charolais": "#007C73",
+}
+
+# 摘要定色：色相取自摘要，饱和度/亮度固定，避免太浅太黑（与原 _stable_color 相同）
+SATURATION = 0.65
+LIGHTNESS = 0.45
+
+
+def digest_color(name: str) -> str:
+    h = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    hue = int.from_bytes(h[:4], "big") % 360
+    r, g, b = colorsys.hls_to_rgb(hue / 360.0, LIGHTNESS, SATURATION)
+    return "#{:02X}{:02X}{:02X}".format(round(r * 255), round(g * 255), round(b * 255))
+
+
+def user_palette_path() -> Path:
+    """新登记颜色写到哪里（仓库里的种子表永远不写）"""
+    env = os.environ.get(PALETTE_ENV)
+    if env:
+        return Path(env)
+    cache = os.environ.get(CACHE_DIR_ENV)
+    if cache:
+        return Path(cache) / PALETTE_NAME
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "loter" / PALETTE_NAME
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """同目录 .lock 文件上的排他锁，包住 读-合并-写"""
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_name(f"{path.name}.lock"), "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _read_json(path: Path) -> Dict[str, str]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    return {str(k): str(v).upper() for k, v in data.items()}
+
+
+class Palette:
+    """path：用户颜色表（可写）；seed：只读的种子表，颜色优先级 用户表 > 种子表 > SEED_COLORS"""
+
+    def __init__(self, path: Path, seed: Optional[Path] = SEED_PALETTE_PATH) -> None:
+        self.path = Path(path)
+        self.colors: Dict[str, str] = dict(SEED_COLORS)
+        if seed is not None and Path(seed).resolve() != self.path.resolve():
+            self.colors.update(_read_json(Path(seed)))
+        self.colors.update(_read_json(self.path))
+        self._new: Dict[str, str] = {}
+
+    def color(self, name: str) -> str:
+        c = self.colors.get(name)
+        if c is None:
+            c = self.colors[name] = self._new[name] = digest_color(name)
+        return c
+
+    def lookup(self, names: Iterable[str]) -> Dict[str, str]:
+        return {n: self.color(n) for n in names}
+
+    def save(self) -> None:
+        """
+        只把本进程新登记的类别合并进用户颜色表（文件里已有的颜色优先，手改的不会被覆盖）。
+        加锁后 读-合并-写，写临时文件再改名；没有 fcntl 的平台不加锁，改名后再读一遍，
+        发现自己的类别被别的进程覆盖掉就重新合并再写（最多 SAVE_RETRIES 次）。
+        """
+        if not self._new:
+            return
+        tmp = self.path.with_name(f"{self.path.name}.tmp{os.getpid()}")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            for _ in range(SAVE_RETRIES):
+                with _locked(self.path):
+                    merged = dict(self._new)
+                    merged.update(_read_json(self.path))
+                    tmp.write_text(json.dumps(dict(sorted(merged.items())), ensure_ascii=False, indent=2),
+                                   encoding="utf-8")
+                    os.replace(tmp, self.path)
+                    on_disk = _read_json(self.path)
+                if all(k in on_disk for k in self._new):
+                    break
+        except OSError as e:
+            # 目录只读等情况：颜色照样可用（摘要定色是确定的），只是不落盘
+            tmp.unlink(missing_ok=True)
+            print(f"[WARN] 颜色表写入失败：{e}")
+            return
+        self.colors.update(on_disk)
+        self._new.clear()
+
+
+@lru_cache(maxsize=None)
+def _load(path: Path) -> Palette:
+    return Palette(path)
+
+
+def get_palette(path: Optional[Path] = None) -> Palette:
+    """每个进程每个文件只读一次：参数 path > user_palette_path()；种子表总是先读"""
+    if path is None:
+        path = user_palette_path()
+    return _load(Path(path).resolve())
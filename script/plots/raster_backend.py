@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""
+染色体图的 NumPy 直接光栅化后端（Loter.py / 染色体Loter.py 共用）。
+
+出 600 dpi 的 PNG 时，不再先把几十万个图元写成 SVG 文本、再让 cairosvg 解析回来，
+而是用同一套排版坐标（SVG 逻辑单位）直接往 RGBA 数组里画：
+
+- 染色体胶囊（圆角矩形）用有符号距离场算覆盖率，边缘抗锯齿
+- 一条染色体的全部 segment 按像素行一次性着色（后画的覆盖先画的，与 SVG 一致）
+- 同尺寸的 marker 做成模板分批盖章（重叠处按顺序 alpha 合成）；连接线按 Bresenham 分批落像素
+- 文字最后交给 Pillow 画，保存时写入 DPI 元数据
+
+坐标参数一律是 SVG 逻辑单位，scale = 输出像素 / 逻辑单位。
+"""
+
+from __future__ import annotations
+
+import colorsys
+import re
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RGB = Tuple[int, int, int]
+
+# stamp / lines 每批展开的像素数上限（控制临时数组的内存）
+BATCH_PIXELS = 1 << 20
+
+NAMED_COLORS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "grey": (128, 128, 128),
+    "gray": (128, 128, 128),
+}
+
+# 依次尝试的字体文件（都找不到就用 Pillow 自带字体）
+FONT_CANDIDATES = {
+    "serif": ["times.ttf", "Times New Roman.ttf", "DejaVuSerif.ttf", "arial.ttf", "DejaVuSans.ttf"],
+    "sans": ["arial.ttf", "Arial.ttf", "DejaVuSans.ttf"],
+}
+
+
+def parse_color(color: str) -> RGB:
+    """支持 #RRGGBB、hsl(h, s%, l%) 和少量颜色名"""
+    c = color.strip()
+    if c.lower() in NAMED_COLORS:
+        return NAMED_COLORS[c.lower()]
+    if c.startswith("#"):
+        return int(c[1:3], 16), int(c[3:5], 16), int(c[5:7], 16)
+    m = re.match(r"hsl\(\s*([\d.]+)\s*,\s*([\d.]+)%\s*,\s*([\d.]+)%\s*\)", c)
+    if not m:
+        raise ValueError(f"无法解析颜色：{color}")
+    h, s, l = (float(v) for v in m.groups())
+    r, g, b = colorsys.hls_to_rgb(h / 360, l / 100, s / 100)
+    return int(round(r * 255)), int(round(g * 255)), int(round(b * 255))
+
+
+def parse_colors(colors: Sequence[str]) -> np.ndarray:
+    """颜色字符串数组 -> (n, 3) uint8；相同字符串只解析一次"""
+    uniq, inv = np.unique(np.asarray(colors, dtype=object).astype(str), return_inverse=True)
+    table = np.array([parse_color(c) for c in uniq], dtype=np.uint8).reshape(-1, 3)
+    return table[inv.reshape(-1)]
+
+
+def _rounded_rect_sdf(px: np.ndarray, py: np.ndarray,
+                      x: float, y: float, w: float, h: float, r: float) -> np.ndarray:
+    """像素中心到圆角矩形边界的有符号距离（内部为负），单位与输入一致"""
+    qx = np.abs(px - (x + w / 2)) - (w / 2 - r)
+    qy = np.abs(py - (y + h / 2)) - (h / 2 - r)
+    outside = np.hypot(np.maximum(qx, 0), np.maximum(qy, 0))
+    inside = np.minimum(np.maximum(qx, qy), 0)
+    return outside + inside - r
+
+
+class RasterCanvas:
+    def __init__(self, width: float, height: float, scale: float, background: str = "white") -> None:
+        self.scale = float(scale)
+        self.width_px = int(round(width * scale))
+        self.height_px = int(round(height * scale))
+        self.background = parse_color(background)
+        self.rgba = np.empty((self.height_px, self.width_px, 4), dtype=np.uint8)
+        self.rgba[..., :3] = self.background
+        self.rgba[..., 3] = 255
+        self._texts: List[Tuple[float, float, str, float, str, str, str]] = []
+
+    # ---------- 基础：区域混合 ----------
+
+    def _box(self, x0: float, y0: float, x1: float, y1: float) -> Tuple[slice, slice, np.ndarray, np.ndarray]:
+        """逻辑坐标包围盒 -> 像素切片 + 像素中心坐标（像素单位）"""
+        s = self.scale
+        c0 = max(int(np.floor(x0 * s)), 0)
+        c1 = min(int(np.ceil(x1 * s)), self.width_px)
+        r0 = max(int(np.floor(y0 * s)), 0)
+        r1 = min(int(np.ceil(y1 * s)), self.height_px)
+        px = np.arange(c0, max(c1, c0), dtype=np.float64) + 0.5
+        py = np.arange(r0, max(r1, r0), dtype=np.float64) + 0.5
+        return slice(r0, max(r1, r0)), slice(c0, max(c1, c0)), px, py
+
+    def _blend(self, rows: slice, cols: slice, color: np.ndarray, alpha: np.ndarray) -> None:
+        dst = self.rgba[rows, cols, :3].astype(np.float32)
+        a = alpha.astype(np.float32)[..., None]
+        dst += (np.asarray(color, dtype=np.float32) - dst) * a
+        self.rgba[rows, cols, :3] = np.rint(dst).astype(np.uint8)
+
+    def clear(self, x0: float, y0: float, x1: float, y1: float) -> None:
+        """包围盒内的像素恢复成背景色（增量重画前擦掉旧内容）"""
+        rows, cols, _, _ = self._box(x0, y0, x1, y1)
+        self.rgba[rows, cols, :3] = self.background
+        self.rgba[rows, cols, 3] = 255
+
+    # ---------- 图元 ----------
+
+    def capsule_mask(self, x: float, y: float, w: float, h: float, r: float
+                     ) -> Tuple[slice, slice, np.ndarray]:
+        """圆角矩形内部的覆盖率（0~1），用于裁剪"""
+        rows, cols, px, py = self._box(x - 1, y - 1, x + w + 1, y + h + 1)
+        s = self.scale
+        d = _rounded_rect_sdf(px[None, :], py[:, None], x * s, y * s, w * s, h * s, r * s)
+        return rows, cols, np.clip(0.5 - d, 0.0, 1.0)
+
+    def capsule(self, x: float, y: float, w: float, h: float, r: float,
+                fill: Optional[str], stroke: Optional[str], stroke_width: float) -> None:
+        pad = stroke_width + 1
+        rows, cols, px, py = self._box(x - pad, y - pad, x + w + pad, y + h + pad)
+        s = self.scale
+        d = _rounded_rect_sdf(px[None, :], py[:, None], x * s, y * s, w * s, h * s, r * s)
+        if fill:
+            self._blend(rows, cols, parse_color(fill), np.clip(0.5 - d, 0.0, 1.0))
+        if stroke and stroke_width > 0:
+            half = max(stroke_width * s, 1.0) / 2
+            self._blend(rows, cols, parse_color(stroke), np.clip(half + 0.5 - np.abs(d), 0.0, 1.0))
+
+    def column_fills(self, x0: float, x1: float, y1: np.ndarray, y2: np.ndarray, colors: np.ndarray,
+                     clip: Optional[Tuple[float, float, float, float, float]] = None) -> None:
+        """
+        一条染色体的全部 segment（x 范围相同）：
+        像素行中心落在 [y1, y2) 里就算覆盖（至少 1 行）；多段覆盖同一行时取下标最大的，
+        等价于 SVG 里按顺序后画覆盖先画。clip = 胶囊 (x, y, w, h, r)。
+        """
+        if len(y1) == 0:
+            return
+        s = self.scale
+        r0 = np.ceil(np.asarray(y1) * s - 0.5).astype(np.int64)
+        r1 = np.maximum(np.ceil(np.asarray(y2) * s - 0.5).astype(np.int64), r0 + 1)
+        r0 = np.clip(r0, 0, self.height_px)
+        r1 = np.clip(r1, 0, self.height_px)
+        top, bottom = int(r0.min()), int(r1.max())
+        if bottom <= top:
+            return
+
+        counts = r1 - r0
+        seg = np.repeat(np.arange(len(r0)), counts)
+        starts = np.repeat(r0 - np.cumsum(counts) + counts, counts)
+        rows_hit = np.arange(len(seg)) + starts - top
+        owner = np.full(bottom - top, -1, dtype=np.int64)
+        np.maximum.at(owner, rows_hit, seg)
+
+        if clip is not None:
+            colors = np.asarray(colors, dtype=np.float32)[np.maximum(owner, 0)]
+            self.row_fills(top, colors, (owner >= 0).astype(np.float32), clip)
+            return
+
+        rows, cols, px, _ = self._box(x0, top / s, x1, bottom / s)
+        rows = slice(top, bottom)
+        # 左右边缘按覆盖宽度抗锯齿
+        cov = np.clip(np.minimum(px + 0.5, x1 * s) - np.maximum(px - 0.5, x0 * s), 0.0, 1.0)
+        alpha = np.broadcast_to(cov[None, :], (bottom - top, len(px)))
+
+        # 对齐到同一行范围
+        a0, a1 = max(rows.start, top), min(rows.stop, bottom)
+        if a1 <= a0:
+            return
+        alpha = alpha[a0 - rows.start:a1 - rows.start]
+        own = owner[a0 - top:a1 - top]
+        color = np.asarray(colors, dtype=np.float32)[np.maximum(own, 0)][:, None, :]
+        alpha = alpha * (own >= 0)[:, None]
+        self._blend(slice(a0, a1), cols, color, alpha)
+
+    def row_fills(self, top: int, colors: np.ndarray, coverage: np.ndarray,
+                  clip: Tuple[float, float, float, float, float]) -> None:
+        """
+        已经按像素行算好的颜色（colors[i] 对应画布第 top + i 行，(n, 3)），
+        每行再乘覆盖率 coverage[i]（0~1），裁剪到胶囊 clip = (x, y, w, h, r) 里。
+        column_fills 和瓦片导出（预先聚合好的行颜色）共用。
+        """
+        cx, cy, cw, ch, cr = clip
+        rows, cols, alpha = self.capsule_mask(cx, cy, cw, ch, cr)
+        a0, a1 = max(rows.start, top), min(rows.stop, top + len(colors))
+        if a1 <= a0:
+            return
+        alpha = alpha[a0 - rows.start:a1 - rows.start] * np.asarray(coverage)[a0 - top:a1 - top, None]
+        color = np.asarray(colors, dtype=np.float32)[a0 - top:a1 - top][:, None, :]
+        self._blend(slice(a0, a1), cols, color, alpha)
+
+    def stamp(self, x: np.ndarray, y: np.ndarray, mask: np.ndarray, colors: np.ndarray) -> None:
+        """
+        同一个模板（mask，像素单位，左上角对齐）盖到一批位置上。
+        x/y 是模板左上角的逻辑坐标，colors 为 (n, 3)。
+        互相重叠时按顺序合成（与 SVG 里依次画一致），不按 marker × 模板像素整体展开：
+
+        - 模板里不透明的像素：每个画布像素只取最后一个盖到它的 marker（owner），
+          见 _opaque_owner；owner 表按盖章范围开一张 int32，内存与画布同量级
+        - 半透明的边缘像素：只保留 owner 之后的写入，按 marker 分批依次做 alpha 合成
+        """
+        if len(x) == 0:
+            return
+        s = self.scale
+        mask = np.asarray(mask, dtype=np.float64)
+        mh, mw = mask.shape
+        cx = np.rint(np.asarray(x, dtype=np.float64) * s).astype(np.int64)
+        cy = np.rint(np.asarray(y, dtype=np.float64) * s).astype(np.int64)
+        colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+        c0, c1 = max(int(cx.min()), 0), min(int(cx.max()) + mw, self.width_px)
+        r0, r1 = max(int(cy.min()), 0), min(int(cy.max()) + mh, self.height_px)
+        if c1 <= c0 or r1 <= r0:
+            return
+
+        # 1) 不透明像素：左上角列相同的 marker 成一组，按组分批求 owner
+        owner = np.full((r1 - r0, c1 - c0), -1, dtype=np.int32)
+        ux, g = np.unique(cx, return_inverse=True)
+        o = np.argsort(g, kind="stable")
+        bounds = np.searchsorted(g[o], np.arange(len(ux) + 1))
+        ymin = np.minimum.reduceat(cy[o], bounds[:-1])
+        ymax = np.maximum.reduceat(cy[o], bounds[:-1])
+        size = ymax - ymin + 2 * mh
+        ends = np.cumsum(size)
+        gb = 0
+        while gb < len(ux):
+            ge = max(int(np.searchsorted(ends, (ends[gb - 1] if gb else 0) + BATCH_PIXELS, side="right")), gb + 1)
+            idx = o[bounds[gb]:bounds[ge]]
+            self._opaque_owner(owner, c0, r0, mask, ux[gb:ge], ymin[gb:ge], size[gb:ge],
+                               g[idx] - gb, cy[idx], idx)
+            gb = ge
+        rr, cc = np.nonzero(owner >= 0)
+        self.rgba[r0 + rr, c0 + cc, :3] = np.rint(colors[owner[rr, cc]]).astype(np.uint8)
+
+        # 2) 半透明边缘：marker 按顺序分批，每批内同一像素的写入也按 marker 顺序合成
+        sy, sx = np.nonzero((mask > 0) & (mask < 1.0))
+        if len(sy) == 0:
+            return
+        sa = mask[sy, sx]
+        step = max(BATCH_PIXELS // len(sy), 1)
+        for b in range(0, len(cx), step):
+            i = np.repeat(np.arange(b, min(b + step, len(cx))), len(sy))
+            k = np.tile(np.arange(len(sy)), len(i) // len(sy))
+            yy, xx = cy[i] + sy[k], cx[i] + sx[k]
+            ok = (yy >= r0) & (yy < r1) & (xx >= c0) & (xx < c1)
+            i, k, yy, xx = i[ok], k[ok], yy[ok], xx[ok]
+            keep = i > owner[yy - r0, xx - c0]
+            self._composite(yy[keep] * self.width_px + xx[keep], colors[i[keep]], sa[k[keep]])
+
+    @staticmethod
+    def _opaque_owner(owner: np.ndarray, c0: int, r0: int, mask: np.ndarray,
+                      ux: np.ndarray, ymin: np.ndarray, size: np.ndarray,
+                      g: np.ndarray, cy: np.ndarray, idx: np.ndarray) -> None:
+        """
+        一批组（左上角列 ux 相同的 marker）的不透明像素 owner，合并进 owner 表（取最大下标）。
+        每组在扁平数组里占 size 行：前面 mh 个空位 + 左上角行范围 + 模板高。
+        模板每一列的不透明行是若干连续区间 [lo, hi)：第 q 行被盖到 <=> 左上角在 [q-hi+1, q-lo]，
+        于是 owner = 该窗口里左上角行号对应的最大 marker 下标，用倍增表求滑动窗口最大值。
+        """
+        mh = mask.shape[0]
+        base = np.cumsum(size) - size + mh           # 每组第 ymin 行的扁平下标
+        grp = np.repeat(np.arange(len(ux)), size)
+        t = np.arange(int(size.sum())) - base[grp]   # 扁平下标 -> 组内行号
+        row = ymin[grp] + t - r0
+        row_ok = (t >= 0) & (row >= 0) & (row < owner.shape[0])
+
+        latest = np.full(len(t), -1, dtype=np.int64)
+        np.maximum.at(latest, base[g] + cy - ymin[g], idx)
+        # 倍增表：levels[k][q] = max(latest[q-2^k+1 .. q])
+        levels = [latest]
+        while (2 << (len(levels) - 1)) <= mh:
+            w = 1 << (len(levels) - 1)
+            prev = levels[-1]
+            cur = prev.copy()
+            cur[w:] = np.maximum(prev[w:], prev[:-w])
+            levels.append(cur)
+
+        for c in range(mask.shape[1]):
+            opaque = np.r_[False, mask[:, c] >= 1.0, False].astype(np.int8)
+            edges = np.flatnonzero(np.diff(opaque))
+            if len(edges) == 0:
+                continue
+            own = np.full(len(t), -1, dtype=np.int64)
+            for lo, hi in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+                k = (hi - lo).bit_length() - 1
+                d = hi - lo - (1 << k)
+                win = levels[k].copy()
+                win[d:] = np.maximum(win[d:], levels[k][:len(t) - d])
+                own[lo:] = np.maximum(own[lo:], win[:len(t) - lo])
+            col = ux[grp] + c - c0
+            ok = row_ok & (own >= 0) & (col >= 0) & (col < owner.shape[1])
+            np.maximum.at(owner, (row[ok], col[ok]), own[ok].astype(np.int32))
+
+    def _composite(self, lin: np.ndarray, color: np.ndarray, alpha: np.ndarray) -> None:
+        """
+        一批按绘制顺序排列的半透明写入（lin = 行 * 宽 + 列，可重复，0 < alpha < 1），
+        结果与逐个混合相同：out = 底色·Π(1-a) + Σ c_i·a_i·Π_{j>i}(1-a_j)。
+        """
+        if len(lin) == 0:
+            return
+        o = np.argsort(lin, kind="stable")
+        lin, color, alpha = lin[o], color[o], alpha[o]
+        first = np.flatnonzero(np.r_[True, lin[1:] != lin[:-1]])
+        last = np.r_[first[1:], len(lin)] - 1
+        g = np.repeat(np.arange(len(first)), last - first + 1)
+
+        # 同一像素内 log(1-a) 的后缀和 = 之后各层的透过率
+        la = np.log1p(-alpha)
+        incl = np.cumsum(la)
+        w = alpha * np.exp(incl[last][g] - incl)
+        acc = np.add.reduceat(color * w[:, None], first)
+        bg_w = np.exp(incl[last] - incl[first] + la[first])
+
+        rr, cc = lin[first] // self.width_px, lin[first] % self.width_px
+        dst = self.rgba[rr, cc, :3].astype(np.float64)
+        self.rgba[rr, cc, :3] = np.rint(dst * bg_w[:, None] + acc).clip(0, 255).astype(np.uint8)
+
+    def rect_mask(self, w: float, h: float) -> np.ndarray:
+        s = self.scale
+        return np.ones((max(int(round(h * s)), 1), max(int(round(w * s)), 1)), dtype=np.float32)
+
+    def triangle_mask(self, w: float, h: float, supersample: int = 4) -> np.ndarray:
+        """顶点朝上的等腰三角形（底边在下），超采样抗锯齿"""
+        s = self.scale
+        pw, ph = max(int(round(w * s)), 1), max(int(round(h * s)), 1)
+        n = supersample
+        u = (np.arange(pw * n) + 0.5) / n
+        v = (np.arange(ph * n) + 0.5) / n
+        inside = np.abs(u[None, :] - pw / 2) <= (v[:, None] / ph) * (pw / 2)
+        return inside.reshape(ph, n, pw, n).mean(axis=(1, 3)).astype(np.float32)
+
+    def lines(self, x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray,
+              colors: np.ndarray) -> None:
+        """
+        一批 1 像素宽的细线：端点落到像素后按 Bresenham（DDA 取整）逐像素走，
+        每条线 max(|dx|, |dy|) + 1 个像素。线不透明，同一像素后画的覆盖先画的。
+        每批最多 BATCH_PIXELS 个像素。
+        """
+        if len(x1) == 0:
+            return
+        s = self.scale
+        x1, y1, x2, y2 = (np.floor(np.asarray(v, dtype=np.float64) * s).astype(np.int64)
+                          for v in (x1, y1, x2, y2))
+        dx, dy = x2 - x1, y2 - y1
+        steps = np.maximum(np.abs(dx), np.abs(dy))
+        n = steps + 1
+        colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        ends = np.cumsum(n)
+        b = 0
+        while b < len(n):
+            # 这一批取到累计像素数超过 BATCH_PIXELS 为止（至少一条线）
+            e = max(int(np.searchsorted(ends, (ends[b - 1] if b else 0) + BATCH_PIXELS, side="right")), b + 1)
+            nb = n[b:e]
+            which = np.repeat(np.arange(b, e), nb)
+            i = np.arange(int(nb.sum())) - np.repeat(np.cumsum(nb) - nb, nb)
+            st = np.maximum(steps[which], 1)
+            # round(i * d / steps)，整数运算，端点精确落在 (x2, y2)
+            px = x1[which] + np.floor_divide(2 * i * dx[which] + st, 2 * st)
+            py = y1[which] + np.floor_divide(2 * i * dy[which] + st, 2 * st)
+            ok = (px >= 0) & (px < self.width_px) & (py >= 0) & (py < self.height_px)
+            lin = py[ok] * self.width_px + px[ok]
+            which = which[ok]
+            # 同一像素只写最后一条线
+            rev = lin[::-1]
+            _, idx = np.unique(rev, return_index=True)
+            idx = len(rev) - 1 - idx
+            self.rgba.reshape(-1, 4)[lin[idx], :3] = colors[which[idx]]
+            b = e
+
+    def hgradient(self, x: float, y: float, slice_w: float, h: float, colors: np.ndarray) -> None:
+        """由 len(colors) 个等宽竖条组成的横向色带：每个像素列取其中心所在的竖条颜色"""
+        n = len(colors)
+        rows, cols, px, _ = self._box(x, y, x + slice_w * n, y + h)
+        i = np.clip(np.floor((px / self.scale - x) / slice_w).astype(np.int64), 0, n - 1)
+        self.rgba[rows, cols, :3] = np.asarray(colors, dtype=np.uint8)[i][None, :, :]
+
+    def text(self, x: float, y: float, s: str, size: float, anchor: str = "start",
+             color: str = "black", family: str = "sans") -> None:
+        """文字在保存前统一由 Pillow 绘制；(x, y) 是 SVG 的基线位置"""
+        self._texts.append((x, y, s, size, anchor, color, family))
+
+    # ---------- 输出 ----------
+
+    def _font(self, family: str, px: int):
+        from PIL import ImageFont
+        for name in FONT_CANDIDATES.get(family, FONT_CANDIDATES["sans"]):
+            try:
+                return ImageFont.truetype(name, px)
+            except OSError:
+                continue
+        try:
+            return ImageFont.load_default(size=px)
+        except TypeError:
+            return ImageFont.load_default()
+
+    def to_image(self):
+        from PIL import Image, ImageDraw
+        img = Image.fromarray(self.rgba, "RGBA")
+        if self._texts:
+            draw = ImageDraw.Draw(img)
+            anchors = {"start": "ls", "middle": "ms", "end": "rs"}
+            for x, y, s, size, anchor, color, family in self._texts:
+                font = self._font(family, max(int(round(size * self.scale)), 1))
+                pos = (x * self.scale, y * self.scale)
+                try:
+                    draw.text(pos, s, fill=parse_color(color), font=font, anchor=anchors[anchor])
+                except ValueError:
+                    # 位图字体不支持 anchor
+                    draw.text(pos, s, fill=parse_color(color), font=font)
+        return img
+
+    def save_png(self, path: Path, dpi: int) -> Path:
+        self.to_image().save(path, "PNG", dpi=(dpi, dpi))
+        return path
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+逐元素写出的 SVG 输出（Loter.py / 染色体Loter.py 共用）。
+
+以前是先把整份文档拼成 list[str] 再 "\\n".join，峰值内存是文件大小的好几倍；
+这里每个元素直接写进文件句柄，内存占用和 segment 数无关。
+
+- 输出路径以 .svgz 结尾时自动 gzip 压缩（cairosvg / 浏览器都能直接读）
+- 先写到 <name>.part，正常结束才改名为最终文件；中途出错不会留下半截 SVG
+- 元素之间用换行分隔、末尾不加换行，与原来的 "\\n".join 输出逐字节一致
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+class SvgWriter:
+    def __init__(self, path: Path, compress: Optional[bool] = None) -> None:
+        self.path = Path(path)
+        self.compress = self.path.suffix.lower() == ".svgz" if compress is None else compress
+        self._part = self.path.with_name(self.path.name + ".part")
+        self._fh = None
+        self._sep = ""
+        self.count = 0
+
+    def __enter__(self) -> "SvgWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.compress:
+            self._fh = gzip.open(self._part, "wt", encoding="utf-8")
+        else:
+            self._fh = open(self._part, "w", encoding="utf-8")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._fh.close()
+        if exc_type is None:
+            os.replace(self._part, self.path)
+        else:
+            self._part.unlink(missing_ok=True)
+
+    def write(self, element: str) -> None:
+        self._fh.write(self._sep)
+        self._fh.write(element)
+        self._sep = "\n"
+        self.count += 1
+
+    def writelines(self, elements: Iterable[str]) -> None:
+        for e in elements:
+            self.write(e)
@@ -11,6 +11,7 @@
 用法示例：
   python draw_from_txt_redraw.py --txt loter_segment.txt --out chromosome.svg
   python draw_from_txt_redraw.py --txt loter_segment.txt --out chromosome_unified.svg --scheme unified
+  python draw_from_txt_redraw.py --txt loter_segment.txt --out chromosome_x.svg --genome ARS-UCD1.2.fa.fai   # 换组装 / 带 X
 
 可选参数：
   --scheme  original | unified   (默认: unified)
@@ -22,17 +23,26 @@ from __future__ import annotations
 
 import argparse
 import base64
+import hashlib
 import json
 import zlib
 from decimal import Decimal, ROUND_HALF_UP, getcontext
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Tuple  # 你现在报错的 Dict 就在这里
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple  # 你现在报错的 Dict 就在这里
 import os
+import numpy as np
 import pandas as pd
-import cairosvg
 import decimal
 # 然后把 ROUND_HALF_UP 改成 decimal.ROUND_HALF_UP
 
+import instrument
+from assembly import DEFAULT_ASSEMBLY, Assembly, get_assembly
+from loter_cache import default_cache_dir, load_table
+from palette import get_palette
+from raster_backend import RasterCanvas, parse_colors
+from svg_writer import SvgWriter
+
 
 # ======= 固定画布参数（与原图一致） =======
 SVG_WIDTH = Decimal("744.0945")
@@ -41,12 +51,13 @@ R = Decimal("4.46437884615385")              # 圆角半径，同时也是 marke
 MARKER_SIZE = R
 MARKER_HALF = R / 2
 BASELINE = Decimal("620.078725")             # 染色体底部参考线（y）
-H_TOTAL_MAX = Decimal("531.49605")           # chr1 的总高度（含圆角）
-LEN_CHR1 = Decimal("158534110")              # chr1 长度（用于计算 scale）
-SCALE_Y = H_TOTAL_MAX / LEN_CHR1
-
-CHR_X1 = ['70.86614', '94.08091', '117.29568', '140.51045', '163.72522', '186.93999', '210.15476', '233.36953', '256.5843', '279.79907', '303.01384', '326.22861', '349.44338', '372.65815', '395.87292', '419.08769', '442.30246', '465.51723', '488.732', '511.94677', '535.16154', '558.37631', '581.59108', '604.80585', '628.02062', '651.23539', '674.45016', '697.66493', '720.8797']
-CHR_LENGTHS = {"1": 158534110, "2": 136231102, "3": 121005158, "4": 120000601, "5": 120089316, "6": 117806340, "7": 110682743, "8": 113319770, "9": 105454467, "10": 103308737, "11": 106982474, "12": 87216183, "13": 83472345, "14": 82403003, "15": 85007780, "16": 81013979, "17": 73167244, "18": 65820629, "19": 63449741, "20": 71974595, "21": 69862954, "22": 60773035, "23": 52498615, "24": 62317253, "25": 42350435, "26": 51992305, "27": 45612108, "28": 45940150, "29": 51098607}
+H_TOTAL_MAX = Decimal("531.49605")           # 最长一条染色体（原图 chr1）的总高度（含圆角）
+# 染色体列：第一条 / 最后一条的左边 x。原图 29 条，间距 23.21477；条数不同就在两者之间均分
+CHR_X_FIRST = Decimal("70.86614")
+CHR_X_LAST = Decimal("720.8797")
+# 染色体编号相对 x1 的偏移：一个字符 / 两个及以上字符
+LABEL_DX_SINGLE = Decimal("2.26437884615385")
+LABEL_DX_DOUBLE = Decimal("0.06437884615385")
 
 # ======= 颜色方案 =======
 FREQ_TO_COLOR_ORIGINAL = {"0.7667": "#B84F41", "0.8000": "#A3503D", "0.7333": "#CE4D47", "0.8333": "#8D5238", "0.8667": "#785332", "0.7500": "#C34E44", "0.9000": "#62552D", "0.9333": "#4D5629", "0.8833": "#6D5430", "0.9667": "#375823", "0.9833": "#2C5921", "0.9500": "#425726", "1.0000": "#225A1F", "0.9166": "#57562B"}
@@ -76,6 +87,157 @@ def _decode_marker_map() -> Dict[Tuple[int, int, int], str]:
     return {(int(r[0]), int(r[1]), int(r[2])): str(r[3]) for r in data}
 
 
+# ======= 内置查找表：每个进程只解码一次，整列一次 searchsorted =======
+# (chr, start, end) 打包成一个 int64：chr 占高 8 位，start / end 各 28 位（牛最长的 chr1 也不到 2^28）
+_KEY_BITS = 28
+_KEY_MAX = 1 << _KEY_BITS
+
+
+def _pack_keys(chr_num, start, end) -> np.ndarray:
+    """打包键；超出范围的行给 -1（表里的键都 >= 0，不会误命中）"""
+    c = np.asarray(chr_num, dtype=np.int64)
+    s = np.asarray(start, dtype=np.int64)
+    e = np.asarray(end, dtype=np.int64)
+    ok = (c >= 0) & (c < 128) & (s >= 0) & (s < _KEY_MAX) & (e >= 0) & (e < _KEY_MAX)
+    return np.where(ok, (c << (2 * _KEY_BITS)) | (s << _KEY_BITS) | e, -1)
+
+
+def _parse_m15(text: str) -> int:
+    """marker 的 y 字符串 -> 10^-15 定点整数；负数 / 指数 / 小数位太多等解析不了的返回 -1"""
+    a, _, b = text.partition(".")
+    if not a.isdigit() or len(b) > 15 or (b and not b.isdigit()) or int(a) >= 9000:
+        return -1
+    return int(a) * 10 ** 15 + int(b.ljust(15, "0"))
+
+
+class MarkerTable(NamedTuple):
+    """MARKER_BLOB 解码后的紧凑形式：按打包键排序的数组"""
+    keys: np.ndarray     # int64，升序
+    text: np.ndarray     # 原始 y 字符串（Decimal 路径用）
+    m15: np.ndarray      # 10^-15 定点；解析不了为 -1
+
+    def find(self, chr_num, start, end) -> np.ndarray:
+        """每行在表里的下标；没有映射为 -1"""
+        q = _pack_keys(chr_num, start, end)
+        if len(self.keys) == 0:
+            return np.full(len(q), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.keys, q), len(self.keys) - 1)
+        return np.where(self.keys[pos] == q, pos, -1)
+
+    def text_of(self, idx: np.ndarray) -> List[Optional[str]]:
+        return [None if k < 0 else v for k, v in zip(idx.tolist(), self.text[np.maximum(idx, 0)].tolist())]
+
+
+def _build_marker_table() -> MarkerTable:
+    mm = _decode_marker_map()
+    recs = np.array(list(mm), dtype=np.int64).reshape(-1, 3)
+    keys = _pack_keys(recs[:, 0], recs[:, 1], recs[:, 2])
+    if (keys < 0).any():
+        raise ValueError("MARKER_BLOB 里有超出打包范围的 (chr, start, end)")
+    order = np.argsort(keys, kind="stable")
+    text = np.array(list(mm.values()), dtype=str)[order]
+    m15 = np.array([_parse_m15(t) for t in text.tolist()], dtype=np.int64)
+    return MarkerTable(keys[order], text, m15)
+
+
+@lru_cache(maxsize=None)
+def marker_table(sidecar_dir: Optional[str] = None) -> MarkerTable:
+    """
+    解码一次、进程内常驻。给了 sidecar_dir 时把结果存成 marker_table_<摘要>.npz，
+    之后的进程直接 np.load（MARKER_BLOB 改了摘要就变，旧文件自然不再使用）。
+    """
+    if sidecar_dir is None:
+        return _build_marker_table()
+    digest = hashlib.blake2b(MARKER_BLOB.encode("ascii"), digest_size=8).hexdigest()
+    path = Path(sidecar_dir) / f"marker_table_{digest}.npz"
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            return MarkerTable(z["keys"], z["text"], z["m15"])
+    except (OSError, KeyError, ValueError):
+        pass
+    table = _build_marker_table()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, keys=table.keys, text=table.text, m15=table.m15)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[WARN] marker 表 sidecar 写不了（{e}），本次只在内存里用")
+    return table
+
+
+# Frequency 一律截断（不是四舍五入）到万分位，用整数表示：0.73339 -> 7333，1 -> 10000
+FREQ_SCALE = 10000
+# 字符串长于这个的行可能超出 float64 的 15 位有效数字，逐行用 Decimal 精确截断
+_FREQ_FLOAT_CHARS = 15
+
+
+def _freq_e4_exact(val: str) -> int:
+    """逐行精确截断（向 0 截断，与原来按字符串切 4 位小数相同）；解析不了返回 -1"""
+    try:
+        d = Decimal(str(val).strip())
+    except decimal.InvalidOperation:
+        return -1
+    return int(d.scaleb(4)) if d.is_finite() else -1
+
+
+def freq_e4(values: pd.Series) -> np.ndarray:
+    """Frequency 字符串列 -> 截断到万分位的 int64（解析不了的为 -1），整列一次算完"""
+    raw = values.to_numpy(dtype=object)
+    try:
+        f = raw.astype(np.float64)  # 逐个 float()：正确舍入，允许首尾空白
+    except (TypeError, ValueError):
+        f = pd.to_numeric(values.astype(str).str.strip(), errors="coerce").to_numpy(dtype=np.float64)
+    ok = np.isfinite(f)
+    f = np.where(ok, f, 0.0)
+    x = f * FREQ_SCALE
+    k = np.trunc(x)
+    # 0.7333*10000 在浮点里可能是 7332.999…：离整数很近时改用 near/10000 与 f 本身比较
+    # （两边都是正确舍入的 float64，15 位有效数字以内的大小关系与十进制一致）
+    near = np.rint(x)
+    close = np.abs(x - near) < 1e-6
+    edge = near / FREQ_SCALE
+    k = np.where(close & (f >= 0), np.where(f >= edge, near, near - 1), k)
+    k = np.where(close & (f < 0), np.where(f <= edge, near, near + 1), k)
+    k = np.where(ok, k, -1).astype(np.int64)
+    lengths = np.fromiter(map(len, map(str, raw)), dtype=np.int64, count=len(raw))
+    long_rows = np.flatnonzero(lengths > _FREQ_FLOAT_CHARS)
+    if len(long_rows):
+        k[long_rows] = [_freq_e4_exact(v) for v in raw[long_rows]]
+    return k
+
+
+@lru_cache(maxsize=None)
+def freq_color_table(scheme: str, gradient_fallback: bool = False) -> np.ndarray:
+    """配色表 -> 长 FREQ_SCALE+1 的颜色数组（下标 = 万分位整数，大写；表里没有的是 ""）"""
+    table = FREQ_TO_COLOR_ORIGINAL if scheme == "original" else FREQ_TO_COLOR_UNIFIED
+    dense = np.full(FREQ_SCALE + 1, "", dtype=object)
+    if gradient_fallback:
+        # 表里没有的频率按渐变条取色（与表里的颜色来自同一条渐变）
+        lo, hi = round(GRADIENT_FREQ_LO * FREQ_SCALE), round(GRADIENT_FREQ_HI * FREQ_SCALE)
+        lut = np.array(gradient_lut(scheme), dtype=object)
+        dense[lo:hi + 1] = lut[gradient_index(np.arange(lo, hi + 1) / FREQ_SCALE)]
+    for k, c in table.items():
+        dense[int(k.replace(".", ""))] = c.upper()
+    dense.setflags(write=False)
+    return dense
+
+
+def lookup_fills(df: pd.DataFrame, scheme: str) -> np.ndarray:
+    """每行的段落颜色（大写）；查不到的 Frequency 一次性全部列出后报 KeyError"""
+    dense = freq_color_table(scheme, FILL_GRADIENT_FALLBACK)
+    k = df["freq_e4"].to_numpy()
+    inside = (k >= 0) & (k <= FREQ_SCALE)
+    fills = dense[np.where(inside, k, 0)]
+    bad = ~inside | (fills == "")
+    if bad.any():
+        counts = df.loc[bad, "Frequency"].astype(str).value_counts()
+        shown = "，".join(f"{v}（{n} 行）" for v, n in counts.head(20).items())
+        more = f" 等 {len(counts)} 个值" if len(counts) > 20 else ""
+        raise KeyError(f"Frequency 在配色表中不存在：{shown}{more}，共 {int(bad.sum())} 行")
+    return fills
+
+
 def _hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
     c = hex_color.lstrip("#")
     return int(c[0:2], 16), int(c[2:4], 16), int(c[4:6], 16)
@@ -103,6 +265,116 @@ def _gradient_color(i: int, n: int, scheme: str) -> str:
     return GRADIENT_MAP_UNIFIED.get(old, old)
 
 
+# ======= 渐变色 LUT（图例和段落颜色共用，每个方案只算一次） =======
+# 图例渐变条的级数、位置（原图是 5000 个窄矩形），两端对应的 Frequency
+GRADIENT_STEPS = 5000
+LEGEND_X0 = Decimal("566.92912")
+LEGEND_Y0 = Decimal("124.015745")
+LEGEND_W = Decimal("0.014173228")
+LEGEND_H = Decimal("14.173228")
+GRADIENT_FREQ_LO = 0.7
+GRADIENT_FREQ_HI = 1.0
+# 图例画法：rects    = 原图的 GRADIENT_STEPS 个窄矩形（紧凑 SVG 里相邻同色合并）
+#           gradient = 一个 <linearGradient>（只在线性插值偏差超过 1 个色阶的地方加 stop）
+LEGEND_MODE = "rects"
+# 配色表里没有的 Frequency：False 报 KeyError（原行为）；True 在 [LO, HI] 内按渐变条取色
+FILL_GRADIENT_FALLBACK = False
+
+
+@lru_cache(maxsize=None)
+def _unified_gradient_table() -> Tuple[np.ndarray, np.ndarray]:
+    """GRADIENT_MAP_UNIFIED -> (排序后的 0xRRGGBB 键, 对应的 0xRRGGBB)"""
+    keys = np.array([int(k[1:], 16) for k in GRADIENT_MAP_UNIFIED], dtype=np.int64)
+    vals = np.array([int(v[1:], 16) for v in GRADIENT_MAP_UNIFIED.values()], dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    return keys[order], vals[order]
+
+
+@lru_cache(maxsize=None)
+def gradient_rgb(scheme: str, n: int = GRADIENT_STEPS) -> np.ndarray:
+    """n 级渐变的 (n, 3) int64 RGB（只读）；第 i 级与 _gradient_color(i, n-1, scheme) 相同"""
+    c0 = np.array(_hex_to_rgb(GRADIENT_LEFT_ORIG), dtype=np.int64)
+    c1 = np.array(_hex_to_rgb(GRADIENT_RIGHT_ORIG), dtype=np.int64)
+    i = np.arange(n, dtype=np.int64)[:, None]
+    rgb = (c0 * (n - 1 - i) + c1 * i) // (n - 1)
+    if scheme != "original":
+        packed = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+        keys, vals = _unified_gradient_table()
+        pos = np.minimum(np.searchsorted(keys, packed), len(keys) - 1)
+        packed = np.where(keys[pos] == packed, vals[pos], packed)
+        rgb = np.stack([packed >> 16, (packed >> 8) & 0xFF, packed & 0xFF], axis=1)
+    rgb.setflags(write=False)
+    return rgb
+
+
+@lru_cache(maxsize=None)
+def gradient_lut(scheme: str, n: int = GRADIENT_STEPS) -> Tuple[str, ...]:
+    """n 级渐变色（大写 #RRGGBB）"""
+    return tuple(_rgb_to_hex(tuple(c)) for c in gradient_rgb(scheme, n).tolist())
+
+
+def gradient_index(freq: np.ndarray, n: int = GRADIENT_STEPS) -> np.ndarray:
+    """Frequency -> 渐变条的级数下标（四舍五入；配色表里的 14 个颜色都落在各自下标的那一级上）"""
+    t = (np.asarray(freq, dtype=np.float64) - GRADIENT_FREQ_LO) / (GRADIENT_FREQ_HI - GRADIENT_FREQ_LO)
+    return np.rint(t * (n - 1)).astype(np.int64)
+
+
+@lru_cache(maxsize=None)
+def legend_rects(scheme: str) -> Tuple[str, ...]:
+    """默认 SVG 的渐变条：GRADIENT_STEPS 个 <rect>，与逐个用 Decimal 算 x 的写法逐字节一致"""
+    # x0 与宽度都只有 9 位小数：换成 1e-9 的整数后整列相加，不再逐个做 Decimal 乘法
+    x0, w = int(LEGEND_X0.scaleb(9)), int(LEGEND_W.scaleb(9))
+    assert LEGEND_X0.scaleb(9) == x0 and LEGEND_W.scaleb(9) == w
+    ip, fp = np.divmod(x0 + w * np.arange(GRADIENT_STEPS, dtype=np.int64), 10 ** 9)
+    xs = [f"{a}.{b:09d}".rstrip("0").rstrip(".") for a, b in zip(ip.tolist(), fp.tolist())]
+    y, wd, h = _fmt_y(LEGEND_Y0), _fmt_y(LEGEND_W), _fmt_y(LEGEND_H)
+    return tuple(f'<rect x="{x}" y="{y}" width="{wd}" height="{h}" style="fill:{c};stroke:none"/>'
+                 for x, c in zip(xs, gradient_lut(scheme)))
+
+
+@lru_cache(maxsize=None)
+def gradient_stops(scheme: str, n: int = GRADIENT_STEPS) -> Tuple[Tuple[int, str], ...]:
+    """<linearGradient> 的 stop：(级数下标, 颜色)。
+
+    从上一个 stop 往后找最远的一级，使两者之间线性插值出的每一级与 LUT 的差都不超过 1 个色阶
+    （先倍增再二分）。original 方案本来就是线性插值，只剩两端两个 stop。
+    """
+    rgb = gradient_rgb(scheme, n).astype(np.float64)
+
+    def ok(a: int, c: int) -> bool:
+        t = np.arange(c - a + 1, dtype=np.float64)[:, None] / (c - a)
+        return bool(np.abs(rgb[a] + (rgb[c] - rgb[a]) * t - rgb[a:c + 1]).max() <= 1.0)
+
+    keep = [0]
+    a = 0
+    while a < n - 1:
+        step = 1
+        while a + 2 * step <= n - 1 and ok(a, a + 2 * step):
+            step *= 2
+        lo, hi = a + step, min(a + 2 * step, n)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if ok(a, mid):
+                lo = mid
+            else:
+                hi = mid
+        keep.append(lo)
+        a = lo
+    lut = gradient_lut(scheme, n)
+    return tuple((k, lut[k]) for k in keep)
+
+
+def legend_gradient(scheme: str, fmt: Callable[[Decimal], str]) -> str:
+    """LEGEND_MODE="gradient" 的渐变条：<defs> 里一个 <linearGradient> + 一个 <rect>"""
+    n = GRADIENT_STEPS
+    # 第 k 级覆盖 [k/n, (k+1)/n)，stop 放在中点
+    stops = "".join(f'<stop offset="{f"{(k + 0.5) / n:.5f}".rstrip("0").rstrip(".")}" stop-color="{c}"/>'
+                    for k, c in gradient_stops(scheme, n))
+    return (f'<defs><linearGradient id="legend">{stops}</linearGradient></defs>'
+            f'<rect x="{fmt(LEGEND_X0)}" y="{fmt(LEGEND_Y0)}" width="{fmt(LEGEND_W * n)}" '
+            f'height="{fmt(LEGEND_H)}" fill="url(#legend)"/>')
+
+
 def _fmt_y(d: Decimal) -> str:
     # 与原图一致的 12 位小数（去掉多余 0）
     q = d.quantize(Decimal("0.000000000001"), rounding=ROUND_HALF_UP)
@@ -121,178 +393,626 @@ def _fmt_x(d: Decimal) -> str:
     return s
 
 
-def _chr_geom(chr_num: int) -> Tuple[Decimal, Decimal, Decimal, Decimal]:
-    """返回 (x1, x2, y_topmost, yTopArc)"""
-    x1 = Decimal(str(CHR_X1[chr_num-1]))
-    x2 = x1 + 2*R
-    L = Decimal(str(CHR_LENGTHS[str(chr_num)]))
-    # y_topmost = baseline - scale*L
-    y_topmost = BASELINE - SCALE_Y * L
-    # yTopArc = y_topmost + R
-    yTopArc = y_topmost + R
-    return x1, x2, y_topmost, yTopArc
+def _fmt_c(d: Decimal) -> str:
+    # 紧凑 SVG 用：3 位小数就够（600 dpi 下误差不到 0.01 像素）
+    q = d.quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+    s = format(q, "f")
+    if "." in s:
+        s = s.rstrip("0").rstrip(".")
+    return s
+
+
+class ChromLayout(NamedTuple):
+    """一个组装在原图版式下的几何量；各数组下标 = 染色体在组装里的序号（0 起）"""
+    assembly: Assembly
+    scale_y: Decimal                                        # 最长一条染色体画 H_TOTAL_MAX 高
+    geom: Tuple[Tuple[Decimal, Decimal, Decimal, Decimal], ...]   # 每条 (x1, x2, y_topmost, yTopArc)
+    label_x: Tuple[Decimal, ...]                            # 底部编号的 x
+    lengths: np.ndarray                                     # int64
+    marker_chr: np.ndarray                                  # MarkerTable 的 chr 键（内置 marker 不适用的为 -1）
+    x1: np.ndarray                                          # 以下 float64，光栅化用
+    x2: np.ndarray
+    y_topmost: np.ndarray
+
+    def rows(self, df: pd.DataFrame) -> np.ndarray:
+        """每行 segment 的染色体序号；TXT 里有组装里没有的染色体时一次性全部列出后报 KeyError"""
+        cat = df["Chr"].astype("category")
+        pos = self.assembly.chrom_index(cat.cat.categories.astype(str))
+        codes = cat.cat.codes.to_numpy()
+        idx = np.where(codes >= 0, np.append(pos, -1)[codes], -1)
+        bad = idx < 0
+        if bad.any():
+            counts = df.loc[bad, "Chr"].astype(str).value_counts()
+            shown = "，".join(f"{v}（{n} 行）" for v, n in counts.head(20).items())
+            raise KeyError(f"染色体不在组装 {self.assembly.name} 里：{shown}，共 {int(bad.sum())} 行（见 --genome）")
+        return idx
+
+
+@lru_cache(maxsize=None)
+def chrom_layout(asm: Optional[Assembly] = None) -> ChromLayout:
+    """
+    按染色体条数排列：x1 在 CHR_X_FIRST..CHR_X_LAST 之间等距，高度比例按最长的一条。
+    默认组装下与原来写死的 CHR_X1 / SCALE_Y 逐位相同：比例按 Decimal 默认的 28 位精度算
+    （原来在 import 时算），其余按 generate_svg 里的 40 位精度算。
+    """
+    asm = asm or get_assembly()
+    ctx28, ctx40 = decimal.Context(prec=28), decimal.Context(prec=40)
+    n = len(asm.chroms)
+    pitch = ctx28.divide(CHR_X_LAST - CHR_X_FIRST, Decimal(n - 1)) if n > 1 else Decimal(0)
+    if n > 1 and pitch < 2 * R:
+        print(f"[WARN] 组装 {asm.name} 有 {n} 条染色体，列间距 {float(pitch):.2f} 小于柱宽，相邻染色体会重叠")
+    scale_y = ctx28.divide(H_TOTAL_MAX, Decimal(max(asm.lengths)))
+    geom, label_x = [], []
+    for i, (name, L) in enumerate(zip(asm.chroms, asm.lengths)):
+        x1 = ctx40.add(CHR_X_FIRST, ctx40.multiply(pitch, Decimal(i)))
+        x2 = ctx40.add(x1, ctx40.multiply(2, R))
+        y_topmost = ctx40.subtract(BASELINE, ctx40.multiply(scale_y, Decimal(L)))
+        geom.append((x1, x2, y_topmost, ctx40.add(y_topmost, R)))
+        label_x.append(ctx40.add(x1, LABEL_DX_SINGLE if len(name) == 1 else LABEL_DX_DOUBLE))
+    # 内置 marker 的 y 是原图上的绝对坐标：只有比例相同、同名染色体长度也相同时才能用
+    ref = get_assembly()
+    ref_len = dict(zip(ref.chroms, ref.lengths))
+    same_scale = scale_y == ctx28.divide(H_TOTAL_MAX, Decimal(max(ref.lengths)))
+    marker_chr = np.array([int(c) if same_scale and c.isdigit() and ref_len.get(c) == L else -1
+                           for c, L in zip(asm.chroms, asm.lengths)], dtype=np.int64)
+    x1f, x2f, ytf = (np.array([float(g[k]) for g in geom]) for k in range(3))
+    return ChromLayout(asm, scale_y, tuple(geom), tuple(label_x), np.array(asm.lengths, dtype=np.int64),
+                       marker_chr, x1f, x2f, ytf)
+
+
+# ======= 每行的 y 坐标（两套引擎，输出字符串逐字节一致） =======
+# "fixed"  ：NumPy int64 定点整数，整列一次算完（默认）
+# "decimal"：原来的逐行 40 位 Decimal
+GEOMETRY_ENGINE = "fixed"
+
+
+class RowGeometry(NamedTuple):
+    """每个 segment 一行的 y 坐标字符串（已按 _fmt_y / _fmt_c 格式化）"""
+    y1: List[str]
+    y2: List[str]
+    y_center: List[str]
+    marker: List[str]        # marker 中心
+    marker_lo: List[str]     # marker 中心 - MARKER_HALF（方块的 y、三角的顶点）
+    marker_hi: List[str]     # marker 中心 + MARKER_HALF（三角的底边）
+    missing: int             # marker 映射缺失、退化为段中心的行数
+
+
+def _row_decimal(y_topmost: Decimal, scale_y: Decimal, start: int, end: int, y2s: Optional[str],
+                 fmt: Callable[[Decimal], str]) -> Tuple[str, ...]:
+    """一行的 Decimal 计算（与原来 generate_svg 里的写法完全相同）"""
+    y1 = y_topmost + scale_y*Decimal(start)
+    y2 = y_topmost + scale_y*Decimal(end)
+    y_center = (y1 + y2) / 2
+    marker_center = y_center if y2s is None else Decimal(str(y2s))
+    return (fmt(y1), fmt(y2), fmt(y_center)) + _marker_decimal(marker_center, fmt)
+
+
+def _marker_decimal(marker_center: Decimal, fmt: Callable[[Decimal], str]) -> Tuple[str, str, str]:
+    """marker 中心、上沿、下沿"""
+    return fmt(marker_center), fmt(marker_center - MARKER_HALF), fmt(marker_center + MARKER_HALF)
+
+
+def _geometry_decimal(df: pd.DataFrame, markers: MarkerTable,
+                      fmt: Callable[[Decimal], str], layout: ChromLayout) -> RowGeometry:
+    getcontext().prec = 40
+    ci = layout.rows(df)
+    start, end = (df[c].to_numpy(dtype=np.int64) for c in ("Start", "End"))
+    y2s_all = markers.text_of(markers.find(layout.marker_chr[ci], start, end))
+    rows = []
+    missing = 0
+    for c, a, b, y2s in zip(ci.tolist(), start.tolist(), end.tolist(), y2s_all):
+        missing += y2s is None
+        rows.append(_row_decimal(layout.geom[c][2], layout.scale_y, a, b, y2s, fmt))
+    cols = [list(c) for c in zip(*rows)] if rows else [[] for _ in range(6)]
+    return RowGeometry(*cols, missing=missing)
+
+
+def _round_half_up(top: np.ndarray, unit: int) -> np.ndarray:
+    """top / unit 按 ROUND_HALF_UP 取整（top >= 0，unit 为偶数）"""
+    q, rem = np.divmod(top, unit)
+    return q + (rem >= unit // 2)
+
+
+def _digit_matrix(v: np.ndarray, width: int) -> np.ndarray:
+    """非负 int64 -> (n, width) 的十进制各位（高位在前，uint8）；每 9 位一段放进 int32 里拆"""
+    out = np.empty((len(v), width), dtype=np.uint8)
+    p10 = 10 ** np.arange(8, -1, -1, dtype=np.int32)
+    for hi in range(width, 0, -9):
+        lo = max(hi - 9, 0)
+        v, part = np.divmod(v, 10 ** (hi - lo))
+        out[:, lo:hi] = part.astype(np.int32)[:, None] // p10[9 - (hi - lo):] % 10
+    return out
+
+
+def _fmt_fixed(q: np.ndarray, places: int, chunk: int = 1 << 16) -> List[str]:
+    """
+    以 10^-places 为单位的非负整数 -> 与 _fmt_y / _fmt_c 相同的字符串（去掉多余的 0）。
+    整批拆出各位数字，拼成“整数部分 . 小数部分”的字符码矩阵，末尾多余的 0（和没有小数时的点）
+    置成 NUL 后直接当定长 unicode 数组取出，不逐个值做 Python 格式化。
+    """
+    q = np.asarray(q, dtype=np.int64)
+    if len(q) == 0:
+        return []
+    mx = len(str(int(q.max()) // 10 ** places))     # 整数部分最多几位
+    width = mx + 1 + places
+    col = np.arange(width)
+    out: List[str] = []
+    for b in range(0, len(q), chunk):
+        i, f = np.divmod(q[b:b + chunk], 10 ** places)
+        frac, whole = _digit_matrix(f, places), _digit_matrix(i, mx)
+        nz = frac != 0
+        keep = np.where(nz.any(axis=1), places - np.argmax(nz[:, ::-1], axis=1), 0)
+        # 整数部分的前导 0 个数（至少留一位）：每行从这一列开始取
+        lead_nz = whole != 0
+        lead_nz[:, -1] = True
+        lead = np.argmax(lead_nz, axis=1)
+
+        code = np.empty((len(i), width), dtype=np.uint32)
+        code[:, :mx] = whole
+        code[:, mx] = ord(".")
+        code[:, mx + 1:] = frac
+        code[:, :mx] += ord("0")
+        code[:, mx + 1:] += ord("0")
+        code[col >= (mx + np.where(keep > 0, keep + 1, 0))[:, None]] = 0
+
+        leads = np.unique(lead).tolist()
+        if len(leads) == 1:
+            out += np.ascontiguousarray(code[:, leads[0]:]).view(f"<U{width - leads[0]}").ravel().tolist()
+            continue
+        part = np.empty(len(i), dtype=object)
+        for L in leads:
+            rows = np.flatnonzero(lead == L)
+            part[rows] = np.ascontiguousarray(code[rows, L:]).view(f"<U{width - L}").ravel()
+        out += part.tolist()
+    return out
+
+
+def _geometry_fixed(df: pd.DataFrame, markers: MarkerTable, places: int,
+                    fmt: Callable[[Decimal], str], layout: ChromLayout) -> Optional[RowGeometry]:
+    """
+    与 _geometry_decimal 逐字节一致的定点整数实现；前提不满足时返回 None（调用方退回 Decimal）。
+
+    Decimal 路径里 y = BASELINE - scale_y*(L - start) 其实是精确的有理数：
+    scale_y 有 D 位小数（按 28 位精度算出，默认组装 D = 33），乘积和差都不超过 40 位，
+    所以 y*10^D 是整数。这里把它拆成 top*10^18 + bottom 两个 int64（scale_y 再拆成三段 10^9 的“limb”
+    做乘法进位），舍入时只看 top 的低位即可精确判断 ROUND_HALF_UP，不需要近似或容差。
+    marker 中心用 MarkerTable 里预先解析好的 10^-15 定点值；解析不了（位数太多等）的行只有 marker 三列单独走 Decimal。
+    """
+    scale_y = layout.scale_y
+    D = -scale_y.as_tuple().exponent
+    K = D - places                         # 从 10^-D 舍入到 10^-places 要去掉的位数
+    # 31 <= D：top 的低位能完整决定舍入；D <= 35：原 Decimal 路径在 40 位精度下没有发生舍入
+    if not (K >= 19 and D <= 35 and scale_y > 0 and -BASELINE.as_tuple().exponent <= D - 18):
+        return None
+    S = int(scale_y.scaleb(D))
+    s2, s1, s0 = S // 10 ** 18, S // 10 ** 9 % 10 ** 9, S % 10 ** 9
+    b_hi = int(BASELINE.scaleb(D - 18))
+
+    ci = layout.rows(df)
+    start = df["Start"].to_numpy(dtype=np.int64)
+    end = df["End"].to_numpy(dtype=np.int64)
+    chr_len = layout.lengths[ci]
+
+    def limbs(pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # y*10^D = b_hi*10^18 - S*n，n = L - pos；返回 (top, bottom)，0 <= bottom < 10^18
+        n = chr_len - pos
+        c0, r0 = np.divmod(s0 * n, 10 ** 9)
+        c1, r1 = np.divmod(s1 * n + c0, 10 ** 9)
+        p2 = s2 * n + c1
+        low = r1 * 10 ** 9 + r0
+        return b_hi - p2 - (low > 0), np.where(low > 0, 10 ** 18 - low, 0)
+
+    # int64 不溢出：s2*n < 2^62；原 Decimal 路径的乘积 scale_y*L 不超过 40 位（否则它自己就舍入了）
+    n_max = int(np.abs(chr_len - np.minimum(start, end)).max(initial=0))
+    n_max = max(n_max, int(np.abs(chr_len - np.maximum(start, end)).max(initial=0)))
+    pos_max = int(max(chr_len.max(initial=0), np.abs(start).max(initial=0), np.abs(end).max(initial=0)))
+    if (s2 + 1) * n_max >= 2 ** 62 or n_max >= 2 ** 32 or len(str(S)) + len(str(pos_max)) > 40:
+        return None
+    t1, b1 = limbs(start)
+    t2, b2 = limbs(end)
+    if (t1 < 0).any() or (t2 < 0).any():
+        return None                         # y < 0 时 ROUND_HALF_UP 是远离 0，这里不处理
+    unit = 10 ** (K - 18)
+    y1 = _round_half_up(t1, unit)
+    y2 = _round_half_up(t2, unit)
+    # 段中心：(y1 + y2)/2 多一位小数，按 2*unit 舍入
+    carry = b1 + b2 >= 10 ** 18
+    ts = t1 + t2 + carry                   # 2*y_center*10^D 的高位
+    yc = _round_half_up(ts, 2 * unit)
+
+    # marker 中心（字符串）-> 10^-15 定点；MARKER_HALF 正好 15 位小数
+    half = MARKER_HALF.scaleb(15)
+    if half != half.to_integral_value():
+        return None
+    half = int(half)
+    idx = markers.find(layout.marker_chr[ci], start, end)
+    missing = idx < 0
+    m15 = np.where(missing, 0, markers.m15[np.maximum(idx, 0)])
+    slow = ~missing & (m15 < half)        # 解析不了（-1）或减去半边长会变负
+    mu = 10 ** (15 - places)
+    mc = _round_half_up(m15, mu)
+    mlo = _round_half_up(np.maximum(m15 - half, 0), mu)
+    mhi = _round_half_up(m15 + half, mu)
+
+    # 缺映射的行 marker 退化为段中心：在 2*y_center*10^D 的高位上 ±2*MARKER_HALF
+    if missing.any():
+        if D >= 33:
+            h2 = 2 * half * 10 ** (D - 33)
+            mc = np.where(missing, yc, mc)
+            mlo = np.where(missing, _round_half_up(np.maximum(ts - h2, 0), 2 * unit), mlo)
+            mhi = np.where(missing, _round_half_up(ts + h2, 2 * unit), mhi)
+            slow |= missing & (ts < h2)
+        else:
+            slow |= missing
+
+    cols = [_fmt_fixed(v, places) for v in (y1, y2, yc, mc, mlo, mhi)]
+    # 只有 marker 三列可能超出定点范围（marker 字符串解析不了，或减去半边长后为负）：
+    # 这些行只补算这三列，y1 / y2 / 段中心用上面的结果
+    if slow.any():
+        getcontext().prec = 40
+        for k in np.flatnonzero(slow).tolist():
+            if idx[k] >= 0:
+                center = Decimal(str(markers.text[idx[k]]))
+            else:
+                y_topmost = layout.geom[ci[k]][2]
+                center = (y_topmost + scale_y*Decimal(int(start[k])) + (y_topmost + scale_y*Decimal(int(end[k])))) / 2
+            cols[3][k], cols[4][k], cols[5][k] = _marker_decimal(center, fmt)
+    return RowGeometry(*cols, missing=int(missing.sum()))
+
+
+def row_geometry(df: pd.DataFrame, markers: MarkerTable, places: int = 12,
+                 engine: Optional[str] = None, layout: Optional[ChromLayout] = None) -> RowGeometry:
+    """places=12 与 _fmt_y 一致（默认 SVG），places=3 与 _fmt_c 一致（--compact）"""
+    fmt = {12: _fmt_y, 3: _fmt_c}[places]
+    layout = layout or chrom_layout()
+    if (engine or GEOMETRY_ENGINE) == "fixed":
+        geo = _geometry_fixed(df, markers, places, fmt, layout)
+        if geo is not None:
+            return geo
+    return _geometry_decimal(df, markers, fmt, layout)
 
 
 def read_segments(txt_path: Path) -> pd.DataFrame:
     df = pd.read_csv(
         txt_path,
         sep="	",
-        dtype={"Chr": str, "Start": int, "End": int, "Ancestry": str, "Frequency": str},
+        dtype={"Chr": "category", "Start": int, "End": int, "Ancestry": str, "Frequency": str},
     )
-    df["chr_num"] = df["Chr"].str.replace("chr", "", regex=False).astype(int)
-    # 统一 Frequency 表示为 4 位小数的字符串 key
-    def _freq_key_from_str(val: str) -> str:
-        s = str(val).strip()
-        # Prefer truncation (not rounding) to match the original figure.
-        if "e" in s.lower():
-            d = Decimal(s)
-            k = int(d * Decimal("10000"))
-            out = Decimal(k) / Decimal("10000")
-            return f"{out:.4f}"
-        if "." in s:
-            a, b = s.split(".", 1)
-        else:
-            a, b = s, ""
-        b = (b + "0000")[:4]
-        return f"{a}.{b}"
-    df["Frequency_key"] = df["Frequency"].map(_freq_key_from_str)
+    # Chr 保持原样（分类列），画图时按组装查序号（ChromLayout.rows）
+    # Frequency 截断到万分位的整数（查颜色直接当下标用）
+    df["freq_e4"] = freq_e4(df["Frequency"])
     return df
 
 
-def generate_svg(df: pd.DataFrame, out_svg: Path, scheme: str = "unified") -> None:
+# read_segments 的输出列/类型改了就改这个标签，旧缓存自然失效
+PARSE_CACHE_TAG = "redraw-v3"
+
+
+def generate_svg(df: pd.DataFrame, out_svg: Path, scheme: str = "unified", compact: bool = False,
+                 engine: Optional[str] = None, markers: Optional[MarkerTable] = None,
+                 legend: Optional[str] = None, layout: Optional[ChromLayout] = None) -> None:
+    if compact:
+        generate_svg_compact(df, out_svg, scheme, engine, markers, legend, layout)
+        return
     getcontext().prec = 40
-    marker_map = _decode_marker_map()
+    if markers is None:
+        markers = marker_table()
+    layout = layout or chrom_layout()
 
     if scheme == "original":
-        freq_to_color = FREQ_TO_COLOR_ORIGINAL
         ancestry_colors = ANCESTRY_COLORS_ORIGINAL
     else:
-        freq_to_color = FREQ_TO_COLOR_UNIFIED
         ancestry_colors = ANCESTRY_COLORS_UNIFIED
+    # 方案里没有的 ancestry 查共享颜色表（以前一律画成黑色）
+    palette = get_palette()
 
-    out: list[str] = []
-    out.append('<?xml version="1.0" encoding="UTF-8"?>')
-    out.append('<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">')
-    out.append(f'<svg version="1.1" id="svg" xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{SVG_HEIGHT}">')
-
-    # 1) 段落矩形（按 TXT 行顺序）
-    for r in df.itertuples(index=False):
-        chr_num = int(r.chr_num)
-        x1, x2, y_topmost, _yTopArc = _chr_geom(chr_num)
-        y1 = y_topmost + SCALE_Y*Decimal(int(r.Start))
-        y2 = y_topmost + SCALE_Y*Decimal(int(r.End))
-        fill = freq_to_color.get(r.Frequency_key)
-        if fill is None:
-            raise KeyError(f"Frequency={r.Frequency_key} 在配色表中不存在")
-        fill = fill.upper()
-        d = f"M{_fmt_x(x1)},{_fmt_y(y1)} L{_fmt_x(x2)},{_fmt_y(y1)} L{_fmt_x(x2)},{_fmt_y(y2)} L{_fmt_x(x1)},{_fmt_y(y2)} Z"
-        out.append(f'<path style="fill:{fill}; stroke:{fill}; stroke-width:0.25" d="{d}"/>')
+    with instrument.stage("geometry"):
+        fills = lookup_fills(df, scheme).tolist()
+        geo = row_geometry(df, markers, engine=engine, layout=layout)
+        # x 坐标只和染色体有关：每条格式化一次，再按行的染色体序号整列取
+        ci = layout.rows(df)
+        xs = [(_fmt_x(x1), _fmt_x(x2), _fmt_x(x2 + MARKER_SIZE), _fmt_x(x2 + MARKER_HALF),
+               _fmt_x(x2 + MARKER_HALF + MARKER_SIZE), _fmt_x(x2 + MARKER_HALF + MARKER_HALF))
+              for x1, x2, _, _ in layout.geom]
+        x1_r, x2_r, x_line2_r, x_marker_r, x_marker_rr, x_apex_r = (
+            np.array(col, dtype=object)[ci].tolist() for col in zip(*xs))
 
-    # 2) 染色体外框
-    yBottomArc = BASELINE - R
-    for chr_num in range(1, 30):
-        x1, x2, _y_topmost, yTopArc = _chr_geom(chr_num)
-        d = f"M{_fmt_x(x1)},{_fmt_y(yTopArc)} A{_fmt_x(R)},{_fmt_x(R)} 0 1,1 { _fmt_x(x2)},{_fmt_y(yTopArc)} L{_fmt_x(x2)},{_fmt_y(yBottomArc)} A{_fmt_x(R)},{_fmt_x(R)} 0 1,1 { _fmt_x(x1)},{_fmt_y(yBottomArc)} Z"
-        out.append(f'<path style="fill:none; stroke:grey; stroke-width:1" d="{d}"/>')
-
-    # 3) 染色体编号（底部）
-    y_text = BASELINE + Decimal("15")  # 635.078725
-    x_single = Decimal("2.26437884615385")
-    x_double = Decimal("0.06437884615385")
-    for chr_num in range(1, 30):
-        x1 = Decimal(str(CHR_X1[chr_num-1]))
-        x = x1 + (x_single if chr_num < 10 else x_double)
-        out.append(f'<text x="{_fmt_x(x)}" y="{_fmt_y(y_text)}" style="font-size:9; font-family:Arial; fill:black">{chr_num}</text>')
-
-    # 4) Legend：渐变条（5000 个窄矩形）
-    LEG_X0 = Decimal("566.92912")
-    LEG_Y0 = Decimal("124.015745")
-    LEG_W  = Decimal("0.014173228")
-    LEG_H  = Decimal("14.173228")
-    N = 5000
-    for i in range(N):
-        x = LEG_X0 + LEG_W*Decimal(i)
-        col = _gradient_color(i, N-1, scheme)
-        out.append(f'<rect x="{_fmt_x(x)}" y="{_fmt_y(LEG_Y0)}" width="{_fmt_y(LEG_W)}" height="{_fmt_y(LEG_H)}" style="fill:{col};stroke:none"/>')
-
-    # Legend 数值
-    out.append('<text x="566.92912" y="149.362201" style="font-size:12; font-family:Arial; fill:black">0.7</text>')
-    out.append('<text x="630.781086772" y="149.362201" style="font-size:12; font-family:Arial; fill:black">1</text>')
-
-    # Legend marker shapes & labels
-    mo = ancestry_colors["Mo-OD"].upper()
-    ch = ancestry_colors["Charolais"].upper()
-    out.append(f'<rect x="566.92912" y="159.448815" width="8" height="8" style="fill:{mo};stroke:none"/>')
-    out.append('<text x="578.92912" y="166.948815" style="font-size:12; font-family:Arial; fill:black">Mo-OD</text>')
-    out.append(f'<path style="fill:{ch};stroke:none" d="M566.92912,181.622043 L574.92912,181.622043 L570.92912,173.622043 Z"/>')
-    out.append('<text x="578.92912" y="181.622043" style="font-size:12; font-family:Arial; fill:black">Charolais</text>')
-
-    # 5) 连接线 + marker（按 TXT 行顺序）
-    missing = []
-    for r in df.itertuples(index=False):
-        chr_num = int(r.chr_num)
-        start = int(r.Start); end = int(r.End)
-        x1, x2, y_topmost, _ = _chr_geom(chr_num)
-        y1 = y_topmost + SCALE_Y*Decimal(start)
-        y2 = y_topmost + SCALE_Y*Decimal(end)
-        y_center = (y1 + y2) / 2
-        key = (chr_num, start, end)
-        y2s = marker_map.get(key)
-        if y2s is None:
-            missing.append(key)
-            marker_center = y_center  # fallback
+    # 逐元素写进文件（--out 以 .svgz 结尾时自动压缩），不在内存里攒整份文档
+    with SvgWriter(out_svg) as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>')
+        out.write('<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">')
+        out.write(f'<svg version="1.1" id="svg" xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{SVG_HEIGHT}">')
+
+        # 1) 段落矩形（按 TXT 行顺序）
+        for x1, x2, fill, y1, y2 in zip(x1_r, x2_r, fills, geo.y1, geo.y2):
+            d = f"M{x1},{y1} L{x2},{y1} L{x2},{y2} L{x1},{y2} Z"
+            out.write(f'<path style="fill:{fill}; stroke:{fill}; stroke-width:0.25" d="{d}"/>')
+
+        # 2) 染色体外框
+        yBottomArc = BASELINE - R
+        for x1, x2, _y_topmost, yTopArc in layout.geom:
+            d = f"M{_fmt_x(x1)},{_fmt_y(yTopArc)} A{_fmt_x(R)},{_fmt_x(R)} 0 1,1 { _fmt_x(x2)},{_fmt_y(yTopArc)} L{_fmt_x(x2)},{_fmt_y(yBottomArc)} A{_fmt_x(R)},{_fmt_x(R)} 0 1,1 { _fmt_x(x1)},{_fmt_y(yBottomArc)} Z"
+            out.write(f'<path style="fill:none; stroke:grey; stroke-width:1" d="{d}"/>')
+
+        # 3) 染色体编号（底部）
+        y_text = BASELINE + Decimal("15")  # 635.078725
+        for name, x in zip(layout.assembly.chroms, layout.label_x):
+            out.write(f'<text x="{_fmt_x(x)}" y="{_fmt_y(y_text)}" style="font-size:9; font-family:Arial; fill:black">{name}</text>')
+
+        # 4) Legend：渐变条（默认 5000 个窄矩形，整段按方案缓存）
+        if (legend or LEGEND_MODE) == "gradient":
+            out.write(legend_gradient(scheme, _fmt_x))
         else:
-            marker_center = Decimal(str(y2s))
-        anc = str(r.Ancestry)
-        col = ancestry_colors.get(anc, "#000000").upper()
-        x_line2 = x2 + MARKER_SIZE
-        out.append(f'<line x1="{_fmt_x(x2)}" y1="{_fmt_y(y_center)}" x2="{_fmt_x(x_line2)}" y2="{_fmt_y(marker_center)}" style="stroke:{col};stroke-width:0.25"/>')
-        x_marker = x2 + MARKER_HALF
+            out.writelines(legend_rects(scheme))
+
+        # Legend 数值
+        out.write('<text x="566.92912" y="149.362201" style="font-size:12; font-family:Arial; fill:black">0.7</text>')
+        out.write('<text x="630.781086772" y="149.362201" style="font-size:12; font-family:Arial; fill:black">1</text>')
+
+        # Legend marker shapes & labels
+        mo = ancestry_colors["Mo-OD"].upper()
+        ch = ancestry_colors["Charolais"].upper()
+        out.write(f'<rect x="566.92912" y="159.448815" width="8" height="8" style="fill:{mo};stroke:none"/>')
+        out.write('<text x="578.92912" y="166.948815" style="font-size:12; font-family:Arial; fill:black">Mo-OD</text>')
+        out.write(f'<path style="fill:{ch};stroke:none" d="M566.92912,181.622043 L574.92912,181.622043 L570.92912,173.622043 Z"/>')
+        out.write('<text x="578.92912" y="181.622043" style="font-size:12; font-family:Arial; fill:black">Charolais</text>')
+
+        # 5) 连接线 + marker（按 TXT 行顺序）
+        size = _fmt_x(MARKER_SIZE)
+        rows = zip(x2_r, x_line2_r, x_marker_r, x_marker_rr, x_apex_r, df["Ancestry"].astype(str).tolist(),
+                   geo.y_center, geo.marker, geo.marker_lo, geo.marker_hi)
+        for x2, x_line2, x_marker, x_marker_r, x_apex, anc, y_center, mc, mlo, mhi in rows:
+            col = (ancestry_colors.get(anc) or palette.color(anc)).upper()
+            out.write(f'<line x1="{x2}" y1="{y_center}" x2="{x_line2}" y2="{mc}" style="stroke:{col};stroke-width:0.25"/>')
+            if anc == "Mo-OD":
+                out.write(f'<rect x="{x_marker}" y="{mlo}" width="{size}" height="{size}" style="fill:{col};stroke:none"/>')
+            else:
+                d = f"M{x_marker},{mhi} L{x_marker_r},{mhi} L{x_apex},{mlo} Z"
+                out.write(f'<path style="fill:{col};stroke:none" d="{d}"/>')
+
+        if geo.missing:
+            # 不直接 raise，先把 SVG 写出来方便你看（marker 会退化为段中心）
+            print("[WARN] marker y 映射缺失：", geo.missing, "条；图中这些 marker 将使用段中心位置。")
+
+        out.write("</svg>")
+    instrument.count("svg_elements", out.count)
+    palette.save()
+
+
+def generate_svg_compact(df: pd.DataFrame, out_svg: Path, scheme: str = "unified",
+                         engine: Optional[str] = None, markers: Optional[MarkerTable] = None,
+                         legend: Optional[str] = None, layout: Optional[ChromLayout] = None) -> None:
+    """
+    --compact：版式与 generate_svg 相同，换一种省字节的写法
+    - 坐标保留 3 位小数（600 dpi 下不到 0.01 像素），而不是 12~13 位
+    - 同一条染色体、同一颜色的段合并成一个 <path>（M..H..V..H..Z 子路径）
+    - 填充/描边/字体放进 CSS 类，不再每个元素重复 style="..."
+    - 连接线、marker 按 ancestry 各合并成一个 <path>（marker 用相对坐标 h/v/l 画，每个只写一个起点）
+    - 渐变条相邻同色的窄矩形合并成一个（5000 个 -> 约 100 个）
+    叠放次序略有不同：相邻异色段描边重叠的那 0.125 宽度按颜色分层，连接线统一画在 marker 下面，肉眼看不出。
+    """
+    getcontext().prec = 40
+    if markers is None:
+        markers = marker_table()
+    if scheme == "original":
+        ancestry_colors = ANCESTRY_COLORS_ORIGINAL
+    else:
+        ancestry_colors = ANCESTRY_COLORS_UNIFIED
+    palette = get_palette()
+    layout = layout or chrom_layout()
+
+    xs = [(_fmt_c(g[0]), _fmt_c(g[1]), _fmt_c(g[1] + MARKER_SIZE), _fmt_c(g[1] + MARKER_HALF))
+          for g in layout.geom]
+    with instrument.stage("geometry"):
+        fills = lookup_fills(df, scheme).tolist()
+        geo = row_geometry(df, markers, places=3, engine=engine, layout=layout)
+        ci = layout.rows(df)
+        sx1_r, sx2_r, x_line2_r, x_marker_r = (np.array(col, dtype=object)[ci].tolist() for col in zip(*xs))
+    missing = geo.missing
+
+    # 段落：(染色体, 颜色) -> 子路径；连接线 / marker：ancestry -> 子路径
+    s, h = _fmt_c(MARKER_SIZE), _fmt_c(MARKER_HALF)
+    square = f"h{s}v{s}h-{s}Z"
+    triangle = f"h{s}l-{h},-{s}Z"
+    seg_paths: Dict[Tuple[int, str], list] = {}
+    line_paths: Dict[str, list] = {}
+    marker_paths: Dict[str, list] = {}
+    rows = zip(ci.tolist(), sx1_r, sx2_r, x_line2_r, x_marker_r, fills, df["Ancestry"].astype(str).tolist(),
+               geo.y1, geo.y2, geo.y_center, geo.marker, geo.marker_lo, geo.marker_hi)
+    for c, sx1, sx2, x_line2, x_marker, fill, anc, y1, y2, y_center, mc, mlo, mhi in rows:
+        seg_paths.setdefault((c, fill), []).append(f"M{sx1},{y1}H{sx2}V{y2}H{sx1}Z")
+        line_paths.setdefault(anc, []).append(f"M{sx2},{y_center}L{x_line2},{mc}")
         if anc == "Mo-OD":
-            out.append(f'<rect x="{_fmt_x(x_marker)}" y="{_fmt_y(marker_center - MARKER_HALF)}" width="{_fmt_x(MARKER_SIZE)}" height="{_fmt_x(MARKER_SIZE)}" style="fill:{col};stroke:none"/>')
+            marker_paths.setdefault(anc, []).append(f"M{x_marker},{mlo}{square}")
+        else:
+            marker_paths.setdefault(anc, []).append(f"M{x_marker},{mhi}{triangle}")
+
+    fill_cls: Dict[str, str] = {}
+    for _, fill in seg_paths:
+        fill_cls.setdefault(fill, f"q{len(fill_cls)}")
+    anc_cls = {anc: f"a{k}" for k, anc in enumerate(line_paths)}
+    anc_col = {anc: (ancestry_colors.get(anc) or palette.color(anc)).upper() for anc in line_paths}
+
+    # 渐变条：相邻同色合并
+    grad = gradient_lut(scheme)
+    rgb = gradient_rgb(scheme)
+    runs = [0] + (np.flatnonzero((rgb[1:] != rgb[:-1]).any(axis=1)) + 1).tolist() + [GRADIENT_STEPS]
+
+    font = "font-family:Arial;fill:black"
+    with SvgWriter(out_svg) as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>')
+        out.write(f'<svg version="1.1" id="svg" xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{SVG_HEIGHT}">')
+        out.write('<defs>')
+        out.write('<style type="text/css"><![CDATA[')
+        out.write('path{stroke-width:0.25}')
+        out.write('.o{fill:none;stroke:grey;stroke-width:1}')
+        out.write(f'.t9{{font-size:9px;{font}}}')
+        out.write(f'.t12{{font-size:12px;{font}}}')
+        out.writelines(f'.{k}{{fill:{c};stroke:{c}}}' for c, k in fill_cls.items())
+        for anc, k in anc_cls.items():
+            c = anc_col[anc]
+            out.write(f'.{k}{{fill:{c};stroke:{c}}}')
+        out.write(']]></style>')
+        out.write('</defs>')
+
+        # 1) 段落
+        for (_, fill), parts in seg_paths.items():
+            out.write(f'<path class="{fill_cls[fill]}" d="{"".join(parts)}"/>')
+
+        # 2) 染色体外框
+        yBottomArc = BASELINE - R
+        rr = _fmt_c(R)
+        for (sx1, sx2, _, _), g in zip(xs, layout.geom):
+            yTopArc = g[3]
+            out.write(f'<path class="o" d="M{sx1},{_fmt_c(yTopArc)}A{rr},{rr} 0 1,1 {sx2},{_fmt_c(yTopArc)}'
+                      f'L{sx2},{_fmt_c(yBottomArc)}A{rr},{rr} 0 1,1 {sx1},{_fmt_c(yBottomArc)}Z"/>')
+
+        # 3) 染色体编号
+        y_text = _fmt_c(BASELINE + Decimal("15"))
+        for name, x in zip(layout.assembly.chroms, layout.label_x):
+            out.write(f'<text x="{_fmt_c(x)}" y="{y_text}" class="t9">{name}</text>')
+
+        # 4) Legend
+        if (legend or LEGEND_MODE) == "gradient":
+            out.write(legend_gradient(scheme, _fmt_c))
         else:
-            base_y = marker_center + MARKER_HALF
-            apex_y = marker_center - MARKER_HALF
-            d = f"M{_fmt_x(x_marker)},{_fmt_y(base_y)} L{_fmt_x(x_marker+MARKER_SIZE)},{_fmt_y(base_y)} L{_fmt_x(x_marker+MARKER_HALF)},{_fmt_y(apex_y)} Z"
-            out.append(f'<path style="fill:{col};stroke:none" d="{d}"/>')
+            for a, b in zip(runs[:-1], runs[1:]):
+                out.write(f'<rect x="{_fmt_c(LEGEND_X0 + LEGEND_W*Decimal(a))}" y="{_fmt_c(LEGEND_Y0)}" '
+                          f'width="{_fmt_c(LEGEND_W*Decimal(b - a))}" height="{_fmt_c(LEGEND_H)}" fill="{grad[a]}"/>')
+        out.write('<text x="566.92912" y="149.362201" class="t12">0.7</text>')
+        out.write('<text x="630.781086772" y="149.362201" class="t12">1</text>')
+        mo = ancestry_colors["Mo-OD"].upper()
+        ch = ancestry_colors["Charolais"].upper()
+        out.write(f'<rect x="566.92912" y="159.448815" width="8" height="8" fill="{mo}"/>')
+        out.write('<text x="578.92912" y="166.948815" class="t12">Mo-OD</text>')
+        out.write(f'<path fill="{ch}" style="stroke:none" d="M566.92912,181.622043L574.92912,181.622043L570.92912,173.622043Z"/>')
+        out.write('<text x="578.92912" y="181.622043" class="t12">Charolais</text>')
 
-    if missing:
-        # 不直接 raise，先把 SVG 写出来方便你看（marker 会退化为段中心）
-        print("[WARN] marker y 映射缺失：", len(missing), "条；图中这些 marker 将使用段中心位置。")
+        # 5) 连接线 + marker
+        for anc, parts in line_paths.items():
+            out.write(f'<path class="{anc_cls[anc]}" style="fill:none" d="{"".join(parts)}"/>')
+        for anc, parts in marker_paths.items():
+            out.write(f'<path class="{anc_cls[anc]}" style="stroke:none" d="{"".join(parts)}"/>')
 
-    out.append("</svg>")
-    out_svg.write_text("\n".join(out), encoding="utf-8")
+        if missing:
+            print("[WARN] marker y 映射缺失：", missing, "条；图中这些 marker 将使用段中心位置。")
+        out.write("</svg>")
+    instrument.count("svg_elements", out.count)
+    palette.save()
 
 
-def main() -> None:
-    p = argparse.ArgumentParser()
-    p.add_argument("--txt", type=str, required=True, help="loter_segment.txt 路径")
-    p.add_argument("--out", type=str, required=True, help="输出 SVG 路径")
-    p.add_argument("--scheme", type=str, choices=["original", "unified"], default="unified")
+def render_raster(df: pd.DataFrame, out_px_w: int, scheme: str = "unified",
+                  markers: Optional[MarkerTable] = None, layout: Optional[ChromLayout] = None):
+    """
+    NumPy 光栅后端（--raster numpy）：与 generate_svg 相同的版式和坐标（转成 float），
+    直接画进 RGBA 数组，不生成、不解析 SVG。返回 Pillow Image。
+    """
+    getcontext().prec = 40
+    if markers is None:
+        markers = marker_table()
+    if scheme == "original":
+        ancestry_colors = ANCESTRY_COLORS_ORIGINAL
+    else:
+        ancestry_colors = ANCESTRY_COLORS_UNIFIED
+    palette = get_palette()
+    layout = layout or chrom_layout()
+
+    scale = out_px_w / float(SVG_WIDTH)
+    canvas = RasterCanvas(float(SVG_WIDTH), float(SVG_HEIGHT), scale)
+    r = float(R)
+    scale_y = float(layout.scale_y)
+    half_stroke = 0.125  # 段落 path 的 stroke-width:0.25，同色描边向外扩 0.125
 
-    # 高清导出（可选）
-    p.add_argument("--png", type=str, default=None, help="输出 PNG 路径（需要 cairosvg；可选再用 pillow 写入 DPI 元数据）")
-    p.add_argument("--jpg", type=str, default=None, help="输出 JPG 路径（需要 cairosvg + pillow）")
-    p.add_argument("--dpi", type=int, default=600, help="目标 dpi（默认 600）")
-    p.add_argument("--cm_width", type=float, default=None, help="按物理宽度(cm)输出高清图（推荐，如 18、24）")
-    p.add_argument("--px_width", type=int, default=None, help="按像素宽度输出（优先于 cm_width）")
-    p.add_argument("--jpg_quality", type=int, default=95, help="JPG 质量 1-95（默认 95）")
+    ci = layout.rows(df)
+    start = df["Start"].to_numpy(dtype=np.int64)
+    end = df["End"].to_numpy(dtype=np.int64)
+    fills = parse_colors(lookup_fills(df, scheme))
 
-    args = p.parse_args()
+    # 1) 段落矩形（同一条染色体内按 TXT 行顺序，后画覆盖先画）：稳定排序后按染色体切片
+    order = np.argsort(ci, kind="stable")
+    bounds = np.searchsorted(ci[order], np.arange(len(layout.geom) + 1))
+    for n, (a, b) in enumerate(zip(bounds[:-1].tolist(), bounds[1:].tolist())):
+        if a == b:
+            continue
+        rows = order[a:b]
+        x1, x2, y_topmost = layout.x1[n], layout.x2[n], layout.y_topmost[n]
+        y1 = y_topmost + scale_y * start[rows]
+        y2 = y_topmost + scale_y * end[rows]
+        canvas.column_fills(x1 - half_stroke, x2 + half_stroke, y1 - half_stroke, y2 + half_stroke, fills[rows])
+
+    # 2) 染色体外框
+    for x1, y_topmost in zip(layout.x1.tolist(), layout.y_topmost.tolist()):
+        canvas.capsule(x1, y_topmost, 2 * r, float(BASELINE) - y_topmost, r, None, "grey", 1.0)
+
+    # 3) 染色体编号
+    for name, x1 in zip(layout.assembly.chroms, layout.x1.tolist()):
+        x = x1 + float(LABEL_DX_SINGLE if len(name) == 1 else LABEL_DX_DOUBLE)
+        canvas.text(x, float(BASELINE) + 15, name, 9)
+
+    # 4) Legend：渐变条 + 数值 + 形状
+    grad = gradient_rgb(scheme).astype(np.uint8)
+    canvas.hgradient(float(LEGEND_X0), float(LEGEND_Y0), float(LEGEND_W), float(LEGEND_H), grad)
+    canvas.text(566.92912, 149.362201, "0.7", 12)
+    canvas.text(630.781086772, 149.362201, "1", 12)
+    mo = parse_colors([ancestry_colors["Mo-OD"]])
+    ch = parse_colors([ancestry_colors["Charolais"]])
+    canvas.stamp(np.array([566.92912]), np.array([159.448815]), canvas.rect_mask(8, 8), mo)
+    canvas.stamp(np.array([566.92912]), np.array([173.622043]), canvas.triangle_mask(8, 8), ch)
+    canvas.text(578.92912, 166.948815, "Mo-OD", 12)
+    canvas.text(578.92912, 181.622043, "Charolais", 12)
+
+    # 5) 连接线 + marker
+    x2_all = layout.x2[ci]
+    ytop_all = layout.y_topmost[ci]
+    y_center = ytop_all + scale_y * (start + end) / 2
+    idx = markers.find(layout.marker_chr[ci], start, end)
+    marker_center = np.where(idx >= 0, markers.text[np.maximum(idx, 0)].astype(np.float64), y_center)
+    anc = df["Ancestry"].astype(str).to_numpy()
+    colors = parse_colors([ancestry_colors.get(a) or palette.color(a) for a in anc])
+    size, half = float(MARKER_SIZE), float(MARKER_HALF)
+    canvas.lines(x2_all, y_center, x2_all + size, marker_center, colors)
+    is_mo = anc == "Mo-OD"
+    canvas.stamp(x2_all[is_mo] + half, marker_center[is_mo] - half, canvas.rect_mask(size, size), colors[is_mo])
+    canvas.stamp(x2_all[~is_mo] + half, marker_center[~is_mo] - half, canvas.triangle_mask(size, size), colors[~is_mo])
+
+    palette.save()
+    return canvas.to_image()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from cli import command_parser
+    run(command_parser("redraw", prog=Path(__file__).name).parse_args(argv))
+
+
+def run(args: argparse.Namespace) -> None:
+    """redraw 子命令（参数见 cli.py）"""
+    legend = args.legend or LEGEND_MODE
+    if args.profile is not None:
+        instrument.enable(Path(args.profile) if args.profile else None)
+    else:
+        instrument.enable_from_env()
 
     print("=== running draw_from_txt_redraw.py ===")
     print("SVG 输出：", os.path.abspath(args.out))
 
-    df = read_segments(Path(args.txt))
-    generate_svg(df, Path(args.out), scheme=args.scheme)
+    with instrument.stage("read"):
+        if args.no_cache:
+            df = read_segments(Path(args.txt))
+        else:
+            cache_dir = Path(args.cache_dir) if args.cache_dir else None
+            df = load_table(Path(args.txt), read_segments, tag=PARSE_CACHE_TAG, cache_dir=cache_dir)
+    instrument.count("rows_parsed", len(df))
+    with instrument.stage("svg"):
+        sidecar = None
+        if args.marker_sidecar:
+            sidecar = str(Path(args.cache_dir) if args.cache_dir else default_cache_dir(Path(__file__).resolve()))
+        markers = marker_table(sidecar)
+        layout = chrom_layout(get_assembly(args.genome, primary_only=not args.all_contigs))
+        generate_svg(df, Path(args.out), scheme=args.scheme, compact=args.compact, engine=args.geometry,
+                     markers=markers, legend=legend, layout=layout)
 
     # 如果需要导出位图（PNG/JPG）
     if args.png or args.jpg:
-        try:
-            import cairosvg  # type: ignore
-        except Exception as e:
-            raise SystemExit("需要安装 cairosvg 才能输出 PNG/JPG：pip install cairosvg") from e
-
         # 计算输出宽度（像素）
         out_px_w: Optional[int] = None
         if args.px_width is not None:
@@ -308,43 +1028,60 @@ def main() -> None:
                 svg_w = 744.0945
             out_px_w = int(round(svg_w * (int(args.dpi) / 96.0)))
 
-        # 先渲染成 PNG bytes（再决定写 PNG 或转 JPG）
-        png_bytes: bytes = cairosvg.svg2png(
-            url=str(Path(args.out)),
-            output_width=out_px_w,
-            dpi=int(args.dpi),
-        )
+        im_native = None
+        with instrument.stage("raster"):
+            if args.raster == "numpy":
+                # 直接画进数组，不经过 SVG（需要 pillow）
+                im_native = render_raster(df, out_px_w, scheme=args.scheme, markers=markers, layout=layout)
+            else:
+                try:
+                    import cairosvg  # type: ignore
+                except Exception as e:
+                    raise SystemExit("需要安装 cairosvg 才能输出 PNG/JPG：pip install cairosvg") from e
 
-        # 写 PNG（可选：用 pillow 写入 DPI 元数据）
-        if args.png:
-            out_png = Path(args.png)
-            try:
-                from PIL import Image  # type: ignore
-                import io
-                im = Image.open(io.BytesIO(png_bytes))
-                im.save(out_png, format="PNG", dpi=(int(args.dpi), int(args.dpi)))
-            except Exception:
-                # 没装 pillow 时，直接落盘（也能用；只是可能没有 DPI 元数据）
-                out_png.write_bytes(png_bytes)
-            print("PNG 输出：", os.path.abspath(str(out_png)))
+                # 先渲染成 PNG bytes（再决定写 PNG 或转 JPG）
+                png_bytes: bytes = cairosvg.svg2png(
+                    url=str(Path(args.out)),
+                    output_width=out_px_w,
+                    dpi=int(args.dpi),
+                )
 
-        # 写 JPG（需要 pillow）
-        if args.jpg:
-            try:
-                from PIL import Image  # type: ignore
-                import io
-            except Exception as e:
-                raise SystemExit("需要安装 pillow 才能输出 JPG：pip install pillow") from e
-
-            out_jpg = Path(args.jpg)
-            im = Image.open(io.BytesIO(png_bytes)).convert("RGB")
-            q = int(args.jpg_quality)
-            if q < 1:
-                q = 1
-            if q > 95:
-                q = 95
-            im.save(out_jpg, format="JPEG", quality=q, dpi=(int(args.dpi), int(args.dpi)), optimize=True)
-            print("JPG 输出：", os.path.abspath(str(out_jpg)))
+        with instrument.stage("encode"):
+            # 写 PNG（可选：用 pillow 写入 DPI 元数据）
+            if args.png:
+                out_png = Path(args.png)
+                if im_native is not None:
+                    im_native.save(out_png, format="PNG", dpi=(int(args.dpi), int(args.dpi)))
+                else:
+                    try:
+                        from PIL import Image  # type: ignore
+                        import io
+                        im = Image.open(io.BytesIO(png_bytes))
+                        im.save(out_png, format="PNG", dpi=(int(args.dpi), int(args.dpi)))
+                    except Exception:
+                        # 没装 pillow 时，直接落盘（也能用；只是可能没有 DPI 元数据）
+                        out_png.write_bytes(png_bytes)
+                print("PNG 输出：", os.path.abspath(str(out_png)))
+
+            # 写 JPG（需要 pillow）
+            if args.jpg:
+                try:
+                    from PIL import Image  # type: ignore
+                    import io
+                except Exception as e:
+                    raise SystemExit("需要安装 pillow 才能输出 JPG：pip install pillow") from e
+
+                out_jpg = Path(args.jpg)
+                im = (im_native if im_native is not None else Image.open(io.BytesIO(png_bytes))).convert("RGB")
+                q = int(args.jpg_quality)
+                if q < 1:
+                    q = 1
+                if q > 95:
+                    q = 95
+                im.save(out_jpg, format="JPEG", quality=q, dpi=(int(args.dpi), int(args.dpi)), optimize=True)
+                print("JPG 输出：", os.path.abspath(str(out_jpg)))
+
+    instrument.write_report(Path(args.out).with_name(Path(args.out).name + ".profile.json"))
 
 
 if __name__ == "__main__":
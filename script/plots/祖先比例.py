@@ -4,6 +4,8 @@ import matplotlib.pyplot as plt
 from matplotlib.patches import FancyBboxPatch
 from matplotlib.colors import LinearSegmentedColormap
 
+from palette import get_palette
+
 # -------------------------
 # 1. 读数据 + 基本处理
 # -------------------------
@@ -49,10 +51,8 @@ marker_map = {
     "Mo-OD": "^",       # 三角
     "Charolais": "o"    # 圆
 }
-marker_color = {
-    "Mo-OD": "#007C73",
-    "Charolais": "#6A51A3"
-}
+# 点的颜色一律取共享颜色表（ancestry_palette.json），与 Loter.py / 染色体Loter.py 的颜色一致
+palette = get_palette()
 
 # -------------------------
 # 3. 开始画图
@@ -109,7 +109,7 @@ for anc, sub in df.groupby("Ancestry"):
         ax.plot(
             [x_chr_right, x_point],
             [y, y],
-            color="black",    # 也可以改成 marker_color[anc]，每种祖先用自己的颜色
+            color="black",    # 也可以改成 palette.color(anc)，每种祖先用自己的颜色
             linewidth=0.3
         )
 
@@ -119,7 +119,7 @@ for anc, sub in df.groupby("Ancestry"):
         sub["mid_pos"],                     # y：segment 中点
         marker=marker_map.get(anc, "o"),
         s=60,                               # 再稍微放大一点，原来是 40
-        facecolor=marker_color.get(anc, "black"),
+        facecolor=palette.color(anc),
         edgecolor="none",                   # ← 不要描边
         label=anc
     )
@@ -162,5 +162,7 @@ leg = ax.legend(
     loc="upper right"
 )
 
+palette.save()
+
 fig.tight_layout()
 plt.show()